@@ -0,0 +1,190 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+
+from src.config import Config
+from src.core.storage_service import StorageService
+from src.writers.columnar_writer import arrow_compatible
+
+
+class LatencyTracker:
+    """
+    Latencias de las últimas solicitudes (ventana acotada) y sus percentiles.
+    Se miden todas las solicitudes, también las que terminan con error.
+    """
+
+    PERCENTILES = (50, 90, 95, 99)
+
+    def __init__(self, window: int | None = None):
+        self._latencies: deque[float] = deque(maxlen=window or Config.API_LATENCY_WINDOW)
+        self._count = 0
+        self._errors = 0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+            self._count += 1
+            self._errors += failed
+
+    def summary(self) -> dict:
+        """
+        {"count": total de solicitudes, "errors": solicitudes con error, "window":
+        solicitudes medidas, "p50_ms": ..., ...}
+        """
+        with self._lock:
+            latencies = np.array(self._latencies)
+            count = self._count
+            errors = self._errors
+
+        summary = {"count": count, "errors": errors, "window": len(latencies)}
+        for percentile in self.PERCENTILES:
+            value = float(np.percentile(latencies, percentile)) * 1000 if len(latencies) else None
+            summary[f"p{percentile}_ms"] = value
+        return summary
+
+
+def _records(df: pd.DataFrame) -> list[dict]:
+    # to_json convierte los tipos de numpy y los valores vacíos (null)
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+
+class PricingRequestHandler(BaseHTTPRequestHandler):
+    """
+    Endpoints:
+        POST /price?depot=PERI&file_name=...&format=json|parquet&table=billing|errors
+            Cuerpo: el reporte de depósito (p. ej. curl --data-binary @reporte.xls).
+            Con format=json (por defecto) retorna {"billing_report": [...], "error_protocols": [...]};
+            con format=parquet retorna la tabla indicada en table (billing por defecto).
+        GET /stats: percentiles de latencia de POST /price (incluye las solicitudes con error)
+        GET /health
+    """
+
+    server: "PricingServer"
+
+    def log_message(self, format, *args):
+        # Sin una línea por solicitud en la consola
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str) -> int:
+        """Envía la respuesta y retorna su código de estado."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+    def _send_json(self, status: int, payload: dict) -> int:
+        return self._send(status, json.dumps(payload).encode("utf-8"), "application/json")
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif path == "/stats":
+            self._send_json(200, self.server.latencies.summary())
+        else:
+            self._send_json(404, {"error": f"Unknown path {path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/price":
+            self._send_json(404, {"error": f"Unknown path {url.path}"})
+            return
+
+        start = time.perf_counter()
+        status = self._price(url.query)
+        self.server.latencies.add(time.perf_counter() - start, failed=status >= 400)
+
+    def _price(self, url_query: str) -> int:
+        """Atiende POST /price y retorna el código de estado de la respuesta."""
+        query = {key: values[-1] for key, values in parse_qs(url_query).items()}
+        depot_name = query.get("depot", "PERI")
+        response_format = query.get("format", "json")
+        table = query.get("table", "billing")
+        file_name = query.get("file_name", "upload")
+
+        if response_format not in ("json", "parquet") or table not in ("billing", "errors"):
+            return self._send_json(400, {"error": "format must be json or parquet and table must be billing or errors"})
+
+        content_length = int(self.headers.get("Content-Length") or 0)
+        if content_length <= 0:
+            return self._send_json(400, {"error": "The request body must contain the depot report"})
+
+        # Los lectores reciben una ruta: el reporte se guarda en un archivo temporal
+        suffix = os.path.splitext(file_name)[1] or ".xls"
+        with tempfile.TemporaryDirectory() as tmp_folder:
+            report_path = Path(tmp_folder) / f"report{suffix}"
+            report_path.write_bytes(self.rfile.read(content_length))
+            try:
+                billing_report, error_protocols = self.server.storage_service.price_report(
+                    report_path, depot_name, os.path.splitext(file_name)[0]
+                )
+            except ValueError as e:
+                return self._send_json(400, {"error": str(e)})
+            except Exception as e:
+                return self._send_json(500, {"error": str(e)})
+
+        try:
+            if response_format == "parquet":
+                buffer = io.BytesIO()
+                arrow_compatible(billing_report if table == "billing" else error_protocols).to_parquet(buffer, index=False)
+                body, content_type = buffer.getvalue(), "application/vnd.apache.parquet"
+            else:
+                body = json.dumps({
+                    "depot": depot_name,
+                    "file_name": file_name,
+                    "billing_report": _records(billing_report),
+                    "error_protocols": _records(error_protocols)
+                }).encode("utf-8")
+                content_type = "application/json"
+        except Exception as e:
+            return self._send_json(500, {"error": f"Could not serialize the response: {e}"})
+        return self._send(200, body, content_type)
+
+
+class PricingServer(ThreadingHTTPServer):
+    """
+    Servidor HTTP local que valoriza reportes de depósito a pedido.
+
+    Mantiene un StorageService con la configuración de servicios, el índice de
+    protocolos y los memos de coincidencias ya cargados; cada solicitud se
+    atiende en su propio hilo con un calculador propio.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str | None = None, port: int | None = None):
+        self.storage_service = StorageService()
+        self.storage_service.prepare()
+        self.latencies = LatencyTracker()
+        super().__init__((host or Config.API_HOST, Config.API_PORT if port is None else port), PricingRequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        # Las coincidencias encontradas quedan para las próximas ejecuciones
+        self.storage_service.save_match_cache()
+
+
+if __name__ == "__main__":
+    # python -m src.api.pricing_server [PUERTO]
+    server = PricingServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else None)
+    host, port = server.server_address[:2]
+    print(f"Pricing API listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,38 @@
+from typing import Iterable
+import pandas as pd
+
+
+def to_categoricals(df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    """Convierte las columnas indicadas a category (las que ya lo son se conservan)."""
+    conversions = {
+        column: "category"
+        for column in columns
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype)
+    }
+    return df.astype(conversions) if conversions else df
+
+
+def restore_categoricals(df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    """Convierte las columnas category indicadas al dtype de sus categorías (str u object)."""
+    conversions = {
+        column: df[column].cat.categories.dtype
+        for column in columns
+        if column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype)
+    }
+    return df.astype(conversions) if conversions else df
+
+
+def categorical_groupby(df: pd.DataFrame, keys: list[str], **groupby_kwargs):
+    """
+    groupby con las claves convertidas a category y solo las combinaciones observadas.
+
+    Agrupa igual que con las columnas originales (mismo orden y mismo tratamiento
+    de los valores vacíos con dropna=False); las claves del resultado quedan como
+    category y pueden restaurarse con restore_categoricals.
+    """
+    return to_categoricals(df, keys).groupby(keys, observed=True, **groupby_kwargs)
+
+
+def deep_memory_usage(df: pd.DataFrame) -> int:
+    """Memoria ocupada por el DataFrame, incluyendo el contenido de los objetos (bytes)."""
+    return int(df.memory_usage(deep=True).sum())
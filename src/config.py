@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from pathlib import Path
 import os
 
@@ -8,6 +9,10 @@ class Config:
     DEPOT_REPORTS_FOLDER = DATA_FOLDER / "depot_reports"
     PROCESSED_REPORTS_FOLDER = DATA_FOLDER / "processed_reports"
     CONFIGS_FOLDER = DATA_FOLDER / "configs"
+    CACHE_FOLDER = DATA_FOLDER / "cache"
+    REPORT_CACHE_FOLDER = CACHE_FOLDER / "depot_reports"
+    MATCH_CACHE_PATH = CACHE_FOLDER / "match_cache.pkl"
+    SERVICES_SNAPSHOT_PATH = CACHE_FOLDER / "services_snapshot.pkl"
     
     # Archivos de configuración
     EXCHANGE_RATE_PATH = CONFIGS_FOLDER / "exchanges_rate.xlsx"
@@ -16,4 +21,86 @@ class Config:
 
     # Archivos de salida
     PROTOCOLS_WITH_ERRORS_PATH = DATA_FOLDER / "protocols_with_errors.xlsx"
-    MAX_VALUES_OUTPUT_PATH = DATA_FOLDER / "max_values.xlsx"
\ No newline at end of file
+    MAX_VALUES_OUTPUT_PATH = DATA_FOLDER / "max_values.xlsx"
+    PEAK_VALUES_OUTPUT_PATH = DATA_FOLDER / "peak_values.xlsx"  # Filas de los PEAK_VALUES_TOP_K mayores totales diarios por protocolo
+    PROTOCOL_PERCENTILES_OUTPUT_PATH = DATA_FOLDER / "protocol_percentiles.xlsx"  # P90/P95 de los totales diarios por protocolo
+    RUN_MANIFEST_PATH = DATA_FOLDER / "run_manifest.sqlite"
+    BILLING_HISTORY_PATH = DATA_FOLDER / "billing_history.sqlite"  # Historial consultable de los reportes de facturación (ver BILLING_HISTORY_ENABLED)
+    EXCEL_ENGINES_PATH = DATA_FOLDER / "excel_engines.json"  # Motor más rápido por depósito (python -m src.readers.excel_engines)
+    COLUMNAR_OUTPUT_FOLDER = DATA_FOLDER / "columnar"
+    WINDOW_MAX_VALUES_FOLDER = DATA_FOLDER / "max_values_by_window"  # max_values_<ventana>.xlsx (ver MAX_VALUES_WINDOW)
+
+    # Depósitos
+    DEFAULT_LAYOUT_DEPOTS = ["PERI"]  # Depósitos que usan las carpetas y archivos de salida definidos arriba
+    DEPOTS_FOLDER = DATA_FOLDER / "depots"  # Los demás depósitos usan depots/<DEPÓSITO>/ con la misma estructura (ver DepotPaths)
+
+    # Procesamiento
+    PROCESSING_WORKERS = 1  # 1 = secuencial; >1 = procesos en paralelo para leer y valorizar reportes
+    MATCHING_WORKERS = 1  # Procesos para la búsqueda difusa en lote de protocolos sin coincidencia conocida
+    MATCHING_PARALLEL_MIN_PROTOCOLS = 200  # Con menos protocolos pendientes la búsqueda en lote es secuencial
+    REPORT_CACHE_ENABLED = True  # Guarda los reportes ya normalizados en Parquet (requiere pyarrow)
+    SERVICES_SNAPSHOT_ENABLED = True  # Guarda la configuración de servicios ya procesada y la reutiliza mientras no cambien sus archivos
+    MATCH_CACHE_ENABLED = True  # Conserva las coincidencias de protocolos y servicios entre ejecuciones
+    REPORT_MEMORY_USAGE = False  # Informa por archivo la memoria ahorrada al normalizar el reporte con columnas category
+    PERI_TRANSFORM_MODE = "vectorized"  # "vectorized", "rowwise" o "verify" (ejecuta ambas y compara)
+    BILLING_ENGINE = "vectorized"  # "vectorized" o "rowwise"
+    INCREMENTAL_PROCESSING = False  # Solo valoriza los reportes nuevos o modificados desde la última ejecución (ver RUN_MANIFEST_PATH); el resultado no incluye billing_reports
+    PIPELINE_STAGES = False  # Lee el siguiente reporte en otro hilo mientras se valoriza el actual y escribe cada reporte de salida al valorizarlo
+    OUTPUT_WRITER_WORKERS = 2  # Hilos que escriben los reportes de salida (0 = en el hilo de procesamiento)
+    OUTPUT_WRITER_ENGINE = "xlsxwriter"  # "xlsxwriter" (constant_memory) u "openpyxl" (write_only); si no está instalado se usa el otro
+    PIPELINE_QUEUE_SIZE = 2  # Reportes en espera entre etapas (acota la memoria)
+    STREAMING_PROCESSING = False  # Guarda cada reporte y actualiza los máximos al valorizarlo, sin acumular reportes en memoria (el resultado no incluye billing_reports)
+    BILLING_HISTORY_ENABLED = False  # Guarda cada reporte de facturación en BILLING_HISTORY_PATH (consultas de máximos por rango de fechas)
+    PEAK_VALUES_TOP_K = 0  # Además del máximo, los K mayores totales diarios y los percentiles por protocolo (0 = deshabilitado)
+    MAX_VALUES_WINDOW = None  # Además, máximos por período según la fecha del nombre del reporte: "M" (mes), "Q", "W"... (frecuencias de pd.Period)
+    COLUMNAR_OUTPUT_FORMATS = []  # Además de Excel: "parquet", "feather" y/o "csv" (ver COLUMNAR_OUTPUT_FOLDER)
+    WATCH_DEBOUNCE_SECONDS = 2.0  # Modo vigilancia: un reporte se procesa cuando su tamaño y fecha no cambian durante este tiempo
+    WATCH_POLL_SECONDS = 1.0  # Modo vigilancia: intervalo de revisión de la carpeta (sin watchdog es el único mecanismo)
+    MULTI_DEPOT_WORKERS = 2  # Depósitos procesados a la vez en una ejecución de varios depósitos (hilos que comparten la configuración; no paralelizan la valorización, ver PROCESSING_WORKERS)
+
+    # API de valorización (python -m src.api.pricing_server)
+    API_HOST = "127.0.0.1"
+    API_PORT = 8765
+    API_LATENCY_WINDOW = 1000  # Solicitudes recientes usadas para los percentiles de latencia (GET /stats)
+
+
+@dataclass(frozen=True)
+class DepotPaths:
+    """Carpetas de entrada y archivos de salida de un depósito."""
+    depot_reports_folder: Path
+    processed_reports_folder: Path
+    report_cache_folder: Path
+    protocols_with_errors_path: Path
+    max_values_output_path: Path
+    peak_values_output_path: Path
+    protocol_percentiles_output_path: Path
+    columnar_output_folder: Path
+    window_max_values_folder: Path
+
+    @classmethod
+    def for_depot(cls, depot_name: str) -> "DepotPaths":
+        if depot_name in Config.DEFAULT_LAYOUT_DEPOTS:
+            return cls(
+                depot_reports_folder=Config.DEPOT_REPORTS_FOLDER,
+                processed_reports_folder=Config.PROCESSED_REPORTS_FOLDER,
+                report_cache_folder=Config.REPORT_CACHE_FOLDER,
+                protocols_with_errors_path=Config.PROTOCOLS_WITH_ERRORS_PATH,
+                max_values_output_path=Config.MAX_VALUES_OUTPUT_PATH,
+                peak_values_output_path=Config.PEAK_VALUES_OUTPUT_PATH,
+                protocol_percentiles_output_path=Config.PROTOCOL_PERCENTILES_OUTPUT_PATH,
+                columnar_output_folder=Config.COLUMNAR_OUTPUT_FOLDER,
+                window_max_values_folder=Config.WINDOW_MAX_VALUES_FOLDER
+            )
+
+        depot_folder = Config.DEPOTS_FOLDER / depot_name
+        return cls(
+            depot_reports_folder=depot_folder / "depot_reports",
+            processed_reports_folder=depot_folder / "processed_reports",
+            report_cache_folder=Config.REPORT_CACHE_FOLDER / depot_name,
+            protocols_with_errors_path=depot_folder / "protocols_with_errors.xlsx",
+            max_values_output_path=depot_folder / "max_values.xlsx",
+            peak_values_output_path=depot_folder / "peak_values.xlsx",
+            protocol_percentiles_output_path=depot_folder / "protocol_percentiles.xlsx",
+            columnar_output_folder=depot_folder / "columnar",
+            window_max_values_folder=depot_folder / "max_values_by_window"
+        )
@@ -0,0 +1,200 @@
+import sqlite3
+from datetime import date
+from pathlib import Path
+from typing import Iterable
+import pandas as pd
+
+from src.config import Config
+from src.report_dates import parse_report_date
+
+
+class BillingHistory:
+    """
+    Historial (SQLite) de los reportes de facturación, consultable sin releer los Excel.
+
+    Guarda cada reporte fila por fila junto con la fecha del reporte (tomada del
+    nombre del archivo) y su posición en el orden de procesamiento, con índices
+    por protocolo, por archivo y fecha, y por servicio. get_max_values calcula en
+    SQL el mismo resultado que MaxCalculator (ante empates gana el primer archivo
+    y se excluyen los protocolos con errores), para todos los archivos o para un
+    rango de fechas.
+    """
+
+    # Columnas del reporte de facturación que se guardan
+    COLUMNS = [
+        'PROTOCOL', 'MATCHED_PROTOCOL', 'PROTOCOL_ID', 'POTENTIAL_SERVICE', 'SERVICE_ID', 'DESCRIPTION',
+        'STORAGE_TYPE', 'SERVICE_POSITION_TYPE', 'AMOUNT_OF_KITS', 'DISTINCT_POSITIONS', 'CONVERTED_POSITIONS',
+        'PRICE_USD', 'TOTAL_PRICE', 'ERROR'
+    ]
+
+    def __init__(self, db_path: Path = Config.BILLING_HISTORY_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.db_path, timeout=60)
+        self._create_tables()
+
+    def _create_tables(self) -> None:
+        # Columnas sin tipo: conservan el tipo original de cada valor (texto o número)
+        row_columns = ",\n".join(f"{column} {'REAL' if column == 'TOTAL_PRICE' else ''}" for column in self.COLUMNS)
+        with self._connection:
+            self._connection.executescript(f"""
+                CREATE TABLE IF NOT EXISTS billing_files (
+                    depot TEXT NOT NULL,
+                    file_name TEXT NOT NULL,
+                    report_date TEXT,  -- AAAA-MM-DD, NULL si el nombre no incluye la fecha
+                    file_order INTEGER NOT NULL,
+                    PRIMARY KEY (depot, file_name)
+                );
+                CREATE INDEX IF NOT EXISTS billing_files_date ON billing_files (depot, report_date);
+                CREATE TABLE IF NOT EXISTS billing_rows (
+                    depot TEXT NOT NULL,
+                    file_name TEXT NOT NULL,
+                    row_number INTEGER NOT NULL,
+                    {row_columns},
+                    PRIMARY KEY (depot, file_name, row_number)
+                );
+                CREATE INDEX IF NOT EXISTS billing_rows_protocol ON billing_rows (depot, PROTOCOL);
+                CREATE INDEX IF NOT EXISTS billing_rows_service ON billing_rows (depot, SERVICE_ID);
+            """)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "BillingHistory":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @staticmethod
+    def _sql_value(value):
+        if pd.isna(value):
+            return None
+        # Los escalares de numpy no son tipos válidos para sqlite3
+        return value.item() if hasattr(value, "item") else value
+
+    def get_file_names(self, depot: str) -> set[str]:
+        rows = self._connection.execute("SELECT file_name FROM billing_files WHERE depot = ?", (depot,))
+        return {file_name for (file_name,) in rows.fetchall()}
+
+    def save_report(self, depot: str, file_name: str, billing_report: pd.DataFrame) -> None:
+        """Guarda (o reemplaza) el reporte de facturación de un archivo, al final del orden de procesamiento."""
+        report_date = parse_report_date(file_name)
+        columns = [column for column in self.COLUMNS if column in billing_report.columns]
+        rows = [
+            (depot, file_name, row_number, *map(self._sql_value, values))
+            for row_number, values in enumerate(billing_report[columns].itertuples(index=False, name=None))
+        ]
+
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM billing_rows WHERE depot = ? AND file_name = ?", (depot, file_name)
+            )
+            self._connection.execute(
+                """
+                INSERT OR REPLACE INTO billing_files (depot, file_name, report_date, file_order)
+                VALUES (?, ?, ?, (SELECT COALESCE(MAX(file_order) + 1, 0) FROM billing_files WHERE depot = ?))
+                """,
+                (depot, file_name, report_date.isoformat() if report_date else None, depot)
+            )
+            self._connection.executemany(
+                f"INSERT INTO billing_rows (depot, file_name, row_number, {', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * (len(columns) + 3))})",
+                rows
+            )
+
+    def sync_files(self, depot: str, file_names: Iterable[str]) -> None:
+        """Deja solo los archivos indicados, con el orden de procesamiento en que se indican."""
+        file_names = list(file_names)
+        with self._connection:
+            self._connection.execute("CREATE TEMP TABLE IF NOT EXISTS current_files (file_name TEXT PRIMARY KEY, file_order INTEGER)")
+            self._connection.execute("DELETE FROM current_files")
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO current_files (file_name, file_order) VALUES (?, ?)",
+                [(file_name, file_order) for file_order, file_name in enumerate(file_names)]
+            )
+            for table in ("billing_rows", "billing_files"):
+                self._connection.execute(
+                    f"DELETE FROM {table} WHERE depot = ? AND file_name NOT IN (SELECT file_name FROM current_files)",
+                    (depot,)
+                )
+            self._connection.execute(
+                """
+                UPDATE billing_files
+                SET file_order = (SELECT file_order FROM current_files WHERE current_files.file_name = billing_files.file_name)
+                WHERE depot = ?
+                """,
+                (depot,)
+            )
+
+    @staticmethod
+    def _date_filter(start_date: date | None, end_date: date | None) -> tuple[str, list]:
+        conditions, parameters = "", []
+        if start_date is not None:
+            conditions += " AND report_date >= ?"
+            parameters.append(start_date.isoformat())
+        if end_date is not None:
+            conditions += " AND report_date <= ?"
+            parameters.append(end_date.isoformat())
+        return conditions, parameters
+
+    def get_max_values(self, depot: str, start_date: date | None = None, end_date: date | None = None) -> pd.DataFrame:
+        """
+        Valores máximos por protocolo, como MaxCalculator.get_max_values.
+
+        Con start_date o end_date solo se consideran los reportes con fecha en el
+        rango (inclusive), y sus protocolos con errores.
+        """
+        date_conditions, date_parameters = self._date_filter(start_date, end_date)
+        columns = ", ".join(f"r.{column}" for column in self.COLUMNS)
+        query = f"""
+            WITH selected_files AS (
+                SELECT file_name, file_order FROM billing_files WHERE depot = ?{date_conditions}
+            ),
+            selected_rows AS (
+                SELECT r.*, f.file_order
+                FROM billing_rows r JOIN selected_files f ON r.file_name = f.file_name
+                WHERE r.depot = ?
+            ),
+            totals AS (
+                SELECT file_name, file_order, PROTOCOL, TOTAL(TOTAL_PRICE) AS total, MIN(row_number) AS first_row
+                FROM selected_rows
+                WHERE PROTOCOL IS NOT NULL
+                  AND PROTOCOL NOT IN (SELECT PROTOCOL FROM selected_rows WHERE ERROR IS NOT NULL AND PROTOCOL IS NOT NULL)
+                GROUP BY file_name, PROTOCOL
+            ),
+            winners AS (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY PROTOCOL ORDER BY total DESC, file_order) AS position
+                FROM totals
+            )
+            SELECT {columns}, r.file_name
+            FROM winners w
+            JOIN billing_rows r ON r.depot = ? AND r.file_name = w.file_name AND r.PROTOCOL = w.PROTOCOL
+            WHERE w.position = 1
+            ORDER BY w.file_order, w.first_row, r.row_number
+        """
+        rows = self._connection.execute(query, [depot, *date_parameters, depot, depot]).fetchall()
+        if not rows:
+            return pd.DataFrame()
+        return pd.DataFrame(rows, columns=self.COLUMNS + ['FILE_NAME']).infer_objects()
+
+    def get_protocol_totals(
+        self,
+        depot: str,
+        protocol: object,
+        start_date: date | None = None,
+        end_date: date | None = None
+    ) -> pd.DataFrame:
+        """Total facturado del protocolo en cada reporte (FILE_NAME, REPORT_DATE, TOTAL_PRICE), por fecha."""
+        date_conditions, date_parameters = self._date_filter(start_date, end_date)
+        rows = self._connection.execute(
+            f"""
+            SELECT r.file_name, f.report_date, TOTAL(r.TOTAL_PRICE)
+            FROM billing_rows r JOIN billing_files f ON f.depot = r.depot AND f.file_name = r.file_name
+            WHERE r.depot = ? AND r.PROTOCOL = ?{date_conditions.replace('report_date', 'f.report_date')}
+            GROUP BY r.file_name
+            ORDER BY f.report_date, f.file_order
+            """,
+            [depot, self._sql_value(protocol), *date_parameters]
+        ).fetchall()
+        return pd.DataFrame(rows, columns=['FILE_NAME', 'REPORT_DATE', 'TOTAL_PRICE'])
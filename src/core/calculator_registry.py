@@ -0,0 +1,56 @@
+import threading
+
+from src.core.match_cache import MatchCache
+from src.core.price_calculator import PriceCalculator
+from src.readers.config_registry import get_config_registry
+
+
+class CalculatorRegistry:
+    """
+    Calculador de precios base compartido por todo el proceso.
+
+    El calculador base (índices de protocolos y servicios, memos de
+    coincidencias) se construye una vez por cada lectura de la configuración de
+    servicios del registro de configuraciones, y en ese momento se cargan los
+    memos guardados en el MatchCache; cada ejecución usa una copia con su propio
+    registro de errores.
+    """
+
+    def __init__(self, match_cache: MatchCache | None = None):
+        self._lock = threading.Lock()
+        self._match_cache = match_cache or MatchCache()
+        self._config_stamp: object = None
+        self._match_fingerprint: str | None = None
+        self._base_calculator: PriceCalculator | None = None
+
+    def get_price_calculator(self) -> PriceCalculator:
+        """Retorna un PriceCalculator listo para una ejecución con la configuración actual."""
+        with self._lock:
+            config_stamp, services = get_config_registry().get_stamped_services()
+            if self._base_calculator is None or self._config_stamp != config_stamp:
+                match_fingerprint = MatchCache.config_fingerprint(config_stamp)
+                base_calculator = PriceCalculator(services)
+                protocol_memo, service_memo = self._match_cache.load(match_fingerprint)
+                base_calculator.protocol_memo.update(protocol_memo)
+                base_calculator.service_memo.update(service_memo)
+
+                self._base_calculator = base_calculator
+                self._config_stamp = config_stamp
+                self._match_fingerprint = match_fingerprint
+            return self._base_calculator.fresh_copy()
+
+    def save_match_cache(self) -> None:
+        """Guarda los memos de coincidencias del calculador base para las próximas ejecuciones."""
+        with self._lock:
+            base_calculator, match_fingerprint = self._base_calculator, self._match_fingerprint
+        if base_calculator is None:
+            return
+        self._match_cache.save(match_fingerprint, base_calculator.protocol_memo, base_calculator.service_memo)
+
+
+_registry = CalculatorRegistry()
+
+
+def get_calculator_registry() -> CalculatorRegistry:
+    """Retorna el registro de calculadores del proceso."""
+    return _registry
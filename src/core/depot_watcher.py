@@ -0,0 +1,167 @@
+import importlib.util
+import os
+import sys
+import threading
+import time
+
+from src.config import Config, DepotPaths
+from src.core.storage_service import ProcessingResult, StorageService
+
+
+class DepotWatcher:
+    """
+    Modo vigilancia: procesa los reportes de depósito a medida que llegan.
+
+    Mantiene en memoria un StorageService (configuración, índice y memos de
+    coincidencias) y los máximos de la última ejecución. Cada reporte nuevo se
+    valoriza solo y se incorpora a los máximos, y se actualizan max_values.xlsx y
+    protocols_with_errors.xlsx. Si un reporte ya procesado cambia o se elimina, se
+    hace un procesamiento incremental completo.
+
+    Usa watchdog (inotify) para enterarse de los cambios si está instalado; si no,
+    revisa la carpeta cada Config.WATCH_POLL_SECONDS. Un archivo se procesa recién
+    cuando su tamaño y fecha de modificación no cambian durante
+    Config.WATCH_DEBOUNCE_SECONDS, para no leer archivos que se están copiando.
+    """
+
+    def __init__(
+        self,
+        depot_name: str = "PERI",
+        debounce_seconds: float | None = None,
+        poll_seconds: float | None = None
+    ):
+        self.depot_name = depot_name
+        self.debounce_seconds = Config.WATCH_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        self.poll_seconds = Config.WATCH_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self._folder = DepotPaths.for_depot(depot_name).depot_reports_folder
+        self._service = StorageService()
+        self._result: ProcessingResult | None = None
+
+        # Estado (tamaño, fecha) de los archivos reflejados en los resultados, y de los que están esperando
+        self._known: dict[str, tuple[int, int]] = {}
+        self._pending: dict[str, tuple[tuple[int, int], float]] = {}
+
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    def _snapshot(self) -> dict[str, tuple[int, int]]:
+        """{archivo: (tamaño, fecha de modificación)} de los reportes de la carpeta."""
+        snapshot = {}
+        for file in os.listdir(self._folder):
+            if not StorageService.is_depot_report(file):
+                continue
+            try:
+                stat = (self._folder / file).stat()
+            except OSError:
+                continue
+            snapshot[file] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def _start_observer(self):
+        """Inicia un observador de watchdog que despierta el ciclo ante cada evento, o retorna None."""
+        if importlib.util.find_spec("watchdog") is None:
+            print(f"watchdog is not installed, polling {self._folder} every {self.poll_seconds} s")
+            return None
+
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        wakeup = self._wakeup
+
+        class WakeupHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wakeup.set()
+
+        observer = Observer()
+        observer.schedule(WakeupHandler(), str(self._folder), recursive=False)
+        observer.start()
+        return observer
+
+    def _process(self, new_files: list[str] | None) -> bool:
+        """
+        Procesa los archivos nuevos indicados, o todo el depósito (incremental) si
+        new_files es None. Retorna False si el procesamiento falló.
+        """
+        try:
+            if new_files is None or self._result is None:
+                self._result = self._service.process_all(self.depot_name, incremental=True)
+            else:
+                self._result = self._service.process_new_files(self._result, new_files)
+            self._service.save_results(self._result)
+            print(f"Max values updated ({len(self._result.processed_files)} files)")
+            return True
+        except Exception as e:
+            print(f"Error processing depot reports: {e}")
+            # El próximo procesamiento incluye todo el depósito
+            self._result = None
+            return False
+
+    def check_folder(self) -> None:
+        """Revisa la carpeta y procesa los archivos cuyo copiado ya terminó."""
+        now = time.monotonic()
+        snapshot = self._snapshot()
+
+        changed = {file: stamp for file, stamp in snapshot.items() if self._known.get(file) != stamp}
+        removed = [file for file in self._known if file not in snapshot]
+
+        # Un archivo espera mientras su tamaño o su fecha sigan cambiando
+        self._pending = {
+            file: self._pending[file] if file in self._pending and self._pending[file][0] == stamp else (stamp, now)
+            for file, stamp in changed.items()
+        }
+        settled = [file for file, (_, since) in self._pending.items() if now - since >= self.debounce_seconds]
+        if not settled and not removed:
+            return
+
+        processed_files = set(self._result.processed_files) if self._result is not None else set()
+        only_new_files = not removed and not any(file in processed_files for file in settled)
+        if not only_new_files and len(settled) < len(self._pending):
+            # El procesamiento completo lee toda la carpeta: esperar a que terminen los copiados
+            return
+        if not self._process(settled if only_new_files else None):
+            # Los archivos siguen esperando y se reintentan después de otro intervalo de espera
+            for file in settled:
+                self._pending[file] = (self._pending[file][0], now)
+            return
+
+        for file in settled:
+            self._known[file] = self._pending.pop(file)[0]
+        for file in removed:
+            self._known.pop(file, None)
+
+    def run(self) -> None:
+        """Procesa el depósito y luego vigila la carpeta hasta que se llame a stop()."""
+        self._folder.mkdir(parents=True, exist_ok=True)
+        observer = self._start_observer()
+        try:
+            # El estado se toma antes de procesar: lo que cambie durante el procesamiento se vuelve a revisar
+            self._known = self._snapshot()
+            if not self._process(None):
+                # Todos los archivos quedan como nuevos y se reintentan en la próxima revisión
+                self._known = {}
+            print(f"Watching {self._folder} for new depot reports")
+
+            while not self._stopped.is_set():
+                # Con watchdog solo hace falta despertar sin eventos mientras hay archivos esperando
+                timeout = self.poll_seconds if observer is None or self._pending else None
+                self._wakeup.wait(timeout)
+                self._wakeup.clear()
+                if not self._stopped.is_set():
+                    self.check_folder()
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+
+
+if __name__ == "__main__":
+    # python -m src.core.depot_watcher [DEPOSITO]
+    watcher = DepotWatcher(sys.argv[1] if len(sys.argv) > 1 else "PERI")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
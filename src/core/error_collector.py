@@ -0,0 +1,56 @@
+from typing import Iterable
+import pandas as pd
+
+
+class ErrorCollector:
+    """
+    Acumula los protocolos con errores sin filas duplicadas.
+
+    Una fila se considera duplicada si coincide en PROTOCOL, POTENTIAL_SERVICE,
+    DESCRIPTION, STORAGE_TYPE y ERROR con una fila anterior; se conserva la
+    primera (y por lo tanto su FILE_NAME). Las filas se guardan como tuplas y
+    el DataFrame se arma solo al consultarlo.
+    """
+
+    COLUMNS = ['PROTOCOL', 'MATCHED_PROTOCOL', 'PROTOCOL_ID', 'POTENTIAL_SERVICE', 'SERVICE_ID', 'DESCRIPTION', 'STORAGE_TYPE', 'AMOUNT_OF_KITS', 'DISTINCT_POSITIONS', 'ERROR', 'FILE_NAME']
+    DEDUP_COLUMNS = ['PROTOCOL', 'POTENTIAL_SERVICE', 'DESCRIPTION', 'STORAGE_TYPE', 'ERROR']
+
+    _DEDUP_POSITIONS = tuple(map(COLUMNS.index, DEDUP_COLUMNS))
+    _PROTOCOL_POSITION = COLUMNS.index('PROTOCOL')
+
+    def __init__(self):
+        self._rows: list[tuple] = []
+        self._seen_keys: set[tuple] = set()
+        self._protocols: set = set()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, row: tuple) -> None:
+        """Agrega una fila (valores en el orden de COLUMNS) si no es duplicada."""
+        key = tuple(row[i] for i in self._DEDUP_POSITIONS)
+        protocol = row[self._PROTOCOL_POSITION]
+        if not pd.isna(protocol):
+            self._protocols.add(protocol)
+
+        # Un valor vacío nunca coincide (NaN != NaN), igual que la comparación por columnas
+        if any(pd.isna(value) for value in key):
+            self._rows.append(tuple(row))
+            return
+
+        if key in self._seen_keys:
+            return
+
+        self._seen_keys.add(key)
+        self._rows.append(tuple(row))
+
+    def add_rows(self, rows: Iterable[tuple]) -> None:
+        for row in rows:
+            self.add(row)
+
+    def protocols(self) -> set:
+        """Retorna los protocolos (no vacíos) que tuvieron al menos un error."""
+        return set(self._protocols)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self._rows, columns=self.COLUMNS, dtype=object)
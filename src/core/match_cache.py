@@ -0,0 +1,75 @@
+import os
+import pickle
+import threading
+from pathlib import Path
+
+from src.config import Config
+from src.fingerprint import data_fingerprint
+
+
+class MatchCache:
+    """
+    Caché en disco de los memos de coincidencias de PriceCalculator.
+
+    Guarda protocol_memo (protocolo normalizado -> (Protocol, Protocol ID)) y
+    service_memo ((protocolo, servicio potencial) -> servicio) entre ejecuciones.
+    Cada caché queda marcado con la huella de la configuración de servicios y de
+    los tipos de cambio (los precios de los servicios dependen de ambos); si la
+    huella no coincide, el caché se descarta.
+    """
+
+    # Incrementar al cambiar la lógica de búsqueda para invalidar los cachés existentes
+    CACHE_VERSION = 1
+
+    def __init__(self, cache_path: Path = Config.MATCH_CACHE_PATH, enabled: bool = Config.MATCH_CACHE_ENABLED):
+        self.cache_path = Path(cache_path)
+        self.enabled = enabled
+
+    @classmethod
+    def config_fingerprint(cls, config_stamp: object) -> str:
+        """
+        Huella de los archivos de configuración de los que dependen las coincidencias,
+        a partir de su marca en el registro de configuraciones (ver
+        ConfigRegistry.get_stamped_services).
+        """
+        return data_fingerprint(
+            cls.CACHE_VERSION,
+            str(Config.SERVICE_CONFIG_PATH.resolve()),
+            str(Config.EXCHANGE_RATE_PATH.resolve()),
+            config_stamp
+        )
+
+    def load(self, fingerprint: str) -> tuple[dict, dict]:
+        """Retorna (protocol_memo, service_memo) guardados, o memos vacíos si no hay caché válido."""
+        if not self.enabled or not self.cache_path.exists():
+            return {}, {}
+
+        try:
+            with open(self.cache_path, "rb") as f:
+                cached = pickle.load(f)
+        except Exception as e:
+            print(f"Error reading match cache {self.cache_path}: {e}")
+            return {}, {}
+
+        if cached.get("fingerprint") != fingerprint:
+            return {}, {}
+        return cached["protocol_memo"], cached["service_memo"]
+
+    def save(self, fingerprint: str, protocol_memo: dict, service_memo: dict) -> None:
+        if not self.enabled:
+            return
+
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # Nombre temporal por hilo y copia de los memos: varios depósitos pueden
+            # guardar a la vez memos compartidos que otros hilos siguen ampliando
+            tmp_path = self.cache_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(
+                    {"fingerprint": fingerprint, "protocol_memo": dict(protocol_memo), "service_memo": dict(service_memo)},
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL
+                )
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"Error writing match cache {self.cache_path}: {e}")
@@ -1,5 +1,9 @@
+import heapq
 import pandas as pd
-from typing import Set
+from typing import Callable, Iterable, Set
+
+from src.core.quantile_sketch import QuantileSketch
+from src.report_dates import parse_report_date
 
 class MaxCalculator:
     """
@@ -7,15 +11,230 @@ class MaxCalculator:
     
     Recibe reportes de facturación y mantiene el registro con el mayor
     TOTAL_PRICE por protocolo.
+
+    Solo conserva las filas de los reportes que hoy son máximos de algún
+    protocolo (en bloques por reporte), por lo que la memoria no crece con la
+    cantidad de reportes procesados. Los protocolos con errores pueden
+    informarse mientras se procesan los reportes: se excluyen del resultado
+    aunque se descubran después de haber sido acumulados.
+
+    Con top_k > 0 también mantiene, por protocolo, los top_k reportes con mayor
+    total (un heap de tamaño fijo, ver get_peak_days y get_peak_values) y un
+    resumen de todos sus totales diarios para estimar percentiles (ver
+    get_protocol_percentiles). Solo se conservan las filas de los reportes que
+    están entre los picos de algún protocolo.
     """
     
-    def __init__(self, protocols_with_errors: Set[str] | None = None):
-        self._max_values = pd.DataFrame()
-        self._protocols_with_errors = protocols_with_errors or set()
+    # Percentiles de los totales diarios que informa get_protocol_percentiles
+    PERCENTILES = (90, 95)
+    
+    def __init__(self, protocols_with_errors: Set[str] | None = None, top_k: int = 0):
+        self._protocols_with_errors: set = set(protocols_with_errors or ())
+        self.top_k = top_k
+        self._reset()
+
+    def _reset(self) -> None:
         self._best_protocol_totals: dict[str, float] = {}
 
+        # Bloques de filas ganadoras, uno por reporte, y a qué bloque apunta cada protocolo.
+        # La secuencia registra el orden de la última actualización de cada protocolo.
+        self._chunks: dict[int, pd.DataFrame] = {}
+        self._chunk_protocols: dict[int, set] = {}
+        self._protocol_chunk: dict[str, int] = {}
+        self._protocol_sequence: dict[str, int] = {}
+        self._next_chunk_id = 0
+        self._next_sequence = 0
+
+        self._max_values: pd.DataFrame | None = pd.DataFrame()
+
+        # Picos por protocolo: heap (mínimo) con los top_k mayores (total, -orden del archivo, archivo)
+        # y resumen de todos sus totales diarios. Filas de cada archivo de los protocolos en los que es pico.
+        self._protocol_peaks: dict[object, list[tuple]] = {}
+        self._protocol_sketches: dict[object, QuantileSketch] = {}
+        self._peak_chunks: dict[str, pd.DataFrame] = {}
+        self._peak_chunk_protocols: dict[str, set] = {}
+        self._next_file_order = 0
+
     def get_max_values(self) -> pd.DataFrame:
+        if self._max_values is None:
+            self._max_values = self._build_max_values()
         return self._max_values.copy()
+
+    def add_protocols_with_errors(self, protocols: Set[str]) -> None:
+        """
+        Agrega protocolos a excluir. Los que ya se habían acumulado se descartan,
+        con el mismo resultado que si se hubieran excluido desde el principio.
+        """
+        new_protocols = set(protocols) - self._protocols_with_errors
+        if not new_protocols:
+            return
+        
+        self._protocols_with_errors |= new_protocols
+        for protocol in new_protocols:
+            self._best_protocol_totals.pop(protocol, None)
+        self._release_protocols(new_protocols)
+        self._max_values = None
+        
+        released_files = set()
+        for protocol in new_protocols:
+            self._protocol_sketches.pop(protocol, None)
+            for _, _, file_name in self._protocol_peaks.pop(protocol, ()):
+                self._peak_chunk_protocols.get(file_name, set()).discard(protocol)
+                released_files.add(file_name)
+        self._compact_peak_chunks(released_files)
+
+    @staticmethod
+    def _clean_file_name(file_name: str) -> str:
+        return file_name.replace("output_", "").replace(".xlsx", "")
+
+    def _release_protocols(self, protocols) -> None:
+        """Quita las filas ganadoras de los protocolos indicados, compactando cada bloque una vez."""
+        affected_chunks = set()
+        for protocol in protocols:
+            chunk_id = self._protocol_chunk.pop(protocol, None)
+            if chunk_id is None:
+                continue
+            self._protocol_sequence.pop(protocol, None)
+            self._chunk_protocols[chunk_id].discard(protocol)
+            affected_chunks.add(chunk_id)
+        
+        for chunk_id in affected_chunks:
+            live_protocols = self._chunk_protocols[chunk_id]
+            if live_protocols:
+                chunk = self._chunks[chunk_id]
+                self._chunks[chunk_id] = chunk[chunk['PROTOCOL'].isin(live_protocols)]
+            else:
+                del self._chunks[chunk_id]
+                del self._chunk_protocols[chunk_id]
+
+    def _add_chunk(self, chunk: pd.DataFrame, protocols: list) -> None:
+        chunk_id = self._next_chunk_id
+        self._next_chunk_id += 1
+        self._chunks[chunk_id] = chunk
+        self._chunk_protocols[chunk_id] = set(protocols)
+        for protocol in protocols:
+            self._protocol_chunk[protocol] = chunk_id
+            self._protocol_sequence[protocol] = self._next_sequence
+            self._next_sequence += 1
+
+    def _build_max_values(self) -> pd.DataFrame:
+        if not self._chunks:
+            return pd.DataFrame()
+        
+        frames = [
+            chunk.assign(_SEQUENCE=chunk['PROTOCOL'].map(self._protocol_sequence))
+            for chunk in self._chunks.values()
+        ]
+        return (
+            pd.concat(frames, ignore_index=True)
+            .sort_values('_SEQUENCE', kind='stable')
+            .drop(columns='_SEQUENCE')
+            .reset_index(drop=True)
+        )
+    
+    def _update_peaks(self, file_name: str, protocol_totals: pd.Series) -> set[str]:
+        """
+        Incorpora los totales de un reporte a los picos y a los resúmenes de cada
+        protocolo. Retorna los archivos que dejaron de ser pico de algún protocolo.
+        """
+        file_order = self._next_file_order
+        self._next_file_order += 1
+        
+        released_files = set()
+        for protocol, protocol_total in protocol_totals.items():
+            if protocol in self._protocols_with_errors:
+                continue
+            self._protocol_sketches.setdefault(protocol, QuantileSketch()).add(protocol_total)
+            
+            # Ante empates queda el primer archivo: los posteriores son menores en el heap
+            peaks = self._protocol_peaks.setdefault(protocol, [])
+            peak = (protocol_total, -file_order, file_name)
+            if len(peaks) < self.top_k:
+                heapq.heappush(peaks, peak)
+            elif peak > peaks[0]:
+                _, _, released_file = heapq.heapreplace(peaks, peak)
+                self._peak_chunk_protocols.get(released_file, set()).discard(protocol)
+                released_files.add(released_file)
+        return released_files
+    
+    def _is_peak(self, protocol, file_name: str) -> bool:
+        return any(peak_file == file_name for _, _, peak_file in self._protocol_peaks.get(protocol, ()))
+    
+    def _store_peak_rows(self, rows: pd.DataFrame) -> None:
+        """Guarda las filas (con FILE_NAME) de los protocolos en los que su archivo es pico."""
+        for file_name, file_rows in rows.groupby('FILE_NAME', sort=False):
+            protocols = {
+                protocol for protocol in file_rows['PROTOCOL'].dropna().unique()
+                if self._is_peak(protocol, file_name)
+            }
+            if protocols:
+                self._peak_chunks[file_name] = file_rows[file_rows['PROTOCOL'].isin(protocols)]
+                self._peak_chunk_protocols[file_name] = protocols
+    
+    def _compact_peak_chunks(self, file_names: Iterable[str]) -> None:
+        """Quita de las filas guardadas de cada archivo las de los protocolos en los que ya no es pico."""
+        for file_name in file_names:
+            protocols = self._peak_chunk_protocols.get(file_name)
+            if protocols is None:
+                continue
+            if protocols:
+                chunk = self._peak_chunks[file_name]
+                self._peak_chunks[file_name] = chunk[chunk['PROTOCOL'].isin(protocols)]
+            else:
+                del self._peak_chunks[file_name]
+                del self._peak_chunk_protocols[file_name]
+    
+    def get_peak_days(self) -> pd.DataFrame:
+        """Los top_k mayores totales de cada protocolo (PROTOCOL, PEAK_RANK, FILE_NAME, TOTAL_PRICE); PEAK_RANK 1 es el máximo."""
+        records = [
+            (protocol, peak_rank, file_name, protocol_total)
+            for protocol, peaks in self._protocol_peaks.items()
+            for peak_rank, (protocol_total, _, file_name) in enumerate(sorted(peaks, reverse=True), start=1)
+        ]
+        return pd.DataFrame(records, columns=['PROTOCOL', 'PEAK_RANK', 'FILE_NAME', 'TOTAL_PRICE'])
+    
+    def get_peak_values(self) -> pd.DataFrame:
+        """Filas de los top_k reportes con mayor total de cada protocolo, con su PEAK_RANK (como get_max_values para cada posición)."""
+        if not self._peak_chunks:
+            return pd.DataFrame()
+        
+        peak_ranks = {
+            (protocol, file_name): peak_rank
+            for protocol, peak_rank, file_name, _ in self.get_peak_days().itertuples(index=False, name=None)
+        }
+        protocol_order = {protocol: order for order, protocol in enumerate(self._protocol_peaks)}
+        rows = pd.concat(self._peak_chunks.values(), ignore_index=True)
+        return (
+            rows.assign(
+                PEAK_RANK=[peak_ranks[key] for key in zip(rows['PROTOCOL'], rows['FILE_NAME'])],
+                _PROTOCOL_ORDER=rows['PROTOCOL'].map(protocol_order)
+            )
+            .sort_values(['_PROTOCOL_ORDER', 'PEAK_RANK'], kind='stable')
+            .drop(columns='_PROTOCOL_ORDER')
+            .reset_index(drop=True)
+        )
+    
+    def get_protocol_percentiles(self) -> pd.DataFrame:
+        """
+        Percentiles (ver PERCENTILES) de los totales diarios de cada protocolo, en
+        los reportes en los que aparece (DAYS). Son estimaciones con un error
+        relativo de a lo sumo 1% (ver QuantileSketch).
+        """
+        records = [
+            (protocol, sketch.count, *(sketch.quantile(percentile / 100) for percentile in self.PERCENTILES))
+            for protocol, sketch in self._protocol_sketches.items()
+        ]
+        columns = ['PROTOCOL', 'DAYS', *(f'P{percentile}_TOTAL_PRICE' for percentile in self.PERCENTILES)]
+        return pd.DataFrame(records, columns=columns)
+    
+    @staticmethod
+    def protocol_totals(report: pd.DataFrame) -> pd.Series:
+        """Suma TOTAL_PRICE por protocolo, en el orden de aparición de los protocolos."""
+        return (
+            pd.to_numeric(report['TOTAL_PRICE'], errors='coerce')
+            .groupby(report['PROTOCOL'], sort=False)
+            .sum()
+        )
     
     def optimize_daily_report(self, daily_report: pd.DataFrame, file_name: str) -> None:
         if daily_report.empty:
@@ -28,21 +247,230 @@ class MaxCalculator:
         if valid_protocols.empty:
             return
         
-        unique_protocols = valid_protocols['PROTOCOL'].unique()
+        protocol_totals = self.protocol_totals(valid_protocols)
+        clean_file_name = self._clean_file_name(file_name)
+        
+        if self.top_k:
+            self._compact_peak_chunks(self._update_peaks(clean_file_name, protocol_totals))
+            self._store_peak_rows(valid_protocols.assign(FILE_NAME=clean_file_name))
         
-        for protocol in unique_protocols:
-            protocol_rows = valid_protocols[valid_protocols['PROTOCOL'] == protocol]
-            protocol_total = protocol_rows['TOTAL_PRICE'].sum()
+        improved_protocols = [
+            protocol for protocol, protocol_total in protocol_totals.items()
+            if protocol not in self._best_protocol_totals or protocol_total > self._best_protocol_totals[protocol]
+        ]
+        if not improved_protocols:
+            return
+        
+        for protocol in improved_protocols:
+            self._best_protocol_totals[protocol] = protocol_totals[protocol]
+        
+        self._release_protocols(improved_protocols)
+        
+        chunk = valid_protocols[valid_protocols['PROTOCOL'].isin(improved_protocols)].assign(FILE_NAME=clean_file_name)
+        self._add_chunk(chunk, improved_protocols)
+        self._max_values = None
+
+    def optimize_reports(self, reports: dict[str, pd.DataFrame]) -> None:
+        """
+        Calcula los máximos de todos los reportes en una sola pasada.
+
+        Equivale a llamar a optimize_daily_report con cada reporte en orden (ante
+        empates gana el primer archivo, y las filas quedan en el mismo orden), pero
+        usa un único groupby para los totales por (archivo, protocolo) y un único
+        join para seleccionar las filas ganadoras. Reemplaza el estado anterior.
+
+        Args:
+            reports: Diccionario {nombre_archivo: reporte}, en orden de procesamiento
+        """
+        self._reset()
+
+        frames = [
+            report.assign(FILE_NAME=self._clean_file_name(file_name), _FILE_INDEX=file_index)
+            for file_index, (file_name, report) in enumerate(reports.items())
+            if not report.empty
+        ]
+        if not frames:
+            return
+
+        all_rows = pd.concat(frames, ignore_index=True)
+        all_rows = all_rows[~all_rows['PROTOCOL'].isin(self._protocols_with_errors)]
+        if all_rows.empty:
+            return
+
+        # Totales por (archivo, protocolo), en orden de aparición
+        totals = (
+            all_rows.assign(TOTAL_PRICE=pd.to_numeric(all_rows['TOTAL_PRICE'], errors='coerce'))
+            .groupby(['_FILE_INDEX', 'PROTOCOL'], sort=False)['TOTAL_PRICE']
+            .sum()
+            .reset_index()
+        )
+        # Orden de cada protocolo dentro de su archivo (como unique() en optimize_daily_report)
+        totals['_PROTOCOL_RANK'] = totals.groupby('_FILE_INDEX', sort=False).cumcount()
+
+        if self.top_k:
+            file_names = [self._clean_file_name(file_name) for file_name in reports]
+            for file_index, file_totals in totals.groupby('_FILE_INDEX', sort=False):
+                self._update_peaks(file_names[file_index], file_totals.set_index('PROTOCOL')['TOTAL_PRICE'])
+            self._store_peak_rows(all_rows.drop(columns='_FILE_INDEX'))
+
+        # idxmax retorna la primera aparición del máximo: ante empates gana el primer archivo
+        winners = totals.loc[totals.groupby('PROTOCOL', sort=False)['TOTAL_PRICE'].idxmax()]
+        self._best_protocol_totals = dict(zip(winners['PROTOCOL'], winners['TOTAL_PRICE']))
+
+        max_values = (
+            all_rows.reset_index(drop=True)
+            .rename_axis('_ROW')
+            .reset_index()
+            .merge(winners[['_FILE_INDEX', 'PROTOCOL', '_PROTOCOL_RANK']], on=['_FILE_INDEX', 'PROTOCOL'], how='inner')
+            .sort_values(['_FILE_INDEX', '_PROTOCOL_RANK', '_ROW'], kind='stable')
+            .drop(columns=['_ROW', '_FILE_INDEX', '_PROTOCOL_RANK'])
+            .reset_index(drop=True)
+        )
+        max_values = max_values.infer_objects()
+        
+        self._add_chunk(max_values, list(max_values['PROTOCOL'].unique()))
+        self._max_values = max_values
+
+    def optimize_from_totals(
+        self,
+        file_totals: dict[str, pd.Series],
+        load_report: Callable[[str], pd.DataFrame]
+    ) -> None:
+        """
+        Calcula los máximos a partir de totales por protocolo ya calculados.
+
+        Produce el mismo resultado que optimize_reports, pero solo carga (con
+        load_report) los reportes que resultan ganadores (o, con top_k, picos) de
+        algún protocolo. Reemplaza el estado anterior.
+
+        Args:
+            file_totals: {nombre_archivo: totales por protocolo (ver protocol_totals)}, en orden de procesamiento
+            load_report: Función que retorna el reporte de un archivo a partir de su nombre
+        """
+        self._reset()
+
+        # Ante empates gana el primer archivo, como en optimize_daily_report
+        winner_files: dict[object, str] = {}
+        for file_name, totals in file_totals.items():
+            if self.top_k:
+                self._update_peaks(self._clean_file_name(file_name), totals)
+            for protocol, protocol_total in totals.items():
+                if protocol in self._protocols_with_errors:
+                    continue
+                if protocol not in self._best_protocol_totals or protocol_total > self._best_protocol_totals[protocol]:
+                    self._best_protocol_totals[protocol] = protocol_total
+                    winner_files[protocol] = file_name
+
+        peak_files = {file_name for peaks in self._protocol_peaks.values() for _, _, file_name in peaks}
+        frames = []
+        for file_name, totals in file_totals.items():
+            won_protocols = [protocol for protocol in totals.index if winner_files.get(protocol) == file_name]
+            is_peak_file = self._clean_file_name(file_name) in peak_files
+            if not won_protocols and not is_peak_file:
+                continue
             
-            if protocol not in self._best_protocol_totals or protocol_total > self._best_protocol_totals[protocol]:
-                self._best_protocol_totals[protocol] = protocol_total
-                
-                if not self._max_values.empty:
-                    self._max_values = self._max_values[self._max_values['PROTOCOL'] != protocol]
-
-                clean_file_name = file_name.replace("output_", "").replace(".xlsx", "")
-                
-                self._max_values = pd.concat(
-                    [self._max_values, protocol_rows.assign(FILE_NAME=clean_file_name)], 
-                    ignore_index=True
-                )
\ No newline at end of file
+            report = load_report(file_name)
+            if is_peak_file:
+                self._store_peak_rows(report.assign(FILE_NAME=self._clean_file_name(file_name)))
+            if not won_protocols:
+                continue
+            
+            # Filas agrupadas por protocolo, en el orden de aparición del protocolo en el reporte
+            protocol_rank = report['PROTOCOL'].map({protocol: rank for rank, protocol in enumerate(won_protocols)})
+            rows = (
+                report[protocol_rank.notna()]
+                .assign(_PROTOCOL_RANK=protocol_rank, FILE_NAME=self._clean_file_name(file_name))
+                .sort_values('_PROTOCOL_RANK', kind='stable')
+                .drop(columns='_PROTOCOL_RANK')
+            )
+            frames.append(rows)
+
+        if not frames:
+            return
+
+        max_values = pd.concat(frames, ignore_index=True).infer_objects()
+        self._add_chunk(max_values, list(max_values['PROTOCOL'].unique()))
+        self._max_values = max_values
+
+
+class WindowedMaxCalculator:
+    """
+    Valores máximos por ventana de tiempo (mes, trimestre, semana...).
+
+    Cada reporte se asigna a la ventana de su fecha (tomada del nombre del
+    archivo) y cada ventana tiene su propio MaxCalculator, con los protocolos con
+    errores de sus reportes: el resultado de cada ventana es el mismo que se
+    obtendría procesando solo los reportes de esa ventana. Los reportes sin fecha
+    en el nombre no se asignan a ninguna ventana.
+    """
+
+    def __init__(self, frequency: str):
+        # Frecuencia de pd.Period: "M" (mes), "Q" (trimestre), "W" (semana), "Y" (año)...
+        self.frequency = frequency
+        self._calculators: dict[str, MaxCalculator] = {}
+
+    def window_key(self, file_name: str) -> str | None:
+        """Nombre de la ventana del reporte (p. ej. "2024-01" por mes), o None si el nombre no incluye la fecha."""
+        report_date = parse_report_date(file_name)
+        if report_date is None:
+            return None
+        # Las semanas se muestran como "inicio/fin": sin "/" para poder usarlo en nombres de archivo
+        return str(pd.Period(report_date, freq=self.frequency)).replace("/", "_")
+
+    def group_by_window(self, file_names: Iterable[str]) -> dict[str, list[str]]:
+        """{ventana: archivos de la ventana}, conservando el orden de los archivos (sin los archivos sin fecha)."""
+        windows: dict[str, list[str]] = {}
+        for file_name in file_names:
+            window = self.window_key(file_name)
+            if window is not None:
+                windows.setdefault(window, []).append(file_name)
+        return windows
+
+    @staticmethod
+    def report_error_protocols(report: pd.DataFrame) -> set:
+        """Protocolos con errores de un reporte de facturación (filas con ERROR)."""
+        if report.empty:
+            return set()
+        return set(report.loc[report['ERROR'].notna(), 'PROTOCOL'].dropna())
+
+    def get_max_values(self) -> dict[str, pd.DataFrame]:
+        return {window: self._calculators[window].get_max_values() for window in sorted(self._calculators)}
+
+    def optimize_daily_report(self, daily_report: pd.DataFrame, file_name: str) -> None:
+        window = self.window_key(file_name)
+        if window is None:
+            return
+
+        calculator = self._calculators.setdefault(window, MaxCalculator())
+        calculator.add_protocols_with_errors(self.report_error_protocols(daily_report))
+        calculator.optimize_daily_report(daily_report, file_name)
+
+    def optimize_reports(self, reports: dict[str, pd.DataFrame]) -> None:
+        """Calcula todas las ventanas en una pasada (ver MaxCalculator.optimize_reports)."""
+        self._calculators = {}
+        for window, file_names in self.group_by_window(reports).items():
+            window_reports = {file_name: reports[file_name] for file_name in file_names}
+            error_protocols = set().union(*map(self.report_error_protocols, window_reports.values()))
+            calculator = MaxCalculator(protocols_with_errors=error_protocols)
+            calculator.optimize_reports(window_reports)
+            self._calculators[window] = calculator
+
+    def optimize_from_totals(
+        self,
+        file_totals: dict[str, pd.Series],
+        file_error_protocols: dict[str, set],
+        load_report: Callable[[str], pd.DataFrame]
+    ) -> None:
+        """
+        Calcula las ventanas de los archivos indicados a partir de totales ya
+        calculados (ver MaxCalculator.optimize_from_totals). Las demás ventanas
+        no se recalculan.
+
+        Args:
+            file_error_protocols: {nombre_archivo: protocolos con errores del archivo}
+        """
+        for window, file_names in self.group_by_window(file_totals).items():
+            error_protocols = set().union(*(file_error_protocols.get(file_name, set()) for file_name in file_names))
+            calculator = MaxCalculator(protocols_with_errors=error_protocols)
+            calculator.optimize_from_totals({file_name: file_totals[file_name] for file_name in file_names}, load_report)
+            self._calculators[window] = calculator
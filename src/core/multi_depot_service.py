@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from src.config import Config
+from src.core.calculator_registry import get_calculator_registry
+from src.core.storage_service import ProcessingResult, StorageService
+
+
+@dataclass
+class MultiDepotResult:
+    """Resultado del procesamiento de varios depósitos."""
+    results: dict[str, ProcessingResult] = field(default_factory=dict)
+    # {depósito: mensaje de error} de los depósitos que no se pudieron procesar
+    errors: dict[str, str] = field(default_factory=dict)
+
+
+class MultiDepotService:
+    """
+    Procesa los reportes de varios depósitos a la vez.
+
+    Cada depósito se procesa en su propio hilo con su propio StorageService
+    (lector, carpetas de entrada y salida, máximos y errores). La configuración
+    de servicios y tipos de cambio, el índice de protocolos y los memos de
+    coincidencias se cargan una sola vez y se comparten desde el registro de
+    calculadores.
+
+    Los hilos solo superponen la lectura de archivos y la escritura de salidas de
+    distintos depósitos: la valorización retiene el GIL, por lo que no reduce el
+    tiempo de CPU. Hoy DepotReaderFactory soporta solo PERI y esto es la base para
+    agregar depósitos; para valorizar en paralelo dentro de un depósito se usa
+    Config.PROCESSING_WORKERS (procesos de trabajo).
+    """
+
+    def __init__(self, workers: int | None = None):
+        self._workers = max(1, workers or Config.MULTI_DEPOT_WORKERS)
+        # Se reutilizan entre ejecuciones, como el StorageService de la interfaz gráfica
+        self._services: dict[str, StorageService] = {}
+
+    def _get_service(self, depot_name: str) -> StorageService:
+        if depot_name not in self._services:
+            self._services[depot_name] = StorageService()
+        return self._services[depot_name]
+
+    def _process_depot(self, depot_name: str, save: bool, streaming: bool | None, incremental: bool | None) -> ProcessingResult:
+        service = self._get_service(depot_name)
+        result = service.process_all(depot_name, streaming=streaming, incremental=incremental)
+        if save:
+            service.save_results(result)
+        return result
+
+    def process_all(
+        self,
+        depot_names: list[str],
+        save: bool = True,
+        streaming: bool | None = None,
+        incremental: bool | None = None
+    ) -> MultiDepotResult:
+        """
+        Procesa (y, si save es True, guarda) los depósitos indicados.
+
+        Args:
+            depot_names: Depósitos a procesar
+            save: Si es True, cada depósito guarda sus resultados al terminar,
+                mientras los demás siguen procesándose
+            streaming, incremental: Ver StorageService.process_all
+
+        Returns:
+            MultiDepotResult con los resultados en el orden de depot_names
+        """
+        # Cargar la configuración compartida antes de lanzar los hilos
+        get_calculator_registry().get_price_calculator()
+        for depot_name in depot_names:
+            self._get_service(depot_name)
+
+        multi_result = MultiDepotResult()
+        with ThreadPoolExecutor(max_workers=min(self._workers, max(1, len(depot_names)))) as executor:
+            futures = {
+                depot_name: executor.submit(self._process_depot, depot_name, save, streaming, incremental)
+                for depot_name in depot_names
+            }
+            for depot_name, future in futures.items():
+                try:
+                    multi_result.results[depot_name] = future.result()
+                except Exception as e:
+                    print(f"Error processing depot {depot_name}: {e}")
+                    multi_result.errors[depot_name] = str(e)
+
+        return multi_result
@@ -0,0 +1,48 @@
+import queue
+import threading
+from typing import Iterable, Iterator
+
+_END = object()
+
+
+def iter_in_background(items: Iterable, maxsize: int) -> Iterator:
+    """
+    Recorre items en un hilo aparte, dejando hasta maxsize elementos listos en
+    una cola acotada. Las excepciones del hilo se propagan al consumidor; si el
+    consumidor deja de iterar, el hilo se detiene.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+    stopped = threading.Event()
+
+    def put(entry) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((_END, e))
+            return
+        put((_END, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
@@ -1,10 +1,49 @@
+from concurrent.futures import ProcessPoolExecutor
+import copy
+from dataclasses import dataclass
+from typing import Iterable
+import numpy as np
 import pandas as pd
 import math
 from difflib import SequenceMatcher
 
+from src.config import Config
+from src.categoricals import categorical_groupby, restore_categoricals
+from src.core.error_collector import ErrorCollector
+from src.core.protocol_matcher import ProtocolMatcher
+
+
+@dataclass(frozen=True, slots=True)
+class ServiceRecord:
+    """Datos de un servicio configurado necesarios para valorizar el almacenamiento."""
+    match_name: str  # Nombre del servicio normalizado (strip + upper) para la búsqueda difusa
+    service_id: object
+    position_type: str
+    price_usd: float
+
+
+# Índice de protocolos de cada proceso de trabajo (ver _init_matching_worker)
+_worker_matcher: ProtocolMatcher | None = None
+
+
+def _init_matching_worker(protocols: list[tuple[object, object]], threshold: float) -> None:
+    """Construye el índice de protocolos una sola vez por proceso de trabajo."""
+    global _worker_matcher
+    _worker_matcher = ProtocolMatcher(protocols, threshold)
+
+
+def _match_protocol(normalized_protocol: str) -> tuple[object, object] | None:
+    return _worker_matcher.find(normalized_protocol)
+
+
 class PriceCalculator:
-    def __init__(self, services_df: pd.DataFrame):
+    BILLING_COLUMNS = ['PROTOCOL', 'MATCHED_PROTOCOL', 'PROTOCOL_ID', 'POTENTIAL_SERVICE', 'SERVICE_ID', 'DESCRIPTION', 'STORAGE_TYPE', 'SERVICE_POSITION_TYPE', 'AMOUNT_OF_KITS', 'DISTINCT_POSITIONS', 'CONVERTED_POSITIONS', 'PRICE_USD', 'TOTAL_PRICE', 'ERROR']
+
+    def __init__(self, services_df: pd.DataFrame, billing_engine: str | None = None, matching_workers: int | None = None):
         self.services_df = services_df
+        # "vectorized" o "rowwise"; ambos producen el mismo DataFrame
+        self.billing_engine = billing_engine or Config.BILLING_ENGINE
+        self.matching_workers = max(1, matching_workers or Config.MATCHING_WORKERS)
         self.transformation_matrix = pd.DataFrame(
             {
                 "Pallet" : {"Pallet": 1.0, "Shelf": 2.0, "Bin": 8.0},
@@ -12,10 +51,39 @@ class PriceCalculator:
                 "Bin" : {"Pallet": 0.125, "Shelf": 0.250, "Bin": 1.0}
             }
         )
+        self.protocol_matcher = ProtocolMatcher.from_services(services_df)
+        self.services_by_protocol = self._build_services_index(services_df)
         self.protocol_memo = {}
         self.service_memo = {}
 
-        self.protocols_with_errors = pd.DataFrame(columns=['PROTOCOL', 'MATCHED_PROTOCOL', 'PROTOCOL_ID', 'POTENTIAL_SERVICE', 'SERVICE_ID', 'DESCRIPTION', 'STORAGE_TYPE', 'AMOUNT_OF_KITS', 'DISTINCT_POSITIONS', 'ERROR', 'FILE_NAME'])
+        self._error_collector = ErrorCollector()
+
+    def fresh_copy(self) -> "PriceCalculator":
+        """
+        Retorna un calculador para una nueva ejecución con la misma configuración.
+
+        Comparte la configuración, los índices y los memos de coincidencias (que
+        solo dependen de la configuración), pero tiene su propio registro de errores.
+        """
+        calculator = copy.copy(self)
+        calculator._error_collector = ErrorCollector()
+        return calculator
+
+    @staticmethod
+    def _build_services_index(services_df: pd.DataFrame) -> dict[object, list[ServiceRecord]]:
+        """Agrupa los servicios configurados por protocolo, conservando su orden."""
+        services_by_protocol: dict[object, list[ServiceRecord]] = {}
+        columns = ['Protocol', 'Service', 'Service ID', 'Position Type', 'Price_USD']
+        if services_df.empty or not set(columns).issubset(services_df.columns):
+            return services_by_protocol
+        
+        for protocol, service, service_id, position_type, price_usd in services_df[columns].itertuples(index=False, name=None):
+            if pd.isna(protocol):
+                continue
+            services_by_protocol.setdefault(protocol, []).append(
+                ServiceRecord(str(service).strip().upper(), service_id, position_type, price_usd)
+            )
+        return services_by_protocol
 
     def _add_protocol_with_error(self, 
             inventory_protocol: str, matched_protocol: str, 
@@ -24,39 +92,22 @@ class PriceCalculator:
             storage_type: str, amount_of_kits: int, distinct_positions: int,
             error_message: str, file_name: str):
         
-        if not (
-            (self.protocols_with_errors['PROTOCOL'] == inventory_protocol) & 
-            (self.protocols_with_errors['POTENTIAL_SERVICE'] == potential_service) & 
-            (self.protocols_with_errors['DESCRIPTION'] == description) &
-            (self.protocols_with_errors['STORAGE_TYPE'] == storage_type) &
-            (self.protocols_with_errors['ERROR'] == error_message)
-            ).any():
-
-            self.protocols_with_errors = pd.concat([
-                self.protocols_with_errors,
-                pd.DataFrame([{
-                    'PROTOCOL': inventory_protocol,
-                    'MATCHED_PROTOCOL': matched_protocol,
-                    'PROTOCOL_ID': protocol_id,
-                    'POTENTIAL_SERVICE': potential_service,
-                    'SERVICE_ID': service_id,
-                    'DESCRIPTION': description,
-                    'STORAGE_TYPE': storage_type,
-                    'AMOUNT_OF_KITS': amount_of_kits,
-                    'DISTINCT_POSITIONS': distinct_positions,
-                    'ERROR': error_message,
-                    'FILE_NAME': file_name
-                }])
-            ], ignore_index=True)
-
+        self._error_collector.add((
+            inventory_protocol, matched_protocol, protocol_id, potential_service,
+            service_id, description, storage_type, amount_of_kits, distinct_positions,
+            error_message, file_name
+        ))
 
     def _convertFromTo(self, amount_of_positions: int, from_type: str, to_type: str) -> int:
         """Convierte la cantidad de posiciones de un tipo a otro usando la matriz de transformación."""
         if from_type not in self.transformation_matrix.columns or to_type not in self.transformation_matrix.columns:
-            raise ValueError(f"Invalid from_type '{from_type}' or to_type '{to_type}'. Valid types are: {self.transformation_matrix.columns.tolist()}")
+            raise ValueError(self._conversion_error_message(from_type, to_type))
         converted = amount_of_positions * self.transformation_matrix[from_type][to_type]
         return math.ceil(converted)  # Redondear hacia arriba
 
+    def _conversion_error_message(self, from_type: str, to_type: str) -> str:
+        return f"Invalid from_type '{from_type}' or to_type '{to_type}'. Valid types are: {self.transformation_matrix.columns.tolist()}"
+
     def _find_best_protocol_match(self, inventory_protocol: str) -> tuple[str, str]:
         """
         Busca el protocolo más parecido en la configuración de servicios.
@@ -68,27 +119,55 @@ class PriceCalculator:
         if inventory_protocol in self.protocol_memo:
             return self.protocol_memo[inventory_protocol]
 
-        protocol_name = ""
-        protocol_id = ""
-        max_similarity = 0.85
-        
         inventory_protocol = str(inventory_protocol).strip().upper()
+        if inventory_protocol in self.protocol_memo:
+            return self.protocol_memo[inventory_protocol]
         
-        for _, row in self.services_df[['Protocol', 'Protocol ID']].drop_duplicates().iterrows():
-            service_protocol = str(row['Protocol']).strip().upper()
-            similarity = SequenceMatcher(None, inventory_protocol, service_protocol).ratio()
-            if similarity > max_similarity:
-                protocol_name = row['Protocol']
-                protocol_id = row['Protocol ID']
-                max_similarity = similarity
+        # Índice construido una sola vez: equivale a recorrer todos los protocolos
+        # configurados y quedarse con el de mayor similitud sobre 0.85
+        best_match = self.protocol_matcher.find(inventory_protocol)
+        protocol_name, protocol_id = best_match if best_match is not None else ("", "")
         
         self.protocol_memo[inventory_protocol] = (protocol_name, protocol_id)
         return (protocol_name, protocol_id)
 
-    def _find_matching_service(self, protocol: str, potential_service: str) -> pd.Series | None:
+    def match_protocols(self, inventory_protocols: Iterable[str]) -> None:
+        """
+        Busca en lote los protocolos que todavía no están en protocol_memo y completa el memo.
+
+        Con matching_workers > 1 y suficientes protocolos pendientes, la búsqueda se
+        reparte en un pool de procesos; cada proceso recibe la lista de protocolos
+        configurados una sola vez, al inicializarse. El resultado es el mismo que el
+        de _find_best_protocol_match.
+        """
+        pending_protocols = []
+        for inventory_protocol in inventory_protocols:
+            if pd.isna(inventory_protocol) or inventory_protocol == "" or inventory_protocol in self.protocol_memo:
+                continue
+            normalized_protocol = str(inventory_protocol).strip().upper()
+            if normalized_protocol not in self.protocol_memo:
+                pending_protocols.append(normalized_protocol)
+        pending_protocols = list(dict.fromkeys(pending_protocols))
+        
+        if self.matching_workers > 1 and len(pending_protocols) >= Config.MATCHING_PARALLEL_MIN_PROTOCOLS:
+            workers = min(self.matching_workers, len(pending_protocols))
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_matching_worker,
+                initargs=(self.protocol_matcher.protocols, self.protocol_matcher.threshold)
+            ) as executor:
+                chunksize = max(1, len(pending_protocols) // (workers * 4))
+                matches = list(executor.map(_match_protocol, pending_protocols, chunksize=chunksize))
+        else:
+            matches = [self.protocol_matcher.find(protocol) for protocol in pending_protocols]
+        
+        for normalized_protocol, best_match in zip(pending_protocols, matches):
+            self.protocol_memo[normalized_protocol] = best_match if best_match is not None else ("", "")
+
+    def _find_matching_service(self, protocol: str, potential_service: str) -> ServiceRecord | None:
         """
         Busca el servicio que coincida con el protocolo y el servicio potencial.
-        Retorna la fila del servicio encontrado o None.
+        Retorna el servicio encontrado o None.
         """
         if protocol == "" or potential_service == "":
             return None
@@ -97,10 +176,10 @@ class PriceCalculator:
         if cache_key in self.service_memo:
             return self.service_memo[cache_key]
         
-        # Filtrar por protocolo
-        protocol_services = self.services_df[self.services_df['Protocol'] == protocol]
+        # Servicios del protocolo desde el índice precalculado
+        protocol_services = self.services_by_protocol.get(protocol)
         
-        if protocol_services.empty:
+        if not protocol_services:
             return None
         
         # Buscar el servicio más parecido al POTENTIAL_SERVICE
@@ -108,12 +187,11 @@ class PriceCalculator:
         best_match = None
         best_score = 0.85
         
-        for _, row in protocol_services.iterrows():
-            service_name = str(row['Service']).strip().upper()
-            similarity = SequenceMatcher(None, potential_service_upper, service_name).ratio()
+        for service in protocol_services:
+            similarity = SequenceMatcher(None, potential_service_upper, service.match_name).ratio()
             if similarity > best_score:
                 best_score = similarity
-                best_match = row
+                best_match = service
         
         self.service_memo[cache_key] = best_match
         return best_match
@@ -125,7 +203,36 @@ class PriceCalculator:
         Returns:
             DataFrame con los protocolos con errores
         """
-        return self.protocols_with_errors.copy()
+        return self._error_collector.to_dataframe()
+
+    def get_error_protocol_names(self) -> set:
+        """Retorna el conjunto de protocolos que tuvieron errores hasta el momento."""
+        return self._error_collector.protocols()
+
+    def pop_error_protocols(self) -> pd.DataFrame:
+        """
+        Retorna los protocolos con errores acumulados y reinicia el registro.
+        Los memos de coincidencias se conservan.
+        """
+        error_protocols = self._error_collector.to_dataframe()
+        self._error_collector = ErrorCollector()
+        return error_protocols
+
+    def merge_worker_results(self, error_protocols: pd.DataFrame, protocol_memo: dict, service_memo: dict) -> None:
+        """
+        Incorpora los resultados de un calculador que procesó un archivo en otro proceso.
+
+        Debe llamarse en el mismo orden en que se procesarían los archivos en forma
+        secuencial, para conservar el FILE_NAME de la primera aparición de cada error.
+        """
+        for key, value in protocol_memo.items():
+            self.protocol_memo.setdefault(key, value)
+        for key, value in service_memo.items():
+            self.service_memo.setdefault(key, value)
+
+        self._error_collector.add_rows(
+            error_protocols[ErrorCollector.COLUMNS].itertuples(index=False, name=None)
+        )
 
     def calculate_storage_billing(self, inventory_report_df: pd.DataFrame, file_name: str) -> pd.DataFrame:
         """
@@ -145,8 +252,11 @@ class PriceCalculator:
             return pd.DataFrame()
         
         # Paso 1: Agrupar por PROTOCOL, POTENTIAL_SERVICE, STORAGE_TYPE, DESCRIPTION
-        grouped = inventory_report_df.groupby(
-            ['PROTOCOL', 'POTENTIAL_SERVICE', 'STORAGE_TYPE'], #, 'DESCRIPTION'],
+        # Las claves se agrupan como category y luego vuelven a su dtype original
+        group_columns = ['PROTOCOL', 'POTENTIAL_SERVICE', 'STORAGE_TYPE'] #, 'DESCRIPTION']
+        grouped = categorical_groupby(
+            inventory_report_df,
+            group_columns,
             as_index=False,
             dropna=False
         ).agg({
@@ -154,6 +264,13 @@ class PriceCalculator:
             'POSITION': 'nunique',  # Count distinct positions
             'DESCRIPTION': lambda x: '; '.join(x.dropna().unique())  # Keep descriptions as a list
         }).rename(columns={'POSITION': 'DISTINCT_POSITIONS'})
+        grouped = restore_categoricals(grouped, group_columns)
+        
+        # Paso 2 en lote para los protocolos sin coincidencia conocida
+        self.match_protocols(grouped['PROTOCOL'].unique())
+        
+        if self.billing_engine == "vectorized":
+            return self._calculate_billing_vectorized(grouped, file_name)
         
         # Preparar columnas de resultado
         result_rows = []
@@ -239,7 +356,7 @@ class PriceCalculator:
                 continue
             
             # Paso 4: Aplicar matriz de conversión
-            service_position_type = matching_service['Position Type']
+            service_position_type = matching_service.position_type
             
             try:
                 converted_positions = self._convertFromTo(
@@ -253,14 +370,14 @@ class PriceCalculator:
                     'MATCHED_PROTOCOL': matched_protocol,
                     'PROTOCOL_ID': protocol_id,
                     'POTENTIAL_SERVICE': potential_service,
-                    'SERVICE_ID': matching_service['Service ID'],
+                    'SERVICE_ID': matching_service.service_id,
                     'DESCRIPTION': description,
                     'STORAGE_TYPE': storage_type,
                     'SERVICE_POSITION_TYPE': service_position_type,
                     'AMOUNT_OF_KITS': amount_of_kits,
                     'DISTINCT_POSITIONS': distinct_positions,
                     'CONVERTED_POSITIONS': None,
-                    'PRICE_USD': matching_service['Price_USD'],
+                    'PRICE_USD': matching_service.price_usd,
                     'TOTAL_PRICE': None,
                     'ERROR': str(e)
                 })
@@ -269,7 +386,7 @@ class PriceCalculator:
                     matched_protocol=matched_protocol,
                     protocol_id=protocol_id,
                     potential_service=potential_service,
-                    service_id=matching_service['Service ID'],
+                    service_id=matching_service.service_id,
                     description=description,
                     storage_type=storage_type,
                     amount_of_kits=amount_of_kits,
@@ -280,7 +397,7 @@ class PriceCalculator:
                 continue
             
             # Paso 5: Calcular el precio
-            price_usd = matching_service['Price_USD']
+            price_usd = matching_service.price_usd
             total_price = converted_positions * price_usd if pd.notna(price_usd) else None
             
             result_rows.append({
@@ -288,7 +405,7 @@ class PriceCalculator:
                 'MATCHED_PROTOCOL': matched_protocol,
                 'PROTOCOL_ID': protocol_id,
                 'POTENTIAL_SERVICE': potential_service,
-                'SERVICE_ID': matching_service['Service ID'],
+                'SERVICE_ID': matching_service.service_id,
                 'DESCRIPTION': description,
                 'STORAGE_TYPE': storage_type,
                 'SERVICE_POSITION_TYPE': service_position_type,
@@ -300,4 +417,93 @@ class PriceCalculator:
                 'ERROR': None
             })
         
-        return pd.DataFrame(result_rows)
\ No newline at end of file
+        return pd.DataFrame(result_rows)
+
+    @staticmethod
+    def _object_column(values) -> np.ndarray:
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+
+    def _calculate_billing_vectorized(self, grouped: pd.DataFrame, file_name: str) -> pd.DataFrame:
+        """
+        Pasos 2 a 5 de calculate_storage_billing operando por columnas.
+
+        Las coincidencias se resuelven una vez por (PROTOCOL, POTENTIAL_SERVICE) y se
+        unen al reporte con un merge; la conversión de posiciones y los precios se
+        calculan sobre arreglos. El resultado es idéntico al del recorrido fila por fila.
+        """
+        if grouped.empty:
+            return pd.DataFrame()
+        
+        # Pasos 2 y 3: resolver protocolo y servicio por cada clave única
+        keys = grouped[['PROTOCOL', 'POTENTIAL_SERVICE']].drop_duplicates()
+        matches = []
+        for inventory_protocol, potential_service in keys.itertuples(index=False, name=None):
+            matched_protocol, protocol_id = self._find_best_protocol_match(inventory_protocol)
+            if matched_protocol == "":
+                matches.append((None, None, None, None, None, 'No matching protocol found'))
+                continue
+            
+            matching_service = self._find_matching_service(matched_protocol, potential_service)
+            if matching_service is None:
+                matches.append((matched_protocol, protocol_id, None, None, None, 'No matching service found'))
+                continue
+            
+            matches.append((
+                matched_protocol, protocol_id, matching_service.service_id,
+                matching_service.position_type, matching_service.price_usd, None
+            ))
+        
+        match_columns = ['MATCHED_PROTOCOL', 'PROTOCOL_ID', 'SERVICE_ID', 'SERVICE_POSITION_TYPE', 'PRICE_USD', 'ERROR']
+        keys = keys.reset_index(drop=True)
+        for i, column in enumerate(match_columns):
+            # dtype object explícito para conservar None (no NaN), como en el recorrido por filas
+            keys[column] = pd.Series(self._object_column([match[i] for match in matches]), dtype=object)
+        
+        billing = grouped.merge(keys, on=['PROTOCOL', 'POTENTIAL_SERVICE'], how='left', sort=False)
+        
+        # Paso 4: conversión de posiciones con la matriz de transformación
+        position_types = self.transformation_matrix.columns
+        matrix = self.transformation_matrix.reindex(index=position_types, columns=position_types).to_numpy()
+        from_codes = position_types.get_indexer(billing['STORAGE_TYPE'])
+        to_codes = position_types.get_indexer(billing['SERVICE_POSITION_TYPE'])
+        
+        error = billing['ERROR'].to_numpy(dtype=object, copy=True)
+        has_service = pd.isna(error)
+        convertible = has_service & (from_codes >= 0) & (to_codes >= 0)
+        conversion_failed = has_service & ~convertible
+        
+        storage_types = billing['STORAGE_TYPE'].to_numpy(dtype=object)
+        service_position_types = billing['SERVICE_POSITION_TYPE'].to_numpy(dtype=object)
+        for i in np.flatnonzero(conversion_failed):
+            error[i] = self._conversion_error_message(storage_types[i], service_position_types[i])
+        
+        factors = matrix[to_codes, from_codes]
+        converted = np.ceil(billing['DISTINCT_POSITIONS'].to_numpy(dtype=float) * factors)
+        converted_positions = np.full(len(billing), None, dtype=object)
+        converted_positions[convertible] = converted[convertible].astype(np.int64).tolist()
+        
+        # Paso 5: precio total
+        price_usd = pd.to_numeric(billing['PRICE_USD'], errors='coerce').to_numpy(dtype=float)
+        priced = convertible & ~np.isnan(price_usd)
+        total_price = np.full(len(billing), None, dtype=object)
+        total_price[priced] = (converted[priced] * price_usd[priced]).tolist()
+        
+        billing['CONVERTED_POSITIONS'] = converted_positions
+        billing['TOTAL_PRICE'] = total_price
+        billing['ERROR'] = error
+        
+        # Registrar errores en el orden del reporte
+        error_rows = billing.loc[~convertible, [
+            'PROTOCOL', 'MATCHED_PROTOCOL', 'PROTOCOL_ID', 'POTENTIAL_SERVICE', 'SERVICE_ID', 'DESCRIPTION',
+            'STORAGE_TYPE', 'AMOUNT_OF_KITS', 'DISTINCT_POSITIONS', 'ERROR'
+        ]].astype(object)
+        for row in error_rows.itertuples(index=False, name=None):
+            self._add_protocol_with_error(*row, file_name=file_name)
+        
+        # Misma inferencia de tipos que al construir el DataFrame desde filas
+        result = pd.DataFrame({
+            column: billing[column].to_numpy(dtype=object) for column in self.BILLING_COLUMNS
+        })
+        return result.infer_objects()
@@ -0,0 +1,131 @@
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+import math
+import pandas as pd
+
+
+def _ratio(matches: int, length: int) -> float:
+    """Misma fórmula que SequenceMatcher.ratio(), para comparar cotas sin diferencias de redondeo."""
+    return 2.0 * matches / length if length else 1.0
+
+
+class ProtocolMatcher:
+    """
+    Índice de protocolos configurados para la búsqueda difusa de protocolos.
+
+    Retorna el mismo resultado que comparar con SequenceMatcher.ratio() contra
+    todos los protocolos en orden (mayor similitud sobre el umbral; ante empate,
+    el primero), pero evita la mayoría de las comparaciones:
+
+    1. Los candidatos que comparten más trigramas con el protocolo buscado se
+       evalúan primero, para elevar rápidamente la mejor similitud conocida.
+    2. Solo se recorren los candidatos cuyo largo permite superarla
+       (cota 2 * min(la, lb) / (la + lb)).
+    3. Se descartan los candidatos cuya cota por caracteres en común
+       (equivalente a quick_ratio) no la supera.
+    """
+
+    NGRAM_SIZE = 3
+    SEED_CANDIDATES = 8
+
+    def __init__(self, protocols: list[tuple[object, object]], threshold: float = 0.85):
+        """
+        Args:
+            protocols: Pares (Protocol, Protocol ID) en el orden de la configuración
+            threshold: Similitud mínima (exclusiva) para aceptar una coincidencia
+        """
+        self.threshold = threshold
+        self._protocols = list(protocols)
+        self._texts = [str(protocol).strip().upper() for protocol, _ in self._protocols]
+        self._char_counts = [Counter(text) for text in self._texts]
+
+        # Índices ordenados por largo para recorrer solo la ventana de largos posibles
+        self._by_length = sorted(range(len(self._texts)), key=lambda i: (len(self._texts[i]), i))
+        self._sorted_lengths = [len(self._texts[i]) for i in self._by_length]
+
+        self._ngram_index: dict[str, list[int]] = defaultdict(list)
+        for i, text in enumerate(self._texts):
+            for ngram in self._ngrams(text):
+                self._ngram_index[ngram].append(i)
+
+    @classmethod
+    def from_services(cls, services_df: pd.DataFrame, threshold: float = 0.85) -> "ProtocolMatcher":
+        """Construye el índice con los pares (Protocol, Protocol ID) de la configuración de servicios."""
+        if services_df.empty or not {'Protocol', 'Protocol ID'}.issubset(services_df.columns):
+            return cls([], threshold)
+        pairs = services_df[['Protocol', 'Protocol ID']].drop_duplicates()
+        return cls(list(pairs.itertuples(index=False, name=None)), threshold)
+
+    @property
+    def protocols(self) -> list[tuple[object, object]]:
+        """Pares (Protocol, Protocol ID) indexados, en el orden de la configuración."""
+        return list(self._protocols)
+
+    def _ngrams(self, text: str) -> set[str]:
+        if len(text) < self.NGRAM_SIZE:
+            return {text} if text else set()
+        return {text[i:i + self.NGRAM_SIZE] for i in range(len(text) - self.NGRAM_SIZE + 1)}
+
+    def find(self, inventory_protocol: str) -> tuple[object, object] | None:
+        """
+        Busca el protocolo más parecido.
+
+        Args:
+            inventory_protocol: Protocolo del inventario, ya normalizado (strip + upper)
+
+        Returns:
+            (Protocol, Protocol ID) de la mejor coincidencia, o None si ninguna supera el umbral
+        """
+        text = inventory_protocol
+        text_length = len(text)
+        text_counts = Counter(text)
+
+        best_ratio = self.threshold
+        best_index: int | None = None
+        evaluated: set[int] = set()
+
+        def can_beat(upper_bound: float, i: int) -> bool:
+            # Un empate solo gana si el candidato aparece antes en la configuración
+            if upper_bound > best_ratio:
+                return True
+            return upper_bound == best_ratio and best_index is not None and i < best_index
+
+        def evaluate(i: int) -> None:
+            nonlocal best_ratio, best_index
+            if i in evaluated:
+                return
+            evaluated.add(i)
+
+            candidate = self._texts[i]
+            total_length = text_length + len(candidate)
+            if not can_beat(_ratio(min(text_length, len(candidate)), total_length), i):
+                return
+
+            candidate_counts = self._char_counts[i]
+            common_chars = sum(min(count, candidate_counts[char]) for char, count in text_counts.items())
+            if not can_beat(_ratio(common_chars, total_length), i):
+                return
+
+            similarity = SequenceMatcher(None, text, candidate).ratio()
+            if can_beat(similarity, i):
+                best_ratio = similarity
+                best_index = i
+
+        shared_ngrams: Counter = Counter()
+        for ngram in self._ngrams(text):
+            shared_ngrams.update(self._ngram_index.get(ngram, ()))
+        for i, _ in shared_ngrams.most_common(self.SEED_CANDIDATES):
+            evaluate(i)
+
+        # Ventana de largos lb con 2 * min(la, lb) / (la + lb) >= best_ratio (con margen)
+        min_length = math.floor(text_length * best_ratio / (2 - best_ratio)) - 1
+        max_length = math.ceil(text_length * (2 - best_ratio) / best_ratio) + 1
+        start = bisect_left(self._sorted_lengths, min_length)
+        end = bisect_right(self._sorted_lengths, max_length)
+        for i in self._by_length[start:end]:
+            evaluate(i)
+
+        if best_index is None:
+            return None
+        return self._protocols[best_index]
@@ -0,0 +1,74 @@
+import math
+
+
+class QuantileSketch:
+    """
+    Resumen compacto de una distribución de valores para estimar percentiles.
+
+    Agrupa los valores en intervalos de crecimiento geométrico (como DDSketch):
+    cada percentil se estima con un error relativo de a lo sumo
+    relative_accuracy, y la memoria depende del rango de los valores, no de su
+    cantidad. El resultado no depende del orden en que se agregan los valores.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+
+        # {índice del intervalo: cantidad de valores}; los negativos se guardan por su valor absoluto
+        self._positive_counts: dict[int, int] = {}
+        self._negative_counts: dict[int, int] = {}
+        self._zero_count = 0
+        self.count = 0
+
+    def _key(self, value: float) -> int:
+        # El intervalo k contiene los valores de (gamma^(k-1), gamma^k]
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        # Punto del intervalo con el menor error relativo hacia ambos extremos
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def add(self, value: float) -> None:
+        """Agrega un valor (los valores vacíos se ignoran)."""
+        value = float(value)
+        if math.isnan(value):
+            return
+
+        if value > 0:
+            key = self._key(value)
+            self._positive_counts[key] = self._positive_counts.get(key, 0) + 1
+        elif value < 0:
+            key = self._key(-value)
+            self._negative_counts[key] = self._negative_counts.get(key, 0) + 1
+        else:
+            self._zero_count += 1
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Valor estimado del cuantil q (entre 0 y 1), o None si no hay valores.
+
+        Corresponde al valor en la posición floor(q * (count - 1)) de los valores
+        ordenados (como numpy.percentile con method="lower").
+        """
+        if not self.count:
+            return None
+
+        rank = math.floor(q * (self.count - 1))
+        cumulative = 0
+        for key in sorted(self._negative_counts, reverse=True):
+            cumulative += self._negative_counts[key]
+            if cumulative > rank:
+                return -self._value(key)
+
+        cumulative += self._zero_count
+        if cumulative > rank:
+            return 0.0
+
+        for key in sorted(self._positive_counts):
+            cumulative += self._positive_counts[key]
+            if cumulative > rank:
+                return self._value(key)
+        return self._value(max(self._positive_counts))
@@ -0,0 +1,238 @@
+import json
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+import pandas as pd
+
+from src.config import Config
+from src.core.error_collector import ErrorCollector
+
+
+class RunManifest:
+    """
+    Registro persistente (SQLite) de los reportes procesados en ejecuciones anteriores.
+
+    Por cada depósito guarda la huella de la configuración usada y, por cada
+    archivo procesado, su huella, los totales por protocolo y las filas de
+    protocolos con errores. Con esto una ejecución incremental solo valoriza los
+    archivos nuevos o modificados y recalcula los máximos a partir de los totales
+    guardados. Los reportes de facturación se guardan en Parquet junto a la base
+    (carpeta <nombre>_reports), que conserva los tipos y valores exactos de cada
+    columna, y solo se leen los de los archivos que tienen algún máximo.
+    """
+
+    ERROR_COLUMNS = ErrorCollector.COLUMNS
+
+    # Versión de las tablas: un registro con otra versión se descarta (y todo se reprocesa)
+    SCHEMA_VERSION = 3
+
+    def __init__(self, db_path: Path = Config.RUN_MANIFEST_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.reports_folder = self.db_path.with_name(f"{self.db_path.stem}_reports")
+        # Varios depósitos pueden usar el registro a la vez: se espera a que se libere el bloqueo
+        self._connection = sqlite3.connect(self.db_path, timeout=60)
+        self._create_tables()
+
+    def _create_tables(self) -> None:
+        (schema_version,) = self._connection.execute("PRAGMA user_version").fetchone()
+        if schema_version != self.SCHEMA_VERSION:
+            with self._connection:
+                for table in ("depot_configs", "processed_files", "protocol_totals", "error_protocols"):
+                    self._connection.execute(f"DROP TABLE IF EXISTS {table}")
+                self._connection.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            shutil.rmtree(self.reports_folder, ignore_errors=True)
+            # Libera el espacio de las tablas descartadas
+            self._connection.execute("VACUUM")
+
+        # Columnas sin tipo: conservan el tipo original de cada valor (texto o número)
+        error_columns = ",\n".join(self.ERROR_COLUMNS)
+        with self._connection:
+            self._connection.executescript(f"""
+                CREATE TABLE IF NOT EXISTS depot_configs (
+                    depot TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS processed_files (
+                    depot TEXT NOT NULL,
+                    file_name TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    json_columns TEXT NOT NULL,  -- columnas del reporte guardado codificadas en JSON
+                    PRIMARY KEY (depot, file_name)
+                );
+                CREATE TABLE IF NOT EXISTS protocol_totals (
+                    depot TEXT NOT NULL,
+                    file_name TEXT NOT NULL,
+                    protocol NOT NULL,  -- sin tipo: conserva el tipo original (texto o número)
+                    protocol_rank INTEGER NOT NULL,
+                    total_price REAL NOT NULL,
+                    PRIMARY KEY (depot, file_name, protocol)
+                );
+                -- report_file: archivo registrado (las filas tienen su propia columna FILE_NAME)
+                CREATE TABLE IF NOT EXISTS error_protocols (
+                    depot TEXT NOT NULL,
+                    report_file TEXT NOT NULL,
+                    row_number INTEGER NOT NULL,
+                    {error_columns},
+                    PRIMARY KEY (depot, report_file, row_number)
+                );
+            """)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "RunManifest":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def get_config_fingerprint(self, depot: str) -> str | None:
+        row = self._connection.execute(
+            "SELECT fingerprint FROM depot_configs WHERE depot = ?", (depot,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def reset_depot(self, depot: str, config_fingerprint: str) -> None:
+        """Descarta todos los archivos registrados del depósito y guarda la nueva huella de configuración."""
+        with self._connection:
+            for table in ("processed_files", "protocol_totals", "error_protocols"):
+                self._connection.execute(f"DELETE FROM {table} WHERE depot = ?", (depot,))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO depot_configs (depot, fingerprint) VALUES (?, ?)",
+                (depot, config_fingerprint)
+            )
+        shutil.rmtree(self.reports_folder / depot, ignore_errors=True)
+
+    def get_file_fingerprints(self, depot: str) -> dict[str, str]:
+        """Retorna {nombre_archivo: huella} de los archivos registrados del depósito."""
+        rows = self._connection.execute(
+            "SELECT file_name, fingerprint FROM processed_files WHERE depot = ?", (depot,)
+        )
+        return dict(rows.fetchall())
+
+    def remove_files(self, depot: str, file_names: list[str]) -> None:
+        with self._connection:
+            for file_name in file_names:
+                self._delete_file(depot, file_name)
+                self._connection.execute(
+                    "DELETE FROM processed_files WHERE depot = ? AND file_name = ?", (depot, file_name)
+                )
+        for file_name in file_names:
+            self._report_path(depot, file_name).unlink(missing_ok=True)
+
+    def save_file(self, depot: str, file_name: str, fingerprint: str,
+                  protocol_totals: pd.Series, error_protocols: pd.DataFrame,
+                  billing_report: pd.DataFrame) -> None:
+        """
+        Registra (o reemplaza) un archivo procesado.
+
+        Args:
+            protocol_totals: Serie {protocolo: total} en el orden de aparición en el reporte
+            error_protocols: Filas de protocolos con errores del archivo (columnas de ErrorCollector)
+            billing_report: Reporte de facturación del archivo
+        """
+        # Parquet no admite columnas object con tipos mezclados (p. ej. IDs numéricos y de texto):
+        # se guardan como el JSON de cada valor, que conserva su tipo (también None y NaN)
+        json_columns = [column for column in billing_report.columns if billing_report[column].dtype == object]
+        stored_report = billing_report.assign(**{
+            column: billing_report[column].map(self._json_value) for column in json_columns
+        })
+
+        # El reporte se escribe antes de registrar el archivo: si falla, el archivo no queda registrado
+        report_path = self._report_path(depot, file_name)
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = report_path.with_name(f".{report_path.name}.tmp")
+        try:
+            stored_report.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, report_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        error_rows = [] if error_protocols.empty else [
+            (depot, file_name, row_number, *map(self._sql_value, values))
+            for row_number, values in enumerate(
+                error_protocols[self.ERROR_COLUMNS].itertuples(index=False, name=None)
+            )
+        ]
+        with self._connection:
+            self._delete_file(depot, file_name)
+            self._connection.executemany(
+                "INSERT INTO protocol_totals (depot, file_name, protocol, protocol_rank, total_price) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (depot, file_name, self._sql_value(protocol), rank, float(total))
+                    for rank, (protocol, total) in enumerate(protocol_totals.items())
+                ]
+            )
+            self._connection.executemany(
+                f"INSERT INTO error_protocols (depot, report_file, row_number, {', '.join(self.ERROR_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(self.ERROR_COLUMNS) + 3))})",
+                error_rows
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO processed_files (depot, file_name, fingerprint, json_columns) VALUES (?, ?, ?, ?)",
+                (depot, file_name, fingerprint, json.dumps(json_columns))
+            )
+
+    def _delete_file(self, depot: str, file_name: str) -> None:
+        """Borra los totales y errores registrados de un archivo (dentro de una transacción)."""
+        self._connection.execute(
+            "DELETE FROM protocol_totals WHERE depot = ? AND file_name = ?", (depot, file_name)
+        )
+        self._connection.execute(
+            "DELETE FROM error_protocols WHERE depot = ? AND report_file = ?", (depot, file_name)
+        )
+
+    def _report_path(self, depot: str, file_name: str) -> Path:
+        return self.reports_folder / depot / f"{file_name}.parquet"
+
+    @staticmethod
+    def _json_value(value) -> str:
+        return json.dumps(value.item() if hasattr(value, "item") else value)
+
+    @staticmethod
+    def _sql_value(value):
+        # Los valores vacíos se guardan como NULL y los escalares de numpy (p. ej. protocolos
+        # numéricos) no son tipos válidos para sqlite3
+        if pd.isna(value):
+            return None
+        return value.item() if hasattr(value, "item") else value
+
+    def get_protocol_totals(self, depot: str, file_name: str) -> pd.Series:
+        """Retorna los totales por protocolo de un archivo, en el orden de aparición en el reporte."""
+        rows = self._connection.execute(
+            "SELECT protocol, total_price FROM protocol_totals WHERE depot = ? AND file_name = ? ORDER BY protocol_rank",
+            (depot, file_name)
+        ).fetchall()
+        return pd.Series(
+            [total for _, total in rows],
+            index=pd.Index([protocol for protocol, _ in rows], dtype=object),
+            dtype=float
+        )
+
+    def get_error_protocols(self, depot: str, file_name: str) -> pd.DataFrame:
+        """Retorna las filas de protocolos con errores de un archivo (vacío si no tuvo errores)."""
+        rows = self._connection.execute(
+            f"SELECT {', '.join(self.ERROR_COLUMNS)} FROM error_protocols "
+            "WHERE depot = ? AND report_file = ? ORDER BY row_number",
+            (depot, file_name)
+        ).fetchall()
+        if not rows:
+            return pd.DataFrame()
+        return pd.DataFrame(rows, columns=self.ERROR_COLUMNS, dtype=object)
+
+    def has_billing_report(self, depot: str, file_name: str) -> bool:
+        return self._report_path(depot, file_name).exists()
+
+    def get_billing_report(self, depot: str, file_name: str) -> pd.DataFrame:
+        """Retorna el reporte de facturación guardado de un archivo, con los tipos y valores originales."""
+        (json_columns,) = self._connection.execute(
+            "SELECT json_columns FROM processed_files WHERE depot = ? AND file_name = ?", (depot, file_name)
+        ).fetchone()
+        billing_report = pd.read_parquet(self._report_path(depot, file_name))
+        for column in json.loads(json_columns):
+            billing_report[column] = pd.Series(
+                [json.loads(value) for value in billing_report[column]], index=billing_report.index, dtype=object
+            )
+        return billing_report
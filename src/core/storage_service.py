@@ -1,13 +1,28 @@
-from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator
 import pandas as pd
 import os
+import threading
 
-from src.config import Config
-from src.readers.exchanges_rate_excel_reader import ExchangesRateExcelReader
+from src.config import Config, DepotPaths
 from src.readers.depot_reader_factory import DepotReaderFactory
-from src.readers.service_configuration_excel_reader import ServiceConfigurationExcelReader
+from src.readers.config_registry import get_config_registry
+from src.readers.excel_reader import ExcelReader
+from src.readers.report_cache import ReportCache
+from src.fingerprint import data_fingerprint, file_fingerprint
+from src.core.error_collector import ErrorCollector
 from src.core.price_calculator import PriceCalculator
-from src.core.max_calculator import MaxCalculator
+from src.core.calculator_registry import get_calculator_registry
+from src.core.max_calculator import MaxCalculator, WindowedMaxCalculator
+from src.core.run_manifest import RunManifest
+from src.core.billing_history import BillingHistory
+from src.core.pipeline import iter_in_background
+from src.writers.excel_writer import ExcelOutputWriter, write_excel
+from src.writers.columnar_writer import ColumnarOutputWriter
 
 @dataclass
 class ProcessingResult:
@@ -17,26 +32,132 @@ class ProcessingResult:
     max_values: pd.DataFrame
     processed_files: list[str]
     skipped_files: list[str]
+    # True si los reportes de facturación ya se guardaron durante el procesamiento (streaming,
+    # incremental o Config.PIPELINE_STAGES)
+    billing_reports_saved: bool = False
+    # Máximos por ventana de tiempo (ver Config.MAX_VALUES_WINDOW) de las ventanas recalculadas
+    window_max_values: dict[str, pd.DataFrame] = field(default_factory=dict)
+    # Todas las ventanas con reportes, o None si no se calculan máximos por ventana
+    windows: list[str] | None = None
+    # Picos y percentiles de los totales diarios por protocolo (None si Config.PEAK_VALUES_TOP_K es 0)
+    peak_values: pd.DataFrame | None = None
+    protocol_percentiles: pd.DataFrame | None = None
+
+
+# Estado de cada proceso de trabajo (ver _init_pricing_worker)
+_worker_reader = None
+_worker_calculator: PriceCalculator | None = None
+_worker_report_cache: ReportCache | None = None
+
+
+def _init_pricing_worker(depot_name: str, services: pd.DataFrame, protocol_memo: dict, service_memo: dict,
+                         report_cache_folder: Path) -> None:
+    """Inicializa el lector y el calculador de precios de un proceso de trabajo."""
+    global _worker_reader, _worker_calculator, _worker_report_cache
+    _worker_reader = DepotReaderFactory.create_depot_reader(depot_name)
+    # Ya es un proceso de trabajo: la búsqueda en lote no abre otro pool
+    _worker_calculator = PriceCalculator(services, matching_workers=1)
+    _worker_calculator.protocol_memo.update(protocol_memo)
+    _worker_calculator.service_memo.update(service_memo)
+    _worker_report_cache = ReportCache(report_cache_folder)
+
+
+def _price_depot_report(file_path: Path, file_name: str) -> tuple[pd.DataFrame, pd.DataFrame, dict, dict]:
+    """
+    Lee y valoriza un reporte de depósito dentro de un proceso de trabajo.
+
+    Returns:
+        Tupla con el reporte de facturación, los errores del archivo y las
+        entradas nuevas de los memos de protocolos y servicios.
+    """
+    known_protocols = set(_worker_calculator.protocol_memo)
+    known_services = set(_worker_calculator.service_memo)
+
+    inventory_report = _worker_report_cache.read_excel(_worker_reader, file_path)
+    billing_report = _worker_calculator.calculate_storage_billing(inventory_report, file_name)
+    error_protocols = _worker_calculator.pop_error_protocols()
+
+    protocol_memo = {k: v for k, v in _worker_calculator.protocol_memo.items() if k not in known_protocols}
+    service_memo = {k: v for k, v in _worker_calculator.service_memo.items() if k not in known_services}
+    return billing_report, error_protocols, protocol_memo, service_memo
 
 
 class StorageService:
-    def __init__(self):
-        self._exchange_reader = ExchangesRateExcelReader()
-        self._service_config_reader: ServiceConfigurationExcelReader | None = None
+    # Versión de la lectura y valorización de reportes. Forma parte de la huella de configuración del
+    # RunManifest: incrementarla cuando cambie el cálculo de precios, errores o totales descarta los
+    # resultados guardados por ejecuciones anteriores
+    PRICING_VERSION = 1
+    
+    def __init__(self, workers: int | None = None):
         self._depot_factory = DepotReaderFactory()
-        self._depot_reader = self._depot_factory.create_depot_reader("PERI")
         self._price_calculator: PriceCalculator | None = None
         self._max_calculator: MaxCalculator | None = None
+        self._output_writer: ExcelOutputWriter | None = None  # Etapa de escritura activa (ver _writer_stage)
+        self._billing_history: BillingHistory | None = None  # Conexión abierta por _billing_history_stage
+        self._depot_readers: dict[str, ExcelReader] = {}
+        self._depot_name: str | None = None
+        self._set_depot("PERI")
+        self._workers = max(1, workers or Config.PROCESSING_WORKERS)
+        # price_report inicializa los calculadores una sola vez aunque lo llamen varios hilos
+        self._prepare_lock = threading.Lock()
+    
+    def _get_depot_reader(self, depot_name: str) -> ExcelReader:
+        """Lector del depósito; se crea uno solo por depósito (toma la configuración del registro en cada lectura)."""
+        depot_reader = self._depot_readers.get(depot_name)
+        if depot_reader is None:
+            depot_reader = self._depot_readers.setdefault(depot_name, self._depot_factory.create_depot_reader(depot_name))
+        return depot_reader
+    
+    def _set_depot(self, depot_name: str) -> None:
+        """Prepara el lector, las carpetas y los cachés del depósito (nada si ya es el depósito actual)."""
+        if depot_name == self._depot_name:
+            return
+        self._depot_name = depot_name
+        self._depot_reader = self._get_depot_reader(depot_name)
+        self._paths = DepotPaths.for_depot(depot_name)
+        self._report_cache = ReportCache(self._paths.report_cache_folder)
+        self._columnar_writer = ColumnarOutputWriter(self._paths.columnar_output_folder)
     
     def _initialize_calculators(self) -> None:
-        exchanges = self._exchange_reader.read_excel(Config.EXCHANGE_RATE_PATH)
-        self._service_config_reader = ServiceConfigurationExcelReader(exchanges)
-        services = self._service_config_reader.read_excel(Config.SERVICE_CONFIG_PATH)
-        self._price_calculator = PriceCalculator(services)
+        # Configuración y memos de coincidencias compartidos por el proceso: solo se vuelven a
+        # leer si cambió algún archivo de configuración
+        self._price_calculator = get_calculator_registry().get_price_calculator()
+    
+    def prepare(self) -> None:
+        """Carga la configuración y los memos de coincidencias guardados (p. ej. antes de atender solicitudes)."""
+        self._initialize_calculators()
+    
+    def save_match_cache(self) -> None:
+        """Guarda los memos de coincidencias para las próximas ejecuciones."""
+        if self._price_calculator is None:
+            return
+        get_calculator_registry().save_match_cache()
+    
+    @staticmethod
+    def is_depot_report(file: str) -> bool:
+        """Indica si el nombre de archivo corresponde a un reporte de depósito."""
+        return file.startswith("StockThermoFisher_ST_") and file.endswith(".xls")
+    
+    def _list_depot_files(self) -> tuple[list[str], list[str]]:
+        """Retorna (archivos de reportes de depósito, archivos saltados) en el orden del directorio."""
+        depot_files: list[str] = []
+        skipped_files: list[str] = []
+        
+        for file in os.listdir(self._paths.depot_reports_folder):
+            if not self.is_depot_report(file):
+                skipped_files.append(file)
+                continue
+            depot_files.append(file)
+        
+        return depot_files, skipped_files
     
     def process_depot_reports(self) -> tuple[dict[str, pd.DataFrame], list[str], list[str]]:
         """
         Procesa todos los reportes de depósito.
+
+        Con más de un worker configurado, la lectura y valorización de cada archivo
+        se reparte en un pool de procesos; los resultados se incorporan en el orden
+        original de los archivos, por lo que la salida es idéntica a la secuencial.
         
         Returns:
             Tupla con:
@@ -44,34 +165,80 @@ class StorageService:
                 - Lista de archivos procesados
                 - Lista de archivos saltados
         """
+        depot_files, skipped_files = self._list_depot_files()
+        billing_reports = dict(self._iter_billing_reports(depot_files))
+        
+        return billing_reports, depot_files, skipped_files
+    
+    def _iter_billing_reports(self, files: list[str]) -> Iterator[tuple[str, pd.DataFrame]]:
+        """Lee y valoriza los archivos indicados, generando (nombre_archivo, billing_report) en orden."""
         if self._price_calculator is None:
             self._initialize_calculators()
         
-        billing_reports: dict[str, pd.DataFrame] = {}
-        processed_files: list[str] = []
-        skipped_files: list[str] = []
-        
-        files = os.listdir(Config.DEPOT_REPORTS_FOLDER)
-        
+        if self._workers > 1 and len(files) > 1:
+            yield from self._iter_billing_reports_parallel(files)
+        else:
+            yield from self._iter_billing_reports_serial(files)
+    
+    def _read_inventory_reports(self, files: list[str]) -> Iterator[tuple[str, pd.DataFrame]]:
         for file in files:
-            if not (file.startswith("StockThermoFisher_ST_") and file.endswith(".xls")):
-                skipped_files.append(file)
-                continue
-            
+            file_path = self._paths.depot_reports_folder / file
+            yield file, self._report_cache.read_excel(self._depot_reader, file_path)
+    
+    def _iter_billing_reports_serial(self, files: list[str]) -> Iterator[tuple[str, pd.DataFrame]]:
+        inventory_reports = self._read_inventory_reports(files)
+        if Config.PIPELINE_STAGES and len(files) > 1:
+            # Etapa de lectura en otro hilo: el siguiente archivo se lee mientras se valoriza el actual
+            inventory_reports = iter_in_background(inventory_reports, Config.PIPELINE_QUEUE_SIZE)
+        
+        for file, inventory_report in inventory_reports:
             print(f"Processing file: {file}")
             
-            file_path = Config.DEPOT_REPORTS_FOLDER / file
-            inventory_report = self._depot_reader.read_excel(file_path)
-            
             file_name = os.path.splitext(file)[0]
             billing_report = self._price_calculator.calculate_storage_billing(
                 inventory_report, file_name
             )
             
-            billing_reports[file_name] = billing_report
-            processed_files.append(file)
+            yield file_name, billing_report
+    
+    def _iter_billing_reports_parallel(self, files: list[str]) -> Iterator[tuple[str, pd.DataFrame]]:
+        workers = min(self._workers, len(files))
         
-        return billing_reports, processed_files, skipped_files
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_pricing_worker,
+            initargs=(
+                self._depot_name,
+                self._price_calculator.services_df,
+                self._price_calculator.protocol_memo,
+                self._price_calculator.service_memo,
+                self._paths.report_cache_folder
+            )
+        ) as executor:
+            # Ventana acotada de tareas en curso: los resultados se consumen en el orden
+            # de entrada, así que errores y memos se fusionan como en una ejecución
+            # secuencial, y no se acumulan reportes terminados sin consumir.
+            pending: deque[tuple[str, str, Future]] = deque()
+            remaining = iter(files)
+            
+            def submit_next() -> None:
+                file = next(remaining, None)
+                if file is not None:
+                    file_name = os.path.splitext(file)[0]
+                    future = executor.submit(_price_depot_report, self._paths.depot_reports_folder / file, file_name)
+                    pending.append((file, file_name, future))
+            
+            for _ in range(2 * workers):
+                submit_next()
+            
+            while pending:
+                file, file_name, future = pending.popleft()
+                billing_report, error_protocols, protocol_memo, service_memo = future.result()
+                submit_next()
+                
+                print(f"Processing file: {file}")
+                self._price_calculator.merge_worker_results(error_protocols, protocol_memo, service_memo)
+                yield file_name, billing_report
     
     def calculate_max_values(
         self, 
@@ -94,13 +261,15 @@ class StorageService:
                 protocols_with_errors['PROTOCOL'].dropna().unique()
             )
         
-        self._max_calculator = MaxCalculator(protocols_with_errors=error_protocols_set)
+        self._max_calculator = MaxCalculator(
+            protocols_with_errors=error_protocols_set,
+            top_k=Config.PEAK_VALUES_TOP_K
+        )
         
-        for file_name, report in billing_reports.items():
-            self._max_calculator.optimize_daily_report(
-                report, 
-                f"output_{file_name}.xlsx"
-            )
+        self._max_calculator.optimize_reports({
+            f"output_{file_name}.xlsx": report
+            for file_name, report in billing_reports.items()
+        })
         
         return self._max_calculator.get_max_values()
     
@@ -110,17 +279,90 @@ class StorageService:
             return pd.DataFrame()
         return self._price_calculator.get_error_protocols()
     
-    def process_all(self, depot_name: str) -> ProcessingResult:
+    def price_report(self, file_path: Path, depot_name: str, file_name: str | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Valoriza un único reporte de depósito, que puede estar fuera de la carpeta de reportes.
+
+        Usa la configuración y los memos de coincidencias compartidos con un
+        calculador propio, por lo que puede llamarse desde varios hilos a la vez.
+        No guarda salidas ni registra el archivo en el RunManifest.
+
+        Raises:
+            ValueError: Si el depósito no es soportado o el reporte no se puede leer (o no tiene filas)
+
+        Returns:
+            Tupla con el reporte de facturación y los protocolos con errores
+        """
+        with self._prepare_lock:
+            if self._price_calculator is None:
+                self.prepare()
+        
+        depot_reader = self._get_depot_reader(depot_name)
+        price_calculator = get_calculator_registry().get_price_calculator()
+        
+        inventory_report = depot_reader.read_excel(file_path)
+        # El lector informa los errores de lectura y retorna un DataFrame vacío
+        if inventory_report.empty or len(inventory_report.columns) == 0:
+            raise ValueError(f"Could not read a {depot_name} depot report from {file_name or Path(file_path).name}")
+        
+        billing_report = price_calculator.calculate_storage_billing(
+            inventory_report, file_name or Path(file_path).stem
+        )
+        return billing_report, price_calculator.pop_error_protocols()
+    
+    def process_all(self, depot_name: str, streaming: bool | None = None, incremental: bool | None = None) -> ProcessingResult:
         """
         Ejecuta el flujo completo de procesamiento.
+
+        Args:
+            depot_name: Nombre del depósito
+            streaming: Si es True, cada reporte se guarda y se incorpora a los
+                máximos apenas se valoriza, sin mantener todos los reportes en
+                memoria. El resultado no incluye billing_reports. Por defecto
+                usa Config.STREAMING_PROCESSING.
+            incremental: Si es True, solo se valorizan los reportes nuevos o
+                modificados desde la ejecución anterior (ver _process_all_incremental).
+                Tiene prioridad sobre streaming. Por defecto usa
+                Config.INCREMENTAL_PROCESSING.
         
         Returns:
             ProcessingResult con todos los resultados
         """
-        self._depot_reader = self._depot_factory.create_depot_reader(depot_name)
+        self._set_depot(depot_name)
+        # Calculador nuevo en cada ejecución (sin errores de ejecuciones anteriores);
+        # la configuración y los memos se reutilizan desde el registro
+        self._initialize_calculators()
 
-        # Procesar reportes
-        billing_reports, processed_files, skipped_files = self.process_depot_reports()
+        if incremental is None:
+            incremental = Config.INCREMENTAL_PROCESSING
+        if streaming is None:
+            streaming = Config.STREAMING_PROCESSING
+        
+        with self._billing_history_stage():
+            if incremental:
+                result = self._process_all_incremental()
+            elif streaming:
+                result = self._process_all_streaming()
+            else:
+                result = self._process_all_batch()
+        
+        self.save_match_cache()
+        return result
+    
+    def _process_all_batch(self) -> ProcessingResult:
+        """Procesa todos los reportes en memoria y luego calcula los máximos."""
+        # Procesar reportes; con PIPELINE_STAGES la etapa de escritura guarda cada reporte
+        # mientras se valoriza el siguiente, y save_results ya no los escribe
+        if Config.PIPELINE_STAGES:
+            processed_files, skipped_files = self._list_depot_files()
+            self._remove_stale_outputs(os.path.splitext(file)[0] for file in processed_files)
+            billing_reports = {}
+            with self._writer_stage():
+                for file_name, billing_report in self._iter_billing_reports(processed_files):
+                    self._save_billing_report(file_name, billing_report)
+                    billing_reports[file_name] = billing_report
+        else:
+            billing_reports, processed_files, skipped_files = self.process_depot_reports()
         
         # Obtener errores
         error_protocols = self.get_error_protocols()
@@ -128,56 +370,463 @@ class StorageService:
         # Calcular máximos
         max_values = self.calculate_max_values(billing_reports, error_protocols)
         
-        return ProcessingResult(
+        result = ProcessingResult(
             billing_reports=billing_reports,
             error_protocols=error_protocols,
             max_values=max_values,
             processed_files=processed_files,
-            skipped_files=skipped_files
+            skipped_files=skipped_files,
+            billing_reports_saved=Config.PIPELINE_STAGES
         )
+        self._set_peak_results(result)
+        
+        if Config.MAX_VALUES_WINDOW:
+            window_calculator = WindowedMaxCalculator(Config.MAX_VALUES_WINDOW)
+            window_calculator.optimize_reports({
+                f"output_{file_name}.xlsx": report
+                for file_name, report in billing_reports.items()
+            })
+            result.window_max_values = window_calculator.get_max_values()
+            result.windows = list(result.window_max_values)
+        
+        return result
     
-    def save_results(self, result: ProcessingResult) -> None:
+    def _process_all_streaming(self) -> ProcessingResult:
+        """
+        Procesa los reportes de a uno: guarda cada reporte de facturación y
+        actualiza los máximos al terminarlo. Los protocolos con errores se informan
+        al MaxCalculator a medida que aparecen, por lo que el resultado es el mismo
+        que el del procesamiento completo.
         """
-        Guarda los resultados en archivos Excel.
+        depot_files, skipped_files = self._list_depot_files()
+        
+        self._remove_stale_outputs(os.path.splitext(file)[0] for file in depot_files)
+        self._max_calculator = MaxCalculator(top_k=Config.PEAK_VALUES_TOP_K)
+        window_calculator = WindowedMaxCalculator(Config.MAX_VALUES_WINDOW) if Config.MAX_VALUES_WINDOW else None
+        
+        with self._writer_stage():
+            for file_name, billing_report in self._iter_billing_reports(depot_files):
+                self._save_billing_report(file_name, billing_report)
+                
+                self._max_calculator.add_protocols_with_errors(self._price_calculator.get_error_protocol_names())
+                self._max_calculator.optimize_daily_report(billing_report, f"output_{file_name}.xlsx")
+                if window_calculator is not None:
+                    window_calculator.optimize_daily_report(billing_report, f"output_{file_name}.xlsx")
         
+        if self._price_calculator is not None:
+            self._max_calculator.add_protocols_with_errors(self._price_calculator.get_error_protocol_names())
+        
+        result = ProcessingResult(
+            billing_reports={},
+            error_protocols=self.get_error_protocols(),
+            max_values=self._max_calculator.get_max_values(),
+            processed_files=depot_files,
+            skipped_files=skipped_files,
+            billing_reports_saved=True
+        )
+        self._set_peak_results(result)
+        if window_calculator is not None:
+            result.window_max_values = window_calculator.get_max_values()
+            result.windows = list(result.window_max_values)
+        return result
+    
+    def _config_fingerprint(self) -> str:
+        """Huella de la configuración que afecta la valorización de los reportes del depósito."""
+        return data_fingerprint(
+            self.PRICING_VERSION,
+            self._depot_name,
+            # Marca de los libros de servicios y tipos de cambio; la huella del lector incluye el renombrado
+            get_config_registry().get_stamped_services()[0],
+            self._depot_reader.cache_fingerprint()
+        )
+    
+    def _process_all_incremental(self) -> ProcessingResult:
+        """
+        Procesa solo los reportes nuevos o modificados desde la ejecución anterior.
+
+        El registro de ejecuciones (RunManifest) guarda, por archivo, su huella, sus
+        totales por protocolo, sus errores y su reporte de facturación. Los errores y
+        los máximos se recalculan a partir de lo registrado, con el mismo resultado
+        que un procesamiento completo. Si cambió algún archivo de configuración o
+        PRICING_VERSION, se descarta el registro y se reprocesa todo.
+        """
+        depot_files, skipped_files = self._list_depot_files()
+        file_names = {file: os.path.splitext(file)[0] for file in depot_files}
+        
+        with RunManifest() as manifest:
+            config_fingerprint = self._config_fingerprint()
+            if manifest.get_config_fingerprint(self._depot_name) != config_fingerprint:
+                print("Configuration changed, reprocessing all files")
+                manifest.reset_depot(self._depot_name, config_fingerprint)
+            
+            self._paths.processed_reports_folder.mkdir(parents=True, exist_ok=True)
+            
+            # Archivos que ya no están en la carpeta de reportes
+            known_fingerprints = manifest.get_file_fingerprints(self._depot_name)
+            removed_files = [name for name in known_fingerprints if name not in file_names.values()]
+            manifest.remove_files(self._depot_name, removed_files)
+            self._remove_stale_outputs(file_names.values())
+            
+            fingerprints = {file: file_fingerprint(self._paths.depot_reports_folder / file) for file in depot_files}
+            history_files = self._billing_history_files()
+            pending_files = [
+                file for file in depot_files
+                if known_fingerprints.get(file_names[file]) != fingerprints[file]
+                or not manifest.has_billing_report(self._depot_name, file_names[file])
+                or not self._billing_report_path(file_names[file]).exists()
+                or (self._columnar_writer.enabled and not self._columnar_writer.has_part(file_names[file]))
+                or (history_files is not None and file_names[file] not in history_files)
+            ]
+            if len(pending_files) < len(depot_files):
+                print(f"Reusing {len(depot_files) - len(pending_files)} unchanged files")
+            
+            if pending_files:
+                pending_fingerprints = {file_names[file]: fingerprints[file] for file in pending_files}
+                with self._writer_stage():
+                    for file_name, billing_report in self._iter_billing_reports(pending_files):
+                        self._save_billing_report(file_name, billing_report)
+                        self._register_file(
+                            manifest,
+                            file_name,
+                            pending_fingerprints[file_name],
+                            billing_report,
+                            self._price_calculator.pop_error_protocols()
+                        )
+            
+            # Errores en el orden de los archivos, como en el procesamiento completo
+            error_collector = ErrorCollector()
+            for file_name in file_names.values():
+                error_protocols = manifest.get_error_protocols(self._depot_name, file_name)
+                if not error_protocols.empty:
+                    error_collector.add_rows(
+                        error_protocols[ErrorCollector.COLUMNS].itertuples(index=False, name=None)
+                    )
+            
+            self._max_calculator = MaxCalculator(
+                protocols_with_errors=error_collector.protocols(),
+                top_k=Config.PEAK_VALUES_TOP_K
+            )
+            self._max_calculator.optimize_from_totals(
+                {
+                    file_name: manifest.get_protocol_totals(self._depot_name, file_name)
+                    for file_name in file_names.values()
+                },
+                lambda file_name: manifest.get_billing_report(self._depot_name, file_name)
+            )
+            
+            result = ProcessingResult(
+                billing_reports={},
+                error_protocols=error_collector.to_dataframe(),
+                max_values=self._max_calculator.get_max_values(),
+                processed_files=depot_files,
+                skipped_files=skipped_files,
+                billing_reports_saved=True
+            )
+            self._set_peak_results(result)
+            if Config.MAX_VALUES_WINDOW:
+                changed_files = [file_names[file] for file in pending_files] + removed_files
+                result.window_max_values, result.windows = self._window_max_values_from_manifest(
+                    manifest, list(file_names.values()), changed_files
+                )
+            return result
+    
+    def process_new_files(self, previous: ProcessingResult, files: list[str]) -> ProcessingResult:
+        """
+        Incorpora archivos nuevos a los resultados de la ejecución incremental anterior.
+
+        Solo se valorizan los archivos indicados: sus errores se agregan a los
+        anteriores y sus reportes se incorporan a los máximos que quedaron en
+        memoria, en el orden de llegada. También se registran en el RunManifest,
+        por lo que la próxima ejecución incremental los reutiliza. Si no hay una
+        ejecución anterior en memoria o cambió la configuración, se hace un
+        procesamiento incremental completo.
+
         Args:
-            result: Resultado del procesamiento
+            previous: Resultado de la ejecución anterior de este servicio
+            files: Archivos nuevos de la carpeta de reportes (no incluidos en previous)
         """
-        Config.PROCESSED_REPORTS_FOLDER.mkdir(parents=True, exist_ok=True)
+        with RunManifest() as manifest:
+            config_changed = manifest.get_config_fingerprint(self._depot_name) != self._config_fingerprint()
+        if self._max_calculator is None or self._price_calculator is None or config_changed:
+            return self.process_all(self._depot_name, incremental=True)
+        
+        error_collector = ErrorCollector()
+        if not previous.error_protocols.empty:
+            error_collector.add_rows(
+                previous.error_protocols[ErrorCollector.COLUMNS].itertuples(index=False, name=None)
+            )
+        
+        fingerprints = {
+            os.path.splitext(file)[0]: file_fingerprint(self._paths.depot_reports_folder / file)
+            for file in files
+        }
+        with RunManifest() as manifest:
+            with self._writer_stage():
+                for file_name, billing_report in self._iter_billing_reports(files):
+                    self._save_billing_report(file_name, billing_report)
+                    error_protocols = self._price_calculator.pop_error_protocols()
+                    self._register_file(manifest, file_name, fingerprints[file_name], billing_report, error_protocols)
+                    
+                    if not error_protocols.empty:
+                        error_collector.add_rows(
+                            error_protocols[ErrorCollector.COLUMNS].itertuples(index=False, name=None)
+                        )
+                    self._max_calculator.add_protocols_with_errors(error_collector.protocols())
+                    self._max_calculator.optimize_daily_report(billing_report, f"output_{file_name}.xlsx")
+            
+            result = ProcessingResult(
+                billing_reports={},
+                error_protocols=error_collector.to_dataframe(),
+                max_values=self._max_calculator.get_max_values(),
+                processed_files=previous.processed_files + list(files),
+                skipped_files=previous.skipped_files,
+                billing_reports_saved=True
+            )
+            self._set_peak_results(result)
+            if Config.MAX_VALUES_WINDOW:
+                result.window_max_values, result.windows = self._window_max_values_from_manifest(
+                    manifest, [os.path.splitext(file)[0] for file in result.processed_files], fingerprints.keys()
+                )
+        
+        self.save_match_cache()
+        return result
+    
+    def _register_file(
+        self,
+        manifest: RunManifest,
+        file_name: str,
+        fingerprint: str,
+        billing_report: pd.DataFrame,
+        error_protocols: pd.DataFrame
+    ) -> None:
+        """Registra un archivo valorizado en el RunManifest; si no se puede, el archivo se vuelve a procesar en la próxima ejecución."""
+        if billing_report.empty:
+            # El lector informa el error (archivo bloqueado, incompleto o dañado) y retorna un reporte
+            # vacío: el archivo no se registra, para volver a intentarlo en la próxima ejecución
+            manifest.remove_files(self._depot_name, [file_name])
+            return
+        
+        try:
+            manifest.save_file(
+                self._depot_name,
+                file_name,
+                fingerprint,
+                MaxCalculator.protocol_totals(billing_report),
+                error_protocols,
+                billing_report
+            )
+        except Exception as e:
+            print(f"Error registering {file_name} in the run manifest: {e}")
+            manifest.remove_files(self._depot_name, [file_name])
+    
+    def _set_peak_results(self, result: ProcessingResult) -> None:
+        """Agrega al resultado los picos y percentiles por protocolo del calculador de máximos, si están habilitados."""
+        if Config.PEAK_VALUES_TOP_K:
+            result.peak_values = self._max_calculator.get_peak_values()
+            result.protocol_percentiles = self._max_calculator.get_protocol_percentiles()
+    
+    def _window_max_values_from_manifest(
+        self,
+        manifest: RunManifest,
+        file_names: list[str],
+        changed_files: Iterable[str]
+    ) -> tuple[dict[str, pd.DataFrame], list[str]]:
+        """
+        Recalcula, a partir de lo registrado en el RunManifest, los máximos de las
+        ventanas con archivos nuevos, modificados o eliminados y de las ventanas
+        cuyo archivo de salida no existe. Las demás ventanas no cambian.
 
-        # Eliminar archivos existentes en processed_reports
-        for existing_file in Config.PROCESSED_REPORTS_FOLDER.glob("output_*.xlsx"):
+        Returns:
+            (máximos de las ventanas recalculadas, todas las ventanas con reportes)
+        """
+        window_calculator = WindowedMaxCalculator(Config.MAX_VALUES_WINDOW)
+        windows = window_calculator.group_by_window(file_names)
+        affected_windows = {window_calculator.window_key(file_name) for file_name in changed_files}
+        affected_windows |= {window for window in windows if not self._window_max_values_path(window).exists()}
+        
+        affected_files = [
+            file_name for window, window_files in windows.items() if window in affected_windows
+            for file_name in window_files
+        ]
+        file_error_protocols = {}
+        for file_name in affected_files:
+            error_protocols = manifest.get_error_protocols(self._depot_name, file_name)
+            file_error_protocols[file_name] = set(error_protocols['PROTOCOL'].dropna()) if not error_protocols.empty else set()
+        
+        window_calculator.optimize_from_totals(
+            {file_name: manifest.get_protocol_totals(self._depot_name, file_name) for file_name in affected_files},
+            file_error_protocols,
+            lambda file_name: manifest.get_billing_report(self._depot_name, file_name)
+        )
+        return window_calculator.get_max_values(), list(windows)
+    
+    def _window_max_values_path(self, window: str) -> Path:
+        return self._paths.window_max_values_folder / f"max_values_{window}.xlsx"
+    
+    def _remove_stale_outputs(self, file_names: Iterable[str]) -> None:
+        """Elimina los reportes de facturación de processed_reports (y sus partes columnares) que no corresponden a los archivos indicados."""
+        file_names = list(file_names)
+        expected_outputs = {self._billing_report_path(file_name).name for file_name in file_names}
+        self._columnar_writer.remove_stale_parts(file_names)
+        
+        for existing_file in self._paths.processed_reports_folder.glob("output_*.xlsx"):
+            if existing_file.name in expected_outputs:
+                continue
             try:
                 existing_file.unlink()
             except Exception as e:
                 print(f"Error deleting existing file {existing_file}: {e}")
-
-        # Guardar reportes de facturación
-        for file_name, billing_report in result.billing_reports.items():
-            output_path = Config.PROCESSED_REPORTS_FOLDER / f"output_{file_name}.xlsx"
+    
+    def _billing_report_path(self, file_name: str) -> Path:
+        return self._paths.processed_reports_folder / f"output_{file_name}.xlsx"
+    
+    @contextmanager
+    def _writer_stage(self):
+        """
+        Dentro del bloque, _save_billing_report entrega los reportes a un
+        ExcelOutputWriter, que los escribe en hilos aparte (cola acotada) mientras
+        continúa el procesamiento y no reescribe los archivos cuyo contenido no
+        cambió. Al salir se esperan todas las escrituras.
+        """
+        with self._billing_history_stage(), ExcelOutputWriter(
+            self._paths.processed_reports_folder,
+            max_pending=Config.PIPELINE_QUEUE_SIZE
+        ) as writer:
+            self._output_writer = writer
+            try:
+                yield
+            finally:
+                self._output_writer = None
+    
+    @contextmanager
+    def _billing_history_stage(self):
+        """
+        Dentro del bloque, el historial de facturación (si está habilitado) se usa
+        con una sola conexión; los bloques anidados reutilizan la del exterior.
+        """
+        if not Config.BILLING_HISTORY_ENABLED or self._billing_history is not None:
+            yield
+            return
+        try:
+            history = BillingHistory()
+        except Exception as e:
+            print(f"Error opening billing history: {e}")
+            yield
+            return
+        
+        self._billing_history = history
+        try:
+            yield
+        finally:
+            self._billing_history = None
+            history.close()
+    
+    def _save_billing_report(self, file_name: str, billing_report: pd.DataFrame) -> None:
+        """Guarda el reporte de facturación; debe llamarse dentro de _writer_stage."""
+        self._output_writer.submit(self._billing_report_path(file_name).name, billing_report)
+        if self._columnar_writer.enabled:
+            self._columnar_writer.save_part(file_name, billing_report)
+        if self._billing_history is not None:
             try:
-                billing_report.to_excel(output_path, index=False)
+                self._billing_history.save_report(self._depot_name, file_name, billing_report)
             except Exception as e:
-                print(f"Error saving file {output_path}: {e}")
+                print(f"Error saving billing history for {file_name}: {e}")
+    
+    def _billing_history_files(self) -> set[str] | None:
+        """
+        Archivos del depósito guardados en el historial de facturación, o None si
+        está deshabilitado; debe llamarse dentro de _billing_history_stage.
+        """
+        if self._billing_history is None:
+            return None
+        return self._billing_history.get_file_names(self._depot_name)
+    
+    def save_results(self, result: ProcessingResult) -> None:
+        """
+        Guarda los resultados en archivos Excel y, si Config.COLUMNAR_OUTPUT_FORMATS
+        lo indica, también en formatos columnares (ver ColumnarOutputWriter).
         
-        # Guardar protocolos con errores
-        if not result.error_protocols.empty:
-            error_path = Config.PROTOCOLS_WITH_ERRORS_PATH
-            if error_path.exists():
+        Args:
+            result: Resultado del procesamiento
+        """
+        # Una sola conexión al historial de facturación para los reportes y la sincronización
+        with self._billing_history_stage():
+            # En modo streaming o incremental, o con PIPELINE_STAGES, los reportes de facturación ya se guardaron
+            if not result.billing_reports_saved:
+                # Eliminar reportes de archivos que ya no se procesan (los demás se reemplazan si cambiaron)
+                self._remove_stale_outputs(result.billing_reports.keys())
+
+                # Guardar reportes de facturación
+                with self._writer_stage():
+                    for file_name, billing_report in result.billing_reports.items():
+                        self._save_billing_report(file_name, billing_report)
+            
+            # Guardar protocolos con errores (write_excel reemplaza el archivo de forma atómica)
+            if not result.error_protocols.empty:
+                error_path = self._paths.protocols_with_errors_path
                 try:
-                    error_path.unlink()
+                    write_excel(result.error_protocols, error_path, Config.OUTPUT_WRITER_ENGINE)
                 except Exception as e:
-                    print(f"Error deleting existing error file {error_path}: {e}")
+                    print(f"Error saving error protocols file {error_path}: {e}")
+            
+            # Guardar valores máximos
+            max_path = self._paths.max_values_output_path
             try:
-                result.error_protocols.to_excel(error_path, index=False)
+                write_excel(result.max_values, max_path, Config.OUTPUT_WRITER_ENGINE)
             except Exception as e:
-                print(f"Error saving error protocols file {error_path}: {e}")
+                print(f"Error saving max values file {max_path}: {e}")
+            
+            # Guardar picos y percentiles por protocolo
+            peak_outputs = [
+                (result.peak_values, self._paths.peak_values_output_path),
+                (result.protocol_percentiles, self._paths.protocol_percentiles_output_path)
+            ]
+            for output, output_path in peak_outputs:
+                if output is None:
+                    continue
+                try:
+                    write_excel(output, output_path, Config.OUTPUT_WRITER_ENGINE)
+                except Exception as e:
+                    print(f"Error saving file {output_path}: {e}")
+            
+            # Máximos por ventana de tiempo: se reescriben solo las ventanas recalculadas
+            if result.windows is not None:
+                self._save_window_max_values(result)
+            
+            # Historial de facturación: solo los archivos de esta ejecución, en su orden
+            if self._billing_history is not None:
+                try:
+                    self._billing_history.sync_files(
+                        self._depot_name, (os.path.splitext(file)[0] for file in result.processed_files)
+                    )
+                except Exception as e:
+                    print(f"Error updating billing history: {e}")
+            
+            # Salidas columnares: máximos, errores y todos los reportes de facturación en una sola tabla
+            if self._columnar_writer.enabled:
+                self._columnar_writer.write_table("max_values", result.max_values)
+                self._columnar_writer.write_table("protocols_with_errors", result.error_protocols)
+                self._columnar_writer.write_billing_table(
+                    os.path.splitext(file)[0] for file in result.processed_files
+                )
+    
+    def _save_window_max_values(self, result: ProcessingResult) -> None:
+        """Escribe max_values_<ventana>.xlsx de las ventanas recalculadas y elimina los de ventanas sin reportes."""
+        folder = self._paths.window_max_values_folder
+        folder.mkdir(parents=True, exist_ok=True)
+        expected_outputs = {self._window_max_values_path(window).name for window in result.windows}
         
-        # Guardar valores máximos
-        max_path = Config.MAX_VALUES_OUTPUT_PATH
-        if max_path.exists():
-            max_path.unlink()
-        try:
-            result.max_values.to_excel(max_path, index=False)
-        except Exception as e:
-            print(f"Error saving max values file {max_path}: {e}")
+        for existing_file in folder.glob("max_values_*.xlsx"):
+            if existing_file.name in expected_outputs:
+                continue
+            try:
+                existing_file.unlink()
+            except Exception as e:
+                print(f"Error deleting existing file {existing_file}: {e}")
+        
+        for window, max_values in result.window_max_values.items():
+            window_path = self._window_max_values_path(window)
+            try:
+                write_excel(max_values, window_path, Config.OUTPUT_WRITER_ENGINE)
+            except Exception as e:
+                print(f"Error saving max values file {window_path}: {e}")
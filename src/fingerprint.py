@@ -0,0 +1,37 @@
+import hashlib
+from pathlib import Path
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def content_hash(file_path: Path) -> str:
+    """Calcula el hash SHA-256 del contenido de un archivo."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(file_path: Path) -> str:
+    """
+    Genera la huella de un archivo a partir de su ruta, tamaño, fecha de
+    modificación y hash del contenido. Retorna "" si el archivo no existe.
+    """
+    file_path = Path(file_path)
+    if not file_path.exists():
+        return ""
+    
+    stat = file_path.stat()
+    return data_fingerprint(
+        str(file_path.resolve()), stat.st_size, stat.st_mtime_ns, content_hash(file_path)
+    )
+
+
+def data_fingerprint(*values) -> str:
+    """Genera una huella estable a partir de valores simples (str, números, dicts, listas)."""
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(repr(value).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
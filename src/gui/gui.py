@@ -4,7 +4,9 @@ import threading
 import sys
 from io import StringIO
 
-from src.core.storage_service import StorageService
+from src.core.storage_service import ProcessingResult, StorageService
+from src.core.multi_depot_service import MultiDepotService
+from src.readers.depot_reader_factory import DepotReaderFactory
 
 
 class Colors:
@@ -27,7 +29,9 @@ class Colors:
 
 
 # Lista de depósitos disponibles
-AVAILABLE_DEPOTS = ["PERI"]
+AVAILABLE_DEPOTS = DepotReaderFactory.SUPPORTED_DEPOTS
+# Opción del selector que procesa todos los depósitos a la vez
+ALL_DEPOTS = "Todos"
 
 class MaxStorageGUI:
     """Interfaz gráfica para Max Storage Andina."""
@@ -40,6 +44,8 @@ class MaxStorageGUI:
         self.root.configure(bg=Colors.BG_DARK)
         
         self._is_running = False
+        self._storage_service: StorageService | None = None
+        self._multi_depot_service: MultiDepotService | None = None
         self._selected_depot = tk.StringVar(value=AVAILABLE_DEPOTS[0])
         self._setup_styles()
         self._setup_ui()
@@ -157,7 +163,7 @@ class MaxStorageGUI:
         self.depot_combo = ttk.Combobox(
             depot_frame,
             textvariable=self._selected_depot,
-            values=AVAILABLE_DEPOTS,
+            values=AVAILABLE_DEPOTS + [ALL_DEPOTS],
             state="readonly",
             style="Dark.TCombobox",
             width=15
@@ -293,25 +299,16 @@ class MaxStorageGUI:
             self._log(f"  INICIANDO PROCESAMIENTO - Depósito: {depot_name}", "header")
             self._log("═" * 55, "header")
             
-            service = StorageService()
+            if depot_name == ALL_DEPOTS:
+                self._process_all_depots()
+                return
             
-            # Redirigir stdout para capturar prints
-            old_stdout = sys.stdout
-            sys.stdout = StringIO()
+            # Se reutiliza entre ejecuciones; la configuración se recarga solo si cambió
+            if self._storage_service is None:
+                self._storage_service = StorageService()
+            service = self._storage_service
             
-            try:
-                result = service.process_all(depot_name)
-                
-                # Capturar output
-                output = sys.stdout.getvalue()
-                if output:
-                    for line in output.strip().split('\n'):
-                        if "Processing file:" in line:
-                            self.root.after(0, lambda l=line: self._log(l, "file"))
-                        else:
-                            self.root.after(0, lambda l=line: self._log(l, "normal"))
-            finally:
-                sys.stdout = old_stdout
+            result = self._capture_output(lambda: service.process_all(depot_name))
             
             # Guardar resultados
             self._log("\n💾 Guardando resultados...", "info")
@@ -321,24 +318,7 @@ class MaxStorageGUI:
             self._log("\n" + "═" * 55, "header")
             self._log("  RESUMEN", "header")
             self._log("═" * 55, "header")
-            
-            self._log(f"📁 Archivos procesados: {len(result.processed_files)}", "success")
-            
-            if result.skipped_files:
-                self._log(f"⏭️  Archivos saltados: {len(result.skipped_files)}", "warning")
-                for f in result.skipped_files[:5]:
-                    self._log(f"    • {f}", "warning")
-                if len(result.skipped_files) > 5:
-                    self._log(f"    ... y {len(result.skipped_files) - 5} más", "warning")
-            
-            error_count = len(result.error_protocols['PROTOCOL'].unique()) if not result.error_protocols.empty else 0
-            if error_count > 0:
-                self._log(f"⚠️  Protocolos con errores: {error_count}", "error")
-            else:
-                self._log(f"✓  Sin errores de protocolo", "success")
-            
-            max_count = len(result.max_values['PROTOCOL'].unique()) if not result.max_values.empty else 0
-            self._log(f"📊 Protocolos calculados: {max_count}", "info")
+            self._log_summary(result)
             
             self._log("\n✅ Procesamiento completado exitosamente!", "success")
             self._log("═" * 55, "header")
@@ -349,6 +329,69 @@ class MaxStorageGUI:
         finally:
             self.root.after(0, lambda: self._set_running(False))
     
+    def _process_all_depots(self):
+        """Procesa todos los depósitos a la vez; cada uno guarda sus resultados al terminar."""
+        if self._multi_depot_service is None:
+            self._multi_depot_service = MultiDepotService()
+        service = self._multi_depot_service
+        
+        multi_result = self._capture_output(lambda: service.process_all(AVAILABLE_DEPOTS))
+        
+        for depot_name, result in multi_result.results.items():
+            self._log("\n" + "═" * 55, "header")
+            self._log(f"  RESUMEN - Depósito: {depot_name}", "header")
+            self._log("═" * 55, "header")
+            self._log_summary(result)
+        
+        for depot_name, error in multi_result.errors.items():
+            self._log(f"\n❌ ERROR en {depot_name}: {error}", "error")
+        
+        if not multi_result.errors:
+            self._log("\n✅ Procesamiento completado exitosamente!", "success")
+        self._log("═" * 55, "header")
+    
+    def _capture_output(self, action):
+        """Ejecuta action mostrando en el log lo que imprime; retorna su resultado."""
+        # Redirigir stdout para capturar prints
+        old_stdout = sys.stdout
+        sys.stdout = StringIO()
+        
+        try:
+            result = action()
+            
+            # Capturar output
+            output = sys.stdout.getvalue()
+            if output:
+                for line in output.strip().split('\n'):
+                    if "Processing file:" in line:
+                        self.root.after(0, lambda l=line: self._log(l, "file"))
+                    else:
+                        self.root.after(0, lambda l=line: self._log(l, "normal"))
+        finally:
+            sys.stdout = old_stdout
+        
+        return result
+    
+    def _log_summary(self, result: ProcessingResult):
+        """Muestra el resumen de un depósito procesado."""
+        self._log(f"📁 Archivos procesados: {len(result.processed_files)}", "success")
+        
+        if result.skipped_files:
+            self._log(f"⏭️  Archivos saltados: {len(result.skipped_files)}", "warning")
+            for f in result.skipped_files[:5]:
+                self._log(f"    • {f}", "warning")
+            if len(result.skipped_files) > 5:
+                self._log(f"    ... y {len(result.skipped_files) - 5} más", "warning")
+        
+        error_count = len(result.error_protocols['PROTOCOL'].unique()) if not result.error_protocols.empty else 0
+        if error_count > 0:
+            self._log(f"⚠️  Protocolos con errores: {error_count}", "error")
+        else:
+            self._log(f"✓  Sin errores de protocolo", "success")
+        
+        max_count = len(result.max_values['PROTOCOL'].unique()) if not result.max_values.empty else 0
+        self._log(f"📊 Protocolos calculados: {max_count}", "info")
+    
     def run(self):
         """Inicia la aplicación."""
         self.root.mainloop()
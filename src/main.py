@@ -11,6 +11,37 @@ def run_console():
     print(f"Max values calculated for {len(result.max_values['PROTOCOL'].unique())} protocols")
 
 
+def run_console_all_depots():
+    """Procesa todos los depósitos a la vez en modo consola."""
+    from src.core.multi_depot_service import MultiDepotService
+    from src.readers.depot_reader_factory import DepotReaderFactory
+    multi_result = MultiDepotService().process_all(DepotReaderFactory.SUPPORTED_DEPOTS)
+    
+    for depot_name, result in multi_result.results.items():
+        print(f"\n[{depot_name}] Processed {len(result.processed_files)} files")
+        print(f"[{depot_name}] Skipped {len(result.skipped_files)} files")
+        print(f"[{depot_name}] Protocols with errors: {len(result.error_protocols['PROTOCOL'].unique()) if not result.error_protocols.empty else 0}")
+        print(f"[{depot_name}] Max values calculated for {len(result.max_values['PROTOCOL'].unique()) if not result.max_values.empty else 0} protocols")
+    for depot_name, error in multi_result.errors.items():
+        print(f"\n[{depot_name}] Failed: {error}")
+
+
+def run_watch(depot_name: str = "PERI"):
+    """Vigila la carpeta de reportes y procesa cada reporte nuevo apenas termina de copiarse (Ctrl+C para salir)."""
+    from src.core.depot_watcher import DepotWatcher
+    watcher = DepotWatcher(depot_name)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+
+
+def run_engine_benchmark(depot_name: str = "PERI"):
+    """Mide los motores de Excel disponibles y registra el más rápido para el depósito."""
+    from src.readers.excel_engines import benchmark_depot_engines
+    benchmark_depot_engines(depot_name)
+
+
 def run_gui():
     """Ejecuta la interfaz gráfica."""
     from src.gui.gui import MaxStorageGUI
@@ -20,6 +51,8 @@ def run_gui():
 
 def main():
     # run_console()
+    # run_console_all_depots()
+    # run_watch()
     run_gui()
 
 
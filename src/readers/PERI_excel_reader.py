@@ -1,10 +1,48 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from src.readers.excel_reader import ExcelReader
 from src.config import Config
+from src.fingerprint import data_fingerprint
+from src.readers.config_registry import get_config_registry
+from src.categoricals import deep_memory_usage, restore_categoricals, to_categoricals
+
+
+def _to_quantity(value) -> float:
+    """Cantidad numérica de una celda de SALDO (los textos no numéricos quedan vacíos, como pd.to_numeric con errors="coerce")."""
+    return float(pd.to_numeric(value, errors="coerce"))
+
 
 class PERIExcelReader(ExcelReader):
-    def __init__(self):
+    ENGINE_PROFILE = "PERI"
+
+    # Incrementar al cambiar la lógica de read_excel para invalidar el caché de reportes
+    CACHE_VERSION = 2
+
+    RENAME_MAP = {
+        "PROTOCOLO": "PROTOCOL",
+        "LINEA": "ITEM_TYPE",
+        "ESTADO STOCK": "LOT_STATUS",
+        "CLIENTE": "COMPONENT",
+        "UBICACIÓN": "POSITION",
+        'SALDO': 'AMOUNT_OF_KITS'
+    }
+
+    # Tipos al leer el reporte: texto para las columnas descriptivas y número para SALDO (con un
+    # conversor: algunos reportes traen textos en las cantidades). PROTOCOLO conserva el tipo de
+    # cada valor porque hay protocolos numéricos que deben coincidir con la configuración
+    READ_DTYPES = {"LINEA": "str", "ESTADO STOCK": "str", "CLIENTE": "str", "UBICACIÓN": "str"}
+    READ_CONVERTERS = {"SALDO": _to_quantity}
+
+    COLUMNS_TO_KEEP = ["PROTOCOL", "ITEM_TYPE", "LOT_STATUS", "TEMPERATURE", "STORAGE_TYPE", "POSITION", "AMOUNT_OF_KITS"]
+
+    # Columnas de pocos valores distintos que el reporte normalizado entrega como category
+    CATEGORICAL_COLUMNS = ["PROTOCOL", "ITEM_TYPE", "LOT_STATUS", "TEMPERATURE", "STORAGE_TYPE", "GENERAL_TYPE", "POTENTIAL_SERVICE", "DESCRIPTION"]
+
+    def __init__(self, transform_mode: str | None = None):
+        # "vectorized", "rowwise" o "verify" (ejecuta ambas y compara)
+        self.transform_mode = transform_mode or Config.PERI_TRANSFORM_MODE
+
         self.lot_status_replacements = {
             "BLOQUEADO": "Expired",
             "CUARENTENA": "Quarantine",
@@ -31,11 +69,19 @@ class PERIExcelReader(ExcelReader):
             "Label": "Label"
         }
 
-        try:
-            self.protocols_renaming = pd.read_excel(Config.PROTOCOLS_RENAMING, sheet_name="PERI").set_index("Depot")["FisherBook"].to_dict()
-        except Exception as e:
-            print(f"Error loading protocols renaming file: {e}")
-            self.protocols_renaming = {}
+    @property
+    def protocols_renaming(self) -> dict:
+        """Renombrado de protocolos compartido por todo el proceso; se vuelve a leer solo si cambia el archivo."""
+        return get_config_registry().get_protocols_renaming("PERI")
+
+    def cache_fingerprint(self) -> str | None:
+        return data_fingerprint(
+            self.CACHE_VERSION,
+            self.lot_status_replacements,
+            self.item_type_replacements,
+            self.type_replacements,
+            self.protocols_renaming
+        )
 
     def _get_temperature_condition(self, ubicacion: str) -> str:
         """Determina la condición de temperatura basada en la ubicación."""
@@ -104,60 +150,163 @@ class PERIExcelReader(ExcelReader):
 
     def read_excel(self, file_path: Path) -> pd.DataFrame:
         try:
-            df: pd.DataFrame = pd.read_excel(file_path)
-
-            # Renombrar protocolos según el archivo de renaming
-            df['PROTOCOLO'] = df['PROTOCOLO'].replace(self.protocols_renaming)
-            
-            # Asegurar que SALDO es numérico
-            df['SALDO'] = pd.to_numeric(df['SALDO'], errors='coerce').fillna(0).astype('int64')
-            
-            rename_map = {
-                "PROTOCOLO": "PROTOCOL",
-                "LINEA": "ITEM_TYPE",
-                "ESTADO STOCK": "LOT_STATUS",
-                "CLIENTE": "COMPONENT",
-                "UBICACIÓN": "POSITION",
-                'SALDO': 'AMOUNT_OF_KITS'
-            }
-            
-            # Agrupar por columnas y sumar SALDO
-            df = df.groupby(list(rename_map.keys()), as_index=False, dropna=False).agg({'SALDO': 'sum'})
-            
-            df.rename(columns=rename_map, inplace=True)
-            
-            df['TEMPERATURE'] = df['POSITION'].apply(self._get_temperature_condition)
-            
-            df = df[df['PROTOCOL'].notna()]
-            
-            df['STORAGE_TYPE'] = df.apply(
-                lambda row: self._get_storage_type(row['POSITION'], row['TEMPERATURE']), 
-                axis=1
-            )
-            
-            columns_to_keep = ["PROTOCOL", "ITEM_TYPE", "LOT_STATUS", "TEMPERATURE", "STORAGE_TYPE", "POSITION", "AMOUNT_OF_KITS"]
-            
-            df = df[columns_to_keep].copy()
-            
-            df['IS_A_RETURN'] = df['LOT_STATUS'] == "DEVOLUCION"
-            df['LOT_STATUS'] = df['LOT_STATUS'].replace(self.lot_status_replacements)
-            df['ITEM_TYPE'] = df['ITEM_TYPE'].apply(self._extract_item_type)
-            df['GENERAL_TYPE'] = df['ITEM_TYPE'].replace(self.type_replacements)
-            
-            df['AMOUNT_OF_KITS'] = pd.to_numeric(df['AMOUNT_OF_KITS'], errors='coerce').fillna(0).astype('int64')
-
-            df['POTENTIAL_SERVICE'] = df.apply(
-                lambda row: self._potential_description(row.get('GENERAL_TYPE', ''), row.get('TEMPERATURE', ''), row.get('IS_A_RETURN', False)),
-                axis=1
+            # Solo las columnas usadas por la transformación, con sus tipos
+            df: pd.DataFrame = self._read_excel_file(
+                file_path,
+                usecols=list(self.RENAME_MAP.keys()),
+                dtype=self.READ_DTYPES,
+                converters=self.READ_CONVERTERS
             )
 
-            df['DESCRIPTION'] = df.apply(
-                lambda row: self._service_description(row.get('LOT_STATUS', ''), row.get('ITEM_TYPE', ''), row.get('TEMPERATURE', ''), row.get('IS_A_RETURN', False)),
-                axis=1
-            )
+            if self.transform_mode == "rowwise":
+                result = self._transform_rowwise(df)
+            elif self.transform_mode == "verify":
+                result = self._transform_rowwise(df.copy())
+                vectorized_df = self._transform_vectorized(df)
+                self._verify_transform(result, vectorized_df, file_path)
+            else:
+                result = self._transform_vectorized(df)
             
-            return df
+            return self._to_categoricals(result, file_path)
             
         except Exception as e:
             print(f"An error occurred while reading the Excel file: {e}")
-            return pd.DataFrame()
\ No newline at end of file
+            return pd.DataFrame()
+
+    def _to_categoricals(self, df: pd.DataFrame, file_path: Path) -> pd.DataFrame:
+        """Convierte las columnas de pocos valores a category e informa la memoria ahorrada."""
+        if not Config.REPORT_MEMORY_USAGE:
+            return to_categoricals(df, self.CATEGORICAL_COLUMNS)
+        
+        memory_before = deep_memory_usage(df)
+        df = to_categoricals(df, self.CATEGORICAL_COLUMNS)
+        memory_after = deep_memory_usage(df)
+        saved = 1 - memory_after / memory_before if memory_before else 0.0
+        print(f"Memory usage for {Path(file_path).name}: {memory_before / 1024:.1f} KB -> {memory_after / 1024:.1f} KB ({saved:.0%} saved)")
+        return df
+
+    def _verify_transform(self, rowwise_df: pd.DataFrame, vectorized_df: pd.DataFrame, file_path: Path) -> None:
+        """Compara la salida de ambas implementaciones e informa las diferencias."""
+        try:
+            pd.testing.assert_frame_equal(rowwise_df, vectorized_df)
+        except AssertionError as e:
+            print(f"Vectorized transform differs from row-wise transform for {file_path}: {e}")
+
+    def _group_stock(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Agrupa el reporte por las columnas de interés sumando SALDO y las renombra."""
+        # Asegurar que SALDO es numérico
+        df['SALDO'] = pd.to_numeric(df['SALDO'], errors='coerce').fillna(0).astype('int64')
+        
+        # Agrupar por columnas y sumar SALDO (las claves de texto como category)
+        group_columns = list(self.RENAME_MAP.keys())
+        text_columns = [column for column in group_columns if column != 'SALDO']
+        df = to_categoricals(df, text_columns)
+        df = df.groupby(group_columns, as_index=False, dropna=False, observed=True).agg({'SALDO': 'sum'})
+        df = restore_categoricals(df, text_columns)
+        
+        df.rename(columns=self.RENAME_MAP, inplace=True)
+        return df
+
+    def _transform_rowwise(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Implementación fila por fila (referencia para el modo "verify")."""
+        # Renombrar protocolos según el archivo de renaming
+        df['PROTOCOLO'] = df['PROTOCOLO'].replace(self.protocols_renaming)
+        
+        df = self._group_stock(df)
+        
+        df['TEMPERATURE'] = df['POSITION'].apply(self._get_temperature_condition)
+        
+        df = df[df['PROTOCOL'].notna()]
+        
+        df['STORAGE_TYPE'] = df.apply(
+            lambda row: self._get_storage_type(row['POSITION'], row['TEMPERATURE']), 
+            axis=1
+        )
+        
+        df = df[self.COLUMNS_TO_KEEP].copy()
+        
+        df['IS_A_RETURN'] = df['LOT_STATUS'] == "DEVOLUCION"
+        df['LOT_STATUS'] = df['LOT_STATUS'].replace(self.lot_status_replacements)
+        df['ITEM_TYPE'] = df['ITEM_TYPE'].apply(self._extract_item_type)
+        df['GENERAL_TYPE'] = df['ITEM_TYPE'].replace(self.type_replacements)
+        
+        df['AMOUNT_OF_KITS'] = pd.to_numeric(df['AMOUNT_OF_KITS'], errors='coerce').fillna(0).astype('int64')
+
+        df['POTENTIAL_SERVICE'] = df.apply(
+            lambda row: self._potential_description(row.get('GENERAL_TYPE', ''), row.get('TEMPERATURE', ''), row.get('IS_A_RETURN', False)),
+            axis=1
+        )
+
+        df['DESCRIPTION'] = df.apply(
+            lambda row: self._service_description(row.get('LOT_STATUS', ''), row.get('ITEM_TYPE', ''), row.get('TEMPERATURE', ''), row.get('IS_A_RETURN', False)),
+            axis=1
+        )
+        
+        return df
+
+    @staticmethod
+    def _replace_values(series: pd.Series, replacements: dict) -> pd.Series:
+        """Equivalente a Series.replace(dict) para coincidencias exactas, usando map."""
+        if not replacements:
+            return series
+        return series.map(replacements).where(series.isin(list(replacements.keys())), series)
+
+    def _transform_vectorized(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Implementación vectorizada; produce la misma salida que _transform_rowwise."""
+        df['PROTOCOLO'] = self._replace_values(df['PROTOCOLO'], self.protocols_renaming)
+        
+        df = self._group_stock(df)
+        
+        position = df['POSITION']
+        has_position = position.notna()
+        position_text = position.astype(str)
+        starts_with_efr = has_position & position_text.str.startswith("EFR", na=False)
+        starts_with_ef = has_position & position_text.str.startswith("EF", na=False)
+        starts_with_l = has_position & position_text.str.startswith("L", na=False)
+        starts_with_mg = has_position & position_text.str.startswith("MG", na=False)
+        
+        df['TEMPERATURE'] = np.select(
+            [starts_with_efr, starts_with_ef, starts_with_l, starts_with_mg],
+            ["Refrigerated", "Ambient", "Ambient", "Frozen"],
+            default=""
+        )
+        df['STORAGE_TYPE'] = np.select(
+            [has_position & (df['TEMPERATURE'] == "Frozen"), starts_with_ef, starts_with_l],
+            ["Shelf", "Bin", "Pallet"],
+            default=""
+        )
+        
+        df = df[df['PROTOCOL'].notna()]
+        df = df[self.COLUMNS_TO_KEEP].copy()
+        
+        df['IS_A_RETURN'] = df['LOT_STATUS'] == "DEVOLUCION"
+        df['LOT_STATUS'] = self._replace_values(df['LOT_STATUS'], self.lot_status_replacements)
+        
+        item_type = df['ITEM_TYPE']
+        extracted_item_type = (
+            item_type.astype(str).str.strip().str.split(" ", n=1).str[0].str.lower().str.strip()
+        )
+        extracted_item_type = self._replace_values(extracted_item_type, self.item_type_replacements)
+        df['ITEM_TYPE'] = extracted_item_type.where(item_type.notna(), "")
+        df['GENERAL_TYPE'] = self._replace_values(df['ITEM_TYPE'], self.type_replacements)
+        
+        df['AMOUNT_OF_KITS'] = pd.to_numeric(df['AMOUNT_OF_KITS'], errors='coerce').fillna(0).astype('int64')
+
+        is_a_return = df['IS_A_RETURN']
+        general_type = df['GENERAL_TYPE']
+        temperature = df['TEMPERATURE']
+        df['POTENTIAL_SERVICE'] = np.select(
+            [is_a_return, general_type == "Non-Drug", general_type == "Label", general_type == "Drug"],
+            ["Storage of Returns", "Non-Drug Storage " + temperature, "Storage of Labels " + temperature, "Storage " + temperature],
+            default="Unknown Service"
+        )
+
+        # Los estados vacíos se formatean como "nan", igual que en el f-string de _service_description
+        lot_status = df['LOT_STATUS'].astype(object).where(df['LOT_STATUS'].notna(), "nan").astype(str)
+        df['DESCRIPTION'] = np.where(
+            is_a_return,
+            "Returned " + df['ITEM_TYPE'],
+            temperature + " " + lot_status + " " + df['ITEM_TYPE']
+        )
+        
+        return df
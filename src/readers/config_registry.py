@@ -0,0 +1,101 @@
+import threading
+from pathlib import Path
+from typing import Callable
+import pandas as pd
+
+from src.config import Config
+from src.readers.excel_engines import read_excel_with_fallback
+from src.readers.exchanges_rate_excel_reader import ExchangesRateExcelReader
+from src.readers.service_configuration_excel_reader import ServiceConfigurationExcelReader
+
+
+def _file_stamp(file_path: Path) -> tuple[int, int] | None:
+    """(fecha de modificación, tamaño) del archivo, o None si no existe."""
+    try:
+        stat = Path(file_path).stat()
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class ConfigRegistry:
+    """
+    Registro de las configuraciones cargadas, compartido por todo el proceso.
+
+    Cada libro de configuración se lee una sola vez y se vuelve a leer solo
+    cuando cambia su fecha de modificación (o su tamaño). Los DataFrames y
+    diccionarios retornados se comparten entre lectores, calculadores y
+    ejecuciones, por lo que deben tratarse como de solo lectura.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: dict[object, tuple[object, object]] = {}
+        # Cantidad de cargas de cada entrada, para invalidar las que dependen de ella
+        self._versions: dict[object, int] = {}
+
+    def _get(self, key: object, stamp: object, loader: Callable[[], object]) -> object:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                return entry[1]
+
+            value = loader()
+            self._entries[key] = (stamp, value)
+            self._versions[key] = self._versions.get(key, 0) + 1
+            return value
+
+    def clear(self) -> None:
+        """Descarta todas las configuraciones cargadas."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_exchanges(self) -> pd.DataFrame:
+        path = Config.EXCHANGE_RATE_PATH
+        return self._get(
+            "exchanges",
+            _file_stamp(path),
+            lambda: ExchangesRateExcelReader().read_excel(path)
+        )
+
+    def get_services(self) -> pd.DataFrame:
+        """Configuración de servicios con los precios en USD (depende también de los tipos de cambio)."""
+        path = Config.SERVICE_CONFIG_PATH
+        with self._lock:
+            exchanges = self.get_exchanges()
+            return self._get(
+                "services",
+                (_file_stamp(path), self._versions["exchanges"]),
+                lambda: ServiceConfigurationExcelReader(exchanges).read_excel(path)
+            )
+
+    def get_protocols_renaming(self, sheet_name: str) -> dict:
+        """Diccionario {protocolo del depósito: protocolo FisherBook} de la hoja indicada."""
+        path = Config.PROTOCOLS_RENAMING
+
+        def load_renaming() -> dict:
+            try:
+                return read_excel_with_fallback(path, sheet_name=sheet_name).set_index("Depot")["FisherBook"].to_dict()
+            except Exception as e:
+                print(f"Error loading protocols renaming file: {e}")
+                return {}
+
+        return self._get(("protocols_renaming", sheet_name), _file_stamp(path), load_renaming)
+
+    def get_stamped_services(self) -> tuple[object, pd.DataFrame]:
+        """
+        Retorna (marca, configuración de servicios). La marca son la fecha de
+        modificación y el tamaño de los libros de servicios y de tipos de cambio con
+        que se leyó la configuración, y cambia cada vez que se vuelve a leer.
+        """
+        with self._lock:
+            services = self.get_services()
+            return (self._entries["services"][0][0], self._entries["exchanges"][0]), services
+
+
+_registry = ConfigRegistry()
+
+
+def get_config_registry() -> ConfigRegistry:
+    """Retorna el registro de configuraciones del proceso."""
+    return _registry
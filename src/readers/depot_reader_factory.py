@@ -1,6 +1,8 @@
 from src.readers.excel_reader import ExcelReader
 
 class DepotReaderFactory:
+    SUPPORTED_DEPOTS = ["PERI"]
+
     @staticmethod
     def create_depot_reader(depot_name: str) -> ExcelReader:
         if depot_name == 'PERI':
@@ -0,0 +1,150 @@
+import importlib.util
+import json
+import os
+import sys
+import time
+from pathlib import Path
+import pandas as pd
+
+from src.config import Config, DepotPaths
+
+# Módulo que debe estar instalado para usar cada motor de pd.read_excel
+ENGINE_MODULES = {
+    "calamine": "python_calamine",
+    "xlrd": "xlrd",
+    "openpyxl": "openpyxl",
+    "pyxlsb": "pyxlsb",
+    "odf": "odf"
+}
+
+# Orden de preferencia por formato; calamine (Rust) es el más rápido cuando está instalado
+ENGINE_PREFERENCES = {
+    ".xls": ["calamine", "xlrd"],
+    ".xlsx": ["calamine", "openpyxl"],
+    ".xlsm": ["calamine", "openpyxl"],
+    ".xlsb": ["calamine", "pyxlsb"],
+    ".ods": ["calamine", "odf"]
+}
+
+_benchmark_results: tuple[object, dict] | None = None
+
+
+def is_engine_available(engine: str) -> bool:
+    module = ENGINE_MODULES.get(engine)
+    return module is not None and importlib.util.find_spec(module) is not None
+
+
+def load_benchmark_results(results_path: Path = Config.EXCEL_ENGINES_PATH) -> dict:
+    """Retorna {perfil: {formato: motor}} registrado por benchmark_engines (releído si cambió el archivo)."""
+    global _benchmark_results
+    results_path = Path(results_path)
+    try:
+        stamp = (results_path, results_path.stat().st_mtime_ns)
+    except OSError:
+        return {}
+
+    if _benchmark_results is None or _benchmark_results[0] != stamp:
+        try:
+            with open(results_path, encoding="utf-8") as f:
+                _benchmark_results = (stamp, json.load(f))
+        except Exception as e:
+            print(f"Error reading Excel engines file {results_path}: {e}")
+            _benchmark_results = (stamp, {})
+    return _benchmark_results[1]
+
+
+def engine_candidates(file_path: Path, profile: str | None = None) -> list[str | None]:
+    """
+    Motores a probar para un archivo, en orden: el más rápido registrado para el
+    perfil (si lo hay), la preferencia del formato y, por último, None (pandas
+    elige el motor según el contenido del archivo).
+    """
+    suffix = Path(file_path).suffix.lower()
+    candidates = list(ENGINE_PREFERENCES.get(suffix, []))
+
+    fastest = load_benchmark_results().get(profile, {}).get(suffix) if profile else None
+    if fastest:
+        candidates = [fastest] + [engine for engine in candidates if engine != fastest]
+
+    return [engine for engine in candidates if is_engine_available(engine)] + [None]
+
+
+def read_excel_with_fallback(file_path: Path, profile: str | None = None, **kwargs) -> pd.DataFrame:
+    """
+    pd.read_excel con el primer motor disponible del orden de preferencia; si un
+    motor falla, se prueba el siguiente y, si todos fallan, se propaga el último error.
+    """
+    last_error: Exception | None = None
+    for engine in engine_candidates(file_path, profile):
+        try:
+            return pd.read_excel(file_path, engine=engine, **kwargs)
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            last_error = e
+    raise last_error
+
+
+def benchmark_engines(profile: str, files: list[Path], results_path: Path = Config.EXCEL_ENGINES_PATH) -> dict[str, str]:
+    """
+    Mide cada motor disponible leyendo los archivos indicados y registra el más
+    rápido por formato para el perfil, para que read_excel_with_fallback lo use por defecto.
+
+    Returns:
+        {formato: motor más rápido}
+    """
+    files_by_suffix: dict[str, list[Path]] = {}
+    for file_path in files:
+        files_by_suffix.setdefault(Path(file_path).suffix.lower(), []).append(Path(file_path))
+
+    fastest_engines: dict[str, str] = {}
+    for suffix, suffix_files in files_by_suffix.items():
+        timings: dict[str, float] = {}
+        # Todos los motores instalados: algunos archivos tienen una extensión que no corresponde a su contenido
+        for engine in ENGINE_MODULES:
+            if not is_engine_available(engine):
+                continue
+            start = time.perf_counter()
+            try:
+                for file_path in suffix_files:
+                    pd.read_excel(file_path, engine=engine)
+            except Exception as e:
+                print(f"Engine {engine} failed for {suffix} files: {e}")
+                continue
+            timings[engine] = time.perf_counter() - start
+            print(f"{profile} {suffix} {engine}: {timings[engine]:.3f} s ({len(suffix_files)} files)")
+
+        if timings:
+            fastest_engines[suffix] = min(timings, key=timings.get)
+
+    if fastest_engines:
+        results = dict(load_benchmark_results(results_path))
+        results[profile] = {**results.get(profile, {}), **fastest_engines}
+        results_path = Path(results_path)
+        results_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = results_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        os.replace(tmp_path, results_path)
+
+    return fastest_engines
+
+
+def benchmark_depot_engines(depot_name: str, sample_size: int = 5) -> dict[str, str]:
+    """Ejecuta benchmark_engines con una muestra de los reportes de depósito."""
+    depot_reports_folder = DepotPaths.for_depot(depot_name).depot_reports_folder
+    files = sorted(
+        path for path in depot_reports_folder.iterdir()
+        if path.suffix.lower() in ENGINE_PREFERENCES
+    )[:sample_size]
+    if not files:
+        print(f"No Excel files found in {depot_reports_folder}")
+        return {}
+    return benchmark_engines(depot_name, files)
+
+
+if __name__ == "__main__":
+    # python -m src.readers.excel_engines [DEPOSITO]
+    fastest = benchmark_depot_engines(sys.argv[1] if len(sys.argv) > 1 else "PERI")
+    for suffix, engine in fastest.items():
+        print(f"Fastest engine for {suffix}: {engine}")
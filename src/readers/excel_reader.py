@@ -1,8 +1,12 @@
 from abc import ABC, abstractmethod
 import pandas as pd
 from pathlib import Path
+from src.readers.excel_engines import read_excel_with_fallback
 
 class ExcelReader(ABC):
+    # Perfil con el que se registra el motor de Excel más rápido (ver excel_engines.benchmark_engines)
+    ENGINE_PROFILE: str | None = None
+
     @abstractmethod
     def read_excel(self, file_path: Path) -> pd.DataFrame:
         """
@@ -11,4 +15,15 @@ class ExcelReader(ABC):
         :param file_path: The path to the Excel file to be read.
         :return: A pandas DataFrame representing the rows in the Excel file.
         """
-        pass
\ No newline at end of file
+        pass
+
+    def _read_excel_file(self, file_path: Path, **kwargs) -> pd.DataFrame:
+        """pd.read_excel con el motor preferido para el formato y el perfil del lector, con respaldo."""
+        return read_excel_with_fallback(file_path, self.ENGINE_PROFILE, **kwargs)
+
+    def cache_fingerprint(self) -> str | None:
+        """
+        Retorna una huella de la configuración del lector (tablas de mapeo, archivos
+        auxiliares) para invalidar reportes cacheados, o None si no es cacheable.
+        """
+        return None
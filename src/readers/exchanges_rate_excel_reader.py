@@ -5,7 +5,7 @@ import pandas as pd
 class ExchangesRateExcelReader(ExcelReader):
     def read_excel(self, file_path: Path) -> pd.DataFrame:
         try:
-            df = pd.read_excel(file_path)
+            df = self._read_excel_file(file_path)
             return df
         except Exception as e:
             print(f"Error reading Excel file: {e}")
@@ -0,0 +1,65 @@
+import importlib.util
+import os
+from pathlib import Path
+import pandas as pd
+
+from src.config import Config
+from src.fingerprint import data_fingerprint, file_fingerprint
+from src.readers.excel_reader import ExcelReader
+
+
+class ReportCache:
+    """
+    Caché en disco (Parquet) de los reportes de depósito ya normalizados.
+
+    Cada entrada se identifica por la huella del archivo de origen (ruta, tamaño,
+    fecha de modificación y hash del contenido) y por la huella del lector, que
+    cambia cuando cambian sus tablas de mapeo o el archivo de renombres.
+    Si pyarrow no está instalado, el caché queda deshabilitado y se lee el Excel.
+    """
+
+    def __init__(self, cache_folder: Path = Config.REPORT_CACHE_FOLDER, enabled: bool = Config.REPORT_CACHE_ENABLED):
+        self.cache_folder = Path(cache_folder)
+        self.enabled = enabled and importlib.util.find_spec("pyarrow") is not None
+
+    def _entry_path(self, reader: ExcelReader, file_path: Path) -> Path | None:
+        reader_fingerprint = reader.cache_fingerprint()
+        if reader_fingerprint is None:
+            return None
+        
+        key = data_fingerprint(file_fingerprint(file_path), reader_fingerprint)
+        return self.cache_folder / f"{Path(file_path).stem}.{key[:32]}.parquet"
+
+    def read_excel(self, reader: ExcelReader, file_path: Path) -> pd.DataFrame:
+        """Retorna el reporte normalizado desde el caché, o lo lee con el lector y lo guarda."""
+        if not self.enabled:
+            return reader.read_excel(file_path)
+        
+        entry_path = self._entry_path(reader, file_path)
+        if entry_path is None:
+            return reader.read_excel(file_path)
+        
+        if entry_path.exists():
+            try:
+                return pd.read_parquet(entry_path)
+            except Exception as e:
+                print(f"Error reading cached report {entry_path}: {e}")
+        
+        df = reader.read_excel(file_path)
+        if not df.empty:
+            self._store(entry_path, Path(file_path).stem, df)
+        return df
+
+    def _store(self, entry_path: Path, source_stem: str, df: pd.DataFrame) -> None:
+        try:
+            self.cache_folder.mkdir(parents=True, exist_ok=True)
+            
+            # Eliminar entradas anteriores del mismo archivo de origen
+            for stale_entry in self.cache_folder.glob(f"{source_stem}.*.parquet"):
+                stale_entry.unlink()
+            
+            tmp_path = entry_path.with_suffix(".tmp")
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, entry_path)
+        except Exception as e:
+            print(f"Error writing cached report {entry_path}: {e}")
@@ -1,9 +1,16 @@
 from src.readers.excel_reader import ExcelReader
+from src.config import Config
+from src.fingerprint import data_fingerprint, file_fingerprint
 from pathlib import Path
 import pandas as pd
+import pickle
+import os
 
 class ServiceConfigurationExcelReader(ExcelReader):
-    def __init__(self, exchanges_df: pd.DataFrame):
+    # Incrementar al cambiar la lógica de read_excel para invalidar el snapshot guardado
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, exchanges_df: pd.DataFrame, snapshot_path: Path | None = None, snapshot_enabled: bool | None = None):
         self.renames = {
             "Sponsor\nID": "Sponsor ID",
             "Sponsor\nStatus" : "Sponsor Status",
@@ -17,26 +24,86 @@ class ServiceConfigurationExcelReader(ExcelReader):
 
         self.exchanges_df = exchanges_df
 
+        # Snapshot de la configuración ya procesada (ver _load_snapshot)
+        self.snapshot_path = Path(snapshot_path or Config.SERVICES_SNAPSHOT_PATH)
+        self.snapshot_enabled = Config.SERVICES_SNAPSHOT_ENABLED if snapshot_enabled is None else snapshot_enabled
+
     def read_excel(self, file_path: Path) -> pd.DataFrame:
+        snapshot_key = self._snapshot_key(file_path)
+        if self.snapshot_enabled:
+            snapshot = self._load_snapshot(snapshot_key)
+            if snapshot is not None:
+                return snapshot
+
         try:
-            df = pd.read_excel(file_path, header=1)
+            df = self._read_excel_file(file_path, header=1)
             df.rename(columns=self.renames, inplace=True)
 
             df = df[["Sponsor", "Protocol", "Protocol ID", "Study Status", "Service", "Service ID", "Service Status", "Price", "Currency", "Discount", "Country"]]
             df = df[(df['Country'] == 'Chile') & (df['Service Status'] == 'Active') & (df['Currency'] != '')]
 
-            #Obtener valor entre " (per" y ")" para crear la columna "Position Type"
-            df["Position Type"] = df["Service"].apply(lambda x: str.strip(x.split(" (per")[1].split(")")[0]) if isinstance(x, str) and " (per" in x else "Unknown")
-
-            # Limpiar la columna Service para eliminar cualquier texto después de " (per"
-            df["Service"] = df["Service"].apply(lambda x: x.split(" (per")[0] if isinstance(x, str) else x)
+            # Obtener valor entre " (per" y ")" para crear la columna "Position Type",
+            # y limpiar la columna Service para eliminar cualquier texto después de " (per"
+            df["Position Type"], df["Service"] = self._split_service(df["Service"])
 
             # Agregar columna Exchange Rate basada en la columna Currency
             df = df.merge(self.exchanges_df, on='Currency', how='left')
 
             df['Price_USD'] = df['Price'] * df['Exchange Rate']
 
+            if self.snapshot_enabled:
+                self._store_snapshot(snapshot_key, df)
+
             return df
         except Exception as e:
             print(f"Error reading Excel file: {e}")
-            return pd.DataFrame()  # Retornar un DataFrame vacío en caso de error
\ No newline at end of file
+            return pd.DataFrame()  # Retornar un DataFrame vacío en caso de error
+
+    @staticmethod
+    def _split_service(service: pd.Series) -> tuple[pd.Series, pd.Series]:
+        """
+        Separa "Servicio (per Tipo)" en (Position Type, Service). Los valores sin
+        " (per" tienen Position Type "Unknown"; los que no son texto se conservan.
+        """
+        is_text = service.map(type).isin([str])
+        if is_text.any():
+            parts = service.where(is_text).astype(object).str.split(" (per", regex=False)
+            has_position_type = is_text & (parts.str.len() > 1)
+            position_type = parts.str[1].str.split(")", regex=False).str[0].str.strip().where(has_position_type, "Unknown")
+            service = parts.str[0].where(is_text, service)
+        else:
+            position_type = pd.Series("Unknown", index=service.index, dtype=object)
+
+        # Reconstruir desde listas para inferir los mismos dtypes que Series.apply
+        return (
+            pd.Series(position_type.tolist(), index=service.index),
+            pd.Series(service.tolist(), index=service.index)
+        )
+
+    def _snapshot_key(self, file_path: Path) -> str:
+        exchanges = self.exchanges_df.to_dict("split") if isinstance(self.exchanges_df, pd.DataFrame) else None
+        return data_fingerprint(self.SNAPSHOT_VERSION, file_fingerprint(file_path), exchanges)
+
+    def _load_snapshot(self, snapshot_key: str) -> pd.DataFrame | None:
+        """Retorna la configuración guardada si corresponde a los mismos archivos de origen."""
+        if not self.snapshot_path.exists():
+            return None
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+        except Exception as e:
+            print(f"Error reading services snapshot {self.snapshot_path}: {e}")
+            return None
+        if snapshot.get("key") != snapshot_key:
+            return None
+        return snapshot["services"]
+
+    def _store_snapshot(self, snapshot_key: str, df: pd.DataFrame) -> None:
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.snapshot_path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"key": snapshot_key, "services": df}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            print(f"Error writing services snapshot {self.snapshot_path}: {e}")
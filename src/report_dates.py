@@ -0,0 +1,17 @@
+import re
+from datetime import date, datetime
+from pathlib import Path
+
+# StockThermoFisher_ST_AAAAMMDD (puede seguir otro texto, p. ej. la hora)
+REPORT_DATE_PATTERN = re.compile(r"StockThermoFisher_ST_(\d{8})")
+
+
+def parse_report_date(file_name: str) -> date | None:
+    """Fecha del reporte según su nombre de archivo, o None si el nombre no la incluye."""
+    match = REPORT_DATE_PATTERN.search(Path(file_name).name)
+    if match is None:
+        return None
+    try:
+        return datetime.strptime(match.group(1), "%Y%m%d").date()
+    except ValueError:
+        return None
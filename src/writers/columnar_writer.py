@@ -0,0 +1,120 @@
+import os
+from pathlib import Path
+from typing import Iterable
+import pandas as pd
+
+from src.config import Config
+
+COLUMNAR_FORMATS = ("parquet", "feather", "csv")
+
+
+def arrow_compatible(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte a texto las columnas object con tipos mezclados (p. ej. IDs numéricos
+    y de texto), que Parquet y Feather no admiten. Los valores vacíos se conservan.
+    """
+    conversions = {}
+    for column in df.columns:
+        if df[column].dtype != object:
+            continue
+        if pd.api.types.infer_dtype(df[column], skipna=True).startswith("mixed"):
+            conversions[column] = df[column].map(lambda value: value if pd.isna(value) else str(value))
+    return df.assign(**conversions) if conversions else df
+
+
+def write_columnar(df: pd.DataFrame, path: Path, file_format: str) -> None:
+    """Escribe el DataFrame (sin índice) en Parquet, Feather o CSV, reemplazando el archivo de forma atómica."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    try:
+        if file_format == "parquet":
+            arrow_compatible(df).to_parquet(tmp_path, index=False)
+        elif file_format == "feather":
+            arrow_compatible(df).reset_index(drop=True).to_feather(tmp_path)
+        elif file_format == "csv":
+            df.to_csv(tmp_path, index=False)
+        else:
+            raise ValueError(f"Unsupported columnar format '{file_format}'. Valid formats are: {list(COLUMNAR_FORMATS)}")
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+class ColumnarOutputWriter:
+    """
+    Genera los resultados en formatos columnares (Parquet, Feather o CSV).
+
+    Además de max_values y protocols_with_errors, arma una tabla única
+    billing_reports con todos los reportes de facturación y la columna FILE_NAME.
+    Para no mantener todos los reportes en memoria durante el procesamiento, cada
+    reporte guardado se conserva como una parte en Parquet (ver arrow_compatible)
+    en la carpeta parts/, y la tabla se arma al final a partir de las partes.
+    """
+
+    BILLING_TABLE_NAME = "billing_reports"
+
+    def __init__(self, folder: Path | None = None, formats: Iterable[str] | None = None):
+        self.folder = Path(folder or Config.COLUMNAR_OUTPUT_FOLDER)
+        self.formats = list(Config.COLUMNAR_OUTPUT_FORMATS if formats is None else formats)
+        self.parts_folder = self.folder / "parts"
+
+        invalid_formats = [file_format for file_format in self.formats if file_format not in COLUMNAR_FORMATS]
+        if invalid_formats:
+            raise ValueError(f"Unsupported columnar formats {invalid_formats}. Valid formats are: {list(COLUMNAR_FORMATS)}")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.formats)
+
+    def _part_path(self, file_name: str) -> Path:
+        return self.parts_folder / f"{file_name}.parquet"
+
+    def has_part(self, file_name: str) -> bool:
+        return self._part_path(file_name).exists()
+
+    def save_part(self, file_name: str, billing_report: pd.DataFrame) -> None:
+        """Conserva el reporte de facturación de un archivo para la tabla consolidada."""
+        part_path = self._part_path(file_name)
+        try:
+            write_columnar(billing_report, part_path, "parquet")
+        except Exception as e:
+            print(f"Error saving billing part {part_path}: {e}")
+
+    def remove_stale_parts(self, file_names: Iterable[str]) -> None:
+        """Elimina las partes que no corresponden a los archivos indicados."""
+        expected_parts = {self._part_path(file_name).name for file_name in file_names}
+        # *.pkl: partes guardadas en pickle por versiones anteriores
+        for pattern in ("*.parquet", "*.pkl"):
+            for existing_part in self.parts_folder.glob(pattern):
+                if existing_part.name not in expected_parts:
+                    existing_part.unlink(missing_ok=True)
+
+    def _load_part(self, file_name: str) -> pd.DataFrame:
+        try:
+            return pd.read_parquet(self._part_path(file_name))
+        except FileNotFoundError:
+            print(f"Missing billing part for {file_name}")
+        except Exception as e:
+            print(f"Error reading billing part {self._part_path(file_name)}: {e}")
+        return pd.DataFrame()
+
+    def write_table(self, table_name: str, df: pd.DataFrame) -> None:
+        """Escribe una tabla en cada formato configurado."""
+        for file_format in self.formats:
+            path = self.folder / f"{table_name}.{file_format}"
+            try:
+                write_columnar(df, path, file_format)
+            except Exception as e:
+                print(f"Error saving {file_format} file {path}: {e}")
+
+    def write_billing_table(self, file_names: Iterable[str]) -> None:
+        """Escribe la tabla consolidada con los reportes de los archivos indicados, en ese orden."""
+        frames = []
+        for file_name in file_names:
+            billing_report = self._load_part(file_name)
+            if not billing_report.empty:
+                frames.append(billing_report.assign(FILE_NAME=file_name))
+
+        billing_table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        self.write_table(self.BILLING_TABLE_NAME, billing_table)
@@ -0,0 +1,222 @@
+import hashlib
+import importlib.util
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import pandas as pd
+
+from src.config import Config
+
+# Formato del encabezado, igual al que aplica DataFrame.to_excel
+_HEADER_STYLE = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+
+
+def _cell_value(value):
+    """Valor a escribir en la celda; None deja la celda vacía (como NaN en to_excel)."""
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if math.isinf(value):
+            return "inf" if value > 0 else "-inf"
+    return value
+
+
+def _iter_rows(df: pd.DataFrame):
+    for row in df.itertuples(index=False, name=None):
+        yield [_cell_value(value) for value in row]
+
+
+def _write_xlsxwriter(df: pd.DataFrame, path: Path, sheet_name: str) -> None:
+    import xlsxwriter
+
+    # constant_memory: cada fila se escribe a disco al pasar a la siguiente
+    workbook = xlsxwriter.Workbook(str(path), {"constant_memory": True})
+    try:
+        worksheet = workbook.add_worksheet(sheet_name)
+        header_format = workbook.add_format(_HEADER_STYLE)
+        for col, column in enumerate(df.columns):
+            worksheet.write(0, col, _cell_value(column), header_format)
+        for row_index, row in enumerate(_iter_rows(df), start=1):
+            for col, value in enumerate(row):
+                if value is not None:
+                    worksheet.write(row_index, col, value)
+    finally:
+        workbook.close()
+
+
+def _write_openpyxl(df: pd.DataFrame, path: Path, sheet_name: str) -> None:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, Side
+
+    # write_only: las filas se agregan en orden sin mantener la hoja en memoria
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_name)
+    thin = Side(style="thin")
+    header = []
+    for column in df.columns:
+        cell = WriteOnlyCell(worksheet, value=_cell_value(column))
+        cell.font = Font(bold=True)
+        cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        cell.alignment = Alignment(horizontal="center", vertical="top")
+        header.append(cell)
+    worksheet.append(header)
+    for row in _iter_rows(df):
+        worksheet.append(row)
+    workbook.save(path)
+
+
+WRITE_ENGINES = {
+    "xlsxwriter": _write_xlsxwriter,
+    "openpyxl": _write_openpyxl
+}
+
+
+def available_write_engine(preferred: str | None = None) -> str:
+    """Motor de escritura a usar: el preferido si está instalado, si no xlsxwriter u openpyxl."""
+    for engine in [preferred, "xlsxwriter", "openpyxl"]:
+        if engine in WRITE_ENGINES and importlib.util.find_spec(engine) is not None:
+            return engine
+    raise ImportError("No Excel writer engine available (install XlsxWriter or openpyxl)")
+
+
+def write_excel(df: pd.DataFrame, path: Path, engine: str | None = None, sheet_name: str = "Sheet1") -> None:
+    """
+    Escribe el DataFrame (sin índice) en un archivo xlsx, fila por fila y con memoria
+    constante. Se escribe en un archivo temporal que luego reemplaza al destino, por
+    lo que una interrupción nunca deja un archivo a medio escribir.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    try:
+        WRITE_ENGINES[available_write_engine(engine)](df, tmp_path, sheet_name)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def dataframe_hash(df: pd.DataFrame) -> str | None:
+    """Hash del contenido (columnas, dtypes y valores) del DataFrame, o None si no se puede calcular."""
+    try:
+        digest = hashlib.sha256()
+        digest.update(repr((list(df.columns), [str(dtype) for dtype in df.dtypes])).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+    except Exception:
+        return None
+
+
+class ExcelOutputWriter:
+    """
+    Escribe archivos de salida de una carpeta, opcionalmente en paralelo.
+
+    Recuerda el hash del contenido de cada archivo escrito (junto con su tamaño y
+    fecha de modificación) en un índice dentro de la carpeta; si se vuelve a pedir
+    el mismo contenido y el archivo no fue modificado, no se reescribe.
+    """
+
+    INDEX_FILE_NAME = ".output_hashes.json"
+
+    def __init__(self, folder: Path, workers: int | None = None, engine: str | None = None, max_pending: int | None = None):
+        """
+        Args:
+            folder: Carpeta de salida
+            workers: Hilos de escritura; 0 escribe en el hilo que llama a submit
+            engine: "xlsxwriter" u "openpyxl" (por defecto, Config.OUTPUT_WRITER_ENGINE)
+            max_pending: Escrituras en espera antes de que submit se bloquee
+        """
+        self.folder = Path(folder)
+        self.workers = Config.OUTPUT_WRITER_WORKERS if workers is None else workers
+        self.engine = engine or Config.OUTPUT_WRITER_ENGINE
+        self._index_path = self.folder / self.INDEX_FILE_NAME
+        self._index = self._load_index()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 0 else None
+        self._pending = threading.BoundedSemaphore(max(1, max_pending or 2 * max(1, self.workers)))
+
+    def __enter__(self) -> "ExcelOutputWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Error reading output index {self._index_path}: {e}")
+            return {}
+
+    def _save_index(self) -> None:
+        try:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._index_path.with_name(f"{self._index_path.name}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._index, f, indent=2)
+            os.replace(tmp_path, self._index_path)
+        except Exception as e:
+            print(f"Error writing output index {self._index_path}: {e}")
+
+    def _is_unchanged(self, path: Path, content_hash: str | None) -> bool:
+        entry = self._index.get(path.name)
+        if content_hash is None or entry is None or entry.get("hash") != content_hash:
+            return False
+        try:
+            stat = path.stat()
+        except OSError:
+            return False
+        return entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns
+
+    def write(self, file_name: str, df: pd.DataFrame) -> bool:
+        """
+        Escribe el archivo si su contenido cambió.
+
+        Returns:
+            True si se escribió, False si se mantuvo el archivo existente
+        """
+        path = self.folder / file_name
+        content_hash = dataframe_hash(df)
+        with self._lock:
+            if self._is_unchanged(path, content_hash):
+                return False
+
+        self.folder.mkdir(parents=True, exist_ok=True)
+        write_excel(df, path, self.engine)
+
+        stat = path.stat()
+        with self._lock:
+            if content_hash is None:
+                self._index.pop(path.name, None)
+            else:
+                self._index[path.name] = {"hash": content_hash, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        return True
+
+    def _write_reporting_errors(self, file_name: str, df: pd.DataFrame) -> None:
+        try:
+            self.write(file_name, df)
+        except Exception as e:
+            print(f"Error saving file {self.folder / file_name}: {e}")
+        finally:
+            self._pending.release()
+
+    def submit(self, file_name: str, df: pd.DataFrame) -> None:
+        """Encola la escritura (o la realiza, sin hilos de escritura); los errores se informan por consola."""
+        self._pending.acquire()
+        if self._executor is None:
+            self._write_reporting_errors(file_name, df)
+            return
+        self._executor.submit(self._write_reporting_errors, file_name, df)
+
+    def close(self) -> None:
+        """Espera las escrituras pendientes y guarda el índice de hashes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._save_index()
@@ -0,0 +1,96 @@
+import os
+import tempfile
+
+# Config toma las carpetas de datos del directorio de trabajo al importarse:
+# las pruebas trabajan en un directorio temporal propio
+os.chdir(tempfile.mkdtemp(prefix="maxstorage-tests-"))
+
+import random
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.config import Config
+
+STORAGE_KINDS = [
+    "Storage Ambient", "Storage Refrigerated", "Storage Frozen", "Non-Drug Storage Ambient",
+    "Non-Drug Storage Refrigerated", "Storage of Returns", "Storage of Labels Ambient"
+]
+ITEM_TYPES = ["MATERIAL X", "materiales", "Medicación abc", "MONITORES t", "retorno", "Label", "otro cosa"]
+LOT_STATUSES = ["BLOQUEADO", "CUARENTENA", "DEVOLUCION", "LIBERADO", "RECHAZADO", "VENCIDO"]
+PROTOCOLS = [f"PROTO-{i:03d}" for i in range(30)]
+
+
+def write_configs(configs_folder: Path) -> None:
+    """Configuración de servicios, tipos de cambio y renombres de protocolos sintéticos."""
+    rng = random.Random(0)
+    configs_folder.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({"Currency": ["USD", "EUR"], "Exchange Rate": [1.0, 1.08]}).to_excel(
+        configs_folder / "exchanges_rate.xlsx", index=False
+    )
+
+    services = []
+    for i, protocol in enumerate(PROTOCOLS):
+        # Los protocolos impares no tienen todos los servicios: sus reportes tienen errores
+        kinds = STORAGE_KINDS if i % 2 == 0 else STORAGE_KINDS[:2]
+        for kind in kinds:
+            services.append({
+                "Sponsor": "S", "Sponsor\nID": 1, "Protocol": protocol, "Protocol\nID": 1000 + i,
+                "Study\nStatus": "Active", "Service": f"{kind} (per {rng.choice(['Pallet', 'Shelf', 'Bin'])})",
+                "Service\nID": rng.randint(1, 99999), "Service\nStatus": "Active",
+                "Have \nPrice / Contract": round(rng.uniform(1, 500), 2), "Currency": rng.choice(["USD", "EUR"]),
+                "Discount\n(inherited\n or custom)": 0, "Country": "Chile"
+            })
+    with pd.ExcelWriter(configs_folder / "Services - Configuration.xlsx") as writer:
+        pd.DataFrame([["Services"]]).to_excel(writer, index=False, header=False, startrow=0)
+        pd.DataFrame(services).to_excel(writer, index=False, startrow=1)
+
+    pd.DataFrame({"Depot": ["OLD-NAME"], "FisherBook": [PROTOCOLS[4]]}).to_excel(
+        configs_folder / "protocols_renaming.xlsx", sheet_name="PERI", index=False
+    )
+
+
+def write_depot_report(path: Path, seed: int, rows: int = 80) -> None:
+    """Reporte de stock de PERI sintético."""
+    rng = random.Random(seed)
+    inventory_protocols = PROTOCOLS + ["OLD-NAME", "UNKNOWN-PROTOCOL"]
+    positions = [f"EFR-01-{n}" for n in range(1, 20)] + [f"EF-{n}" for n in range(1, 20)] + [f"L-{n}" for n in range(1, 20)]
+    pd.DataFrame([
+        {
+            "PROTOCOLO": rng.choice(inventory_protocols), "LINEA": rng.choice(ITEM_TYPES),
+            "ESTADO STOCK": rng.choice(LOT_STATUSES), "CLIENTE": rng.choice(["C1", "C2"]),
+            "UBICACIÓN": rng.choice(positions), "SALDO": rng.randint(0, 50)
+        }
+        for _ in range(rows)
+    ]).to_excel(path, index=False, engine="openpyxl")
+
+
+@pytest.fixture
+def depot_data(monkeypatch) -> Path:
+    """Carpeta de datos nueva con la configuración y tres reportes de PERI; retorna la carpeta de reportes."""
+    shutil.rmtree(Config.DATA_FOLDER, ignore_errors=True)
+    write_configs(Config.CONFIGS_FOLDER)
+    Config.DEPOT_REPORTS_FOLDER.mkdir(parents=True)
+    for day in range(1, 4):
+        write_depot_report(Config.DEPOT_REPORTS_FOLDER / f"StockThermoFisher_ST_202401{day:02d}.xls", seed=day)
+
+    monkeypatch.setattr(Config, "PROCESSING_WORKERS", 1)
+    return Config.DEPOT_REPORTS_FOLDER
+
+
+def normalized_rows(df: pd.DataFrame) -> tuple[list, list]:
+    """
+    Filas y columnas comparables entre resultados que pasaron por el historial
+    SQLite: los valores vacíos (None, NaN, "") son iguales y los números se
+    comparan con 9 decimales (las sumas en SQL pueden diferir en el último dígito).
+    """
+    rows = [
+        [
+            None if pd.isna(value) or value == "" else round(value, 9) if isinstance(value, float) else value
+            for value in row
+        ]
+        for row in df.astype(object).values.tolist()
+    ]
+    return rows, list(df.columns)
@@ -0,0 +1,69 @@
+from datetime import date
+
+from src.config import Config
+from src.core import storage_service
+from src.core.billing_history import BillingHistory
+from src.core.max_calculator import MaxCalculator, WindowedMaxCalculator
+from src.core.storage_service import StorageService
+from tests.conftest import normalized_rows
+
+
+def expected_max_values(billing_reports: dict) -> MaxCalculator:
+    error_protocols = set().union(*map(WindowedMaxCalculator.report_error_protocols, billing_reports.values()))
+    calculator = MaxCalculator(protocols_with_errors=error_protocols)
+    calculator.optimize_reports({f"output_{file_name}.xlsx": report for file_name, report in billing_reports.items()})
+    return calculator.get_max_values()
+
+
+def test_max_values_match_max_calculator(depot_data, tmp_path):
+    billing_reports = StorageService().process_all("PERI", streaming=False, incremental=False).billing_reports
+
+    with BillingHistory(tmp_path / "history.sqlite") as history:
+        for file_name, report in billing_reports.items():
+            history.save_report("PERI", file_name, report)
+
+        assert history.get_file_names("PERI") == set(billing_reports)
+        assert normalized_rows(history.get_max_values("PERI")) == normalized_rows(expected_max_values(billing_reports))
+
+        # Rango de fechas: solo los reportes del 2 y 3 de enero
+        in_range = {name: report for name, report in billing_reports.items() if not name.endswith("0101")}
+        assert normalized_rows(history.get_max_values("PERI", start_date=date(2024, 1, 2))) == (
+            normalized_rows(expected_max_values(in_range))
+        )
+
+
+def test_sync_files_drops_removed_reports(depot_data, tmp_path):
+    billing_reports = StorageService().process_all("PERI", streaming=False, incremental=False).billing_reports
+    kept = [name for name in billing_reports if not name.endswith("0102")]
+
+    with BillingHistory(tmp_path / "history.sqlite") as history:
+        for file_name, report in billing_reports.items():
+            history.save_report("PERI", file_name, report)
+        history.sync_files("PERI", kept)
+
+        assert history.get_file_names("PERI") == set(kept)
+        assert normalized_rows(history.get_max_values("PERI")) == (
+            normalized_rows(expected_max_values({name: billing_reports[name] for name in kept}))
+        )
+
+
+def test_service_opens_one_history_per_run(depot_data, monkeypatch):
+    monkeypatch.setattr(Config, "BILLING_HISTORY_ENABLED", True)
+    opened = []
+
+    class CountingHistory(BillingHistory):
+        def __init__(self):
+            super().__init__(Config.BILLING_HISTORY_PATH)
+            opened.append(self)
+
+    monkeypatch.setattr(storage_service, "BillingHistory", CountingHistory)
+    service = StorageService()
+    for incremental in (False, True):
+        opened.clear()
+        result = service.process_all("PERI", streaming=False, incremental=incremental)
+        service.save_results(result)
+        # Una conexión para la ejecución y otra para save_results
+        assert len(opened) == 2
+
+    with BillingHistory(Config.BILLING_HISTORY_PATH) as history:
+        assert history.get_file_names("PERI") == {name.removesuffix(".xls") for name in result.processed_files}
@@ -0,0 +1,33 @@
+import pandas as pd
+
+from src.writers.columnar_writer import ColumnarOutputWriter
+
+
+def test_billing_table_from_parquet_parts(tmp_path):
+    reports = {
+        "StockThermoFisher_ST_20240101": pd.DataFrame({
+            "PROTOCOL": ["A-1", "B-2"],
+            "PROTOCOL_ID": [101, "P-7"],
+            "TOTAL_PRICE": [0.38979600000000003, None]
+        }),
+        "StockThermoFisher_ST_20240102": pd.DataFrame({
+            "PROTOCOL": ["A-1"],
+            "PROTOCOL_ID": [101],
+            "TOTAL_PRICE": [12.5]
+        })
+    }
+    writer = ColumnarOutputWriter(tmp_path, formats=["parquet", "csv"])
+    for file_name, report in reports.items():
+        writer.save_part(file_name, report)
+    (writer.parts_folder / "StockThermoFisher_ST_20231231.pkl").write_bytes(b"old part")
+
+    writer.remove_stale_parts(reports)
+    assert sorted(path.name for path in writer.parts_folder.iterdir()) == sorted(f"{name}.parquet" for name in reports)
+
+    writer.write_billing_table(reports)
+    billing_table = pd.read_parquet(tmp_path / "billing_reports.parquet")
+    assert list(billing_table["FILE_NAME"]) == [name for name, report in reports.items() for _ in range(len(report))]
+    assert list(billing_table["PROTOCOL_ID"]) == ["101", "P-7", "101"]
+    assert billing_table["TOTAL_PRICE"].iloc[0] == 0.38979600000000003
+    assert pd.isna(billing_table["TOTAL_PRICE"].iloc[1])
+    assert list(pd.read_csv(tmp_path / "billing_reports.csv")["PROTOCOL_ID"]) == ["101", "P-7", "101"]
@@ -0,0 +1,26 @@
+from src.config import Config
+from src.core.depot_watcher import DepotWatcher
+from src.core.storage_service import StorageService
+
+
+def test_failed_files_are_retried(depot_data, monkeypatch):
+    calls = []
+    save_results = StorageService.save_results
+
+    def save_results_failing_once(self, result):
+        calls.append(result)
+        if len(calls) == 1:
+            raise OSError("output file is locked")
+        save_results(self, result)
+
+    monkeypatch.setattr(StorageService, "save_results", save_results_failing_once)
+    watcher = DepotWatcher(debounce_seconds=0)
+
+    watcher.check_folder()
+    assert not Config.MAX_VALUES_OUTPUT_PATH.exists()
+
+    # Los archivos no cambiaron, pero el procesamiento anterior falló: se reintentan
+    watcher.check_folder()
+    assert len(calls) == 2
+    assert sorted(calls[-1].processed_files) == sorted(path.name for path in depot_data.iterdir())
+    assert Config.MAX_VALUES_OUTPUT_PATH.exists()
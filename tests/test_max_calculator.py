@@ -0,0 +1,65 @@
+import pandas as pd
+
+from src.core.max_calculator import MaxCalculator
+
+
+def billing_report(rows: list[tuple]) -> pd.DataFrame:
+    # Como en los reportes de facturación, ERROR es una columna de texto
+    return pd.DataFrame(rows, columns=["PROTOCOL", "DESCRIPTION", "TOTAL_PRICE", "ERROR"]).astype({"ERROR": "str"})
+
+
+REPORTS = {
+    "output_day1.xlsx": billing_report([("A", "a1", 10.0, None), ("B", "b1", 5.0, None), ("A", "a2", 0.5, None)]),
+    "output_day2.xlsx": billing_report([("B", "b2", 7.0, None), ("A", "a3", 11.0, None), ("C", "c1", 3.0, "Service not found")]),
+    "output_day3.xlsx": billing_report([("A", "a4", 11.0, None), ("B", "b3", 2.0, None)]),
+}
+
+
+def daily_calculator(**kwargs) -> MaxCalculator:
+    calculator = MaxCalculator(**kwargs)
+    for file_name, report in REPORTS.items():
+        calculator.optimize_daily_report(report, file_name)
+    return calculator
+
+
+def test_daily_reports_match_single_pass_and_totals():
+    batch = MaxCalculator(protocols_with_errors={"C"})
+    batch.optimize_reports(REPORTS)
+    from_totals = MaxCalculator(protocols_with_errors={"C"})
+    from_totals.optimize_from_totals(
+        {file_name: MaxCalculator.protocol_totals(report) for file_name, report in REPORTS.items()},
+        REPORTS.__getitem__
+    )
+    daily = daily_calculator(protocols_with_errors={"C"})
+
+    expected = daily.get_max_values()
+    pd.testing.assert_frame_equal(batch.get_max_values(), expected)
+    pd.testing.assert_frame_equal(from_totals.get_max_values(), expected)
+
+
+def test_first_file_wins_ties_and_errors_are_excluded():
+    max_values = daily_calculator(protocols_with_errors={"C"}).get_max_values()
+
+    # A suma 11 en day2 y en day3 (gana day2) y B suma 7 en day2: filas en el orden de day2
+    assert list(max_values["DESCRIPTION"]) == ["b2", "a3"]
+    assert set(max_values["FILE_NAME"]) == {"day2"}
+
+
+def test_late_error_protocols_are_removed():
+    calculator = daily_calculator()
+    calculator.add_protocols_with_errors({"C", "B"})
+
+    assert list(calculator.get_max_values()["PROTOCOL"]) == ["A"]
+
+
+def test_peaks_and_percentiles():
+    calculator = daily_calculator(protocols_with_errors={"C"}, top_k=2)
+
+    peak_days = calculator.get_peak_days()
+    assert peak_days[peak_days["PROTOCOL"] == "A"][["FILE_NAME", "TOTAL_PRICE"]].values.tolist() == [["day2", 11.0], ["day3", 11.0]]
+    peak_values = calculator.get_peak_values()
+    assert set(peak_values.loc[peak_values["PROTOCOL"] == "A", "FILE_NAME"]) == {"day2", "day3"}
+
+    percentiles = calculator.get_protocol_percentiles().set_index("PROTOCOL")
+    assert percentiles.loc["B", "DAYS"] == 3
+    assert abs(percentiles.loc["B", "P90_TOTAL_PRICE"] - 5.0) <= 0.05
@@ -0,0 +1,93 @@
+import io
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pandas as pd
+import pytest
+
+from src.api import pricing_server as pricing_server_module
+from src.api.pricing_server import PricingServer
+from src.core.storage_service import StorageService
+
+
+@pytest.fixture
+def pricing_server(depot_data):
+    server = PricingServer(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, query: str, body: bytes) -> tuple[int, bytes]:
+    host, port = server.server_address[:2]
+    request = urllib.request.Request(f"http://{host}:{port}/price?{query}", data=body, method="POST")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def test_non_excel_body_is_rejected(pricing_server):
+    status, _ = post(pricing_server, "depot=PERI&file_name=report.xls", os.urandom(2048))
+    assert 400 <= status < 500
+
+
+def test_price_report_as_json(pricing_server, depot_data):
+    file_name = "StockThermoFisher_ST_20240101"
+    status, body = post(
+        pricing_server, f"depot=PERI&file_name={file_name}.xls", (depot_data / f"{file_name}.xls").read_bytes()
+    )
+    assert status == 200
+
+    payload = json.loads(body)
+    expected = StorageService().process_all("PERI", streaming=False, incremental=False).billing_reports[file_name]
+    assert payload["file_name"] == f"{file_name}.xls"
+    assert len(payload["billing_report"]) == len(expected)
+    assert [row["PROTOCOL"] for row in payload["billing_report"]] == list(expected["PROTOCOL"])
+
+
+def test_price_report_as_parquet(pricing_server, depot_data):
+    report = (depot_data / "StockThermoFisher_ST_20240102.xls").read_bytes()
+    status, body = post(pricing_server, "depot=PERI&format=parquet&table=errors", report)
+
+    assert status == 200
+    assert "PROTOCOL" in pd.read_parquet(io.BytesIO(body)).columns
+
+
+@pytest.mark.parametrize("query", ["depot=UNKNOWN", "depot=PERI&format=xml", "depot=PERI&table=other"])
+def test_invalid_parameters_are_rejected(pricing_server, depot_data, query):
+    report = (depot_data / "StockThermoFisher_ST_20240101.xls").read_bytes()
+    status, body = post(pricing_server, query, report)
+
+    assert status == 400
+    assert "error" in json.loads(body)
+
+
+def test_serialization_error_is_a_json_500(pricing_server, depot_data, monkeypatch):
+    def fail(df):
+        raise TypeError("unsupported column type")
+
+    monkeypatch.setattr(pricing_server_module, "arrow_compatible", fail)
+    report = (depot_data / "StockThermoFisher_ST_20240101.xls").read_bytes()
+    status, body = post(pricing_server, "depot=PERI&format=parquet", report)
+
+    assert status == 500
+    assert "unsupported column type" in json.loads(body)["error"]
+
+
+def test_stats_count_all_requests(pricing_server, depot_data):
+    post(pricing_server, "depot=PERI", (depot_data / "StockThermoFisher_ST_20240101.xls").read_bytes())
+    post(pricing_server, "depot=PERI", os.urandom(2048))
+
+    host, port = pricing_server.server_address[:2]
+    with urllib.request.urlopen(f"http://{host}:{port}/stats") as response:
+        stats = json.loads(response.read())
+    assert stats["count"] == 2
+    assert stats["errors"] == 1
+    assert stats["p50_ms"] is not None
@@ -0,0 +1,32 @@
+import pandas as pd
+
+from src.readers.PERI_excel_reader import PERIExcelReader
+from src.readers.report_cache import ReportCache
+from tests.conftest import write_depot_report
+
+
+def test_cache_hit_matches_cold_read(depot_data, tmp_path):
+    report_path = depot_data / "StockThermoFisher_ST_20240101.xls"
+    reader = PERIExcelReader()
+    cache = ReportCache(tmp_path / "cache", enabled=True)
+
+    cold = cache.read_excel(reader, report_path)
+    assert len(list((tmp_path / "cache").glob("*.parquet"))) == 1
+    hit = cache.read_excel(reader, report_path)
+
+    assert not cold.empty
+    pd.testing.assert_frame_equal(hit, cold)
+    pd.testing.assert_frame_equal(cold, reader.read_excel(report_path))
+
+
+def test_modified_report_replaces_cache_entry(depot_data, tmp_path):
+    report_path = depot_data / "StockThermoFisher_ST_20240101.xls"
+    reader = PERIExcelReader()
+    cache = ReportCache(tmp_path / "cache", enabled=True)
+    cache.read_excel(reader, report_path)
+
+    write_depot_report(report_path, seed=42)
+    modified = cache.read_excel(reader, report_path)
+
+    assert len(list((tmp_path / "cache").glob("*.parquet"))) == 1
+    pd.testing.assert_frame_equal(modified, reader.read_excel(report_path))
@@ -0,0 +1,52 @@
+import sqlite3
+
+import pandas as pd
+
+from src.core.error_collector import ErrorCollector
+from src.core.run_manifest import RunManifest
+
+
+def test_error_rows_round_trip(tmp_path):
+    error_protocols = pd.DataFrame(
+        [("P-1", None, 1001, "Storage Ambient", None, "desc", "Pallet", 3, 1, "Service not found", "day1")],
+        columns=ErrorCollector.COLUMNS
+    )
+    totals = pd.Series([10.5, 2.0], index=pd.Index(["P-1", "P-2"], dtype=object))
+    # IDs numéricos y de texto en una misma columna, y valores vacíos de ambos tipos
+    billing_report = pd.DataFrame({
+        "PROTOCOL": ["P-1", "P-2", "P-3"],
+        "SERVICE_ID": pd.Series([1001, "S-7", None], dtype=object),
+        "DESCRIPTION": pd.Series(["desc", float("nan"), None], dtype=object),
+        "TOTAL_PRICE": [0.38979600000000003, 2.0, float("nan")],
+        "ERROR": ["Service not found", None, None]
+    })
+
+    with RunManifest(tmp_path / "manifest.sqlite") as manifest:
+        manifest.save_file("PERI", "day1", "fingerprint", totals, error_protocols, billing_report)
+
+        assert manifest.get_file_fingerprints("PERI") == {"day1": "fingerprint"}
+        pd.testing.assert_series_equal(manifest.get_protocol_totals("PERI", "day1"), totals)
+        pd.testing.assert_frame_equal(manifest.get_error_protocols("PERI", "day1"), error_protocols.astype(object))
+        pd.testing.assert_frame_equal(manifest.get_billing_report("PERI", "day1"), billing_report)
+
+        manifest.remove_files("PERI", ["day1"])
+        assert manifest.get_file_fingerprints("PERI") == {}
+        assert manifest.get_error_protocols("PERI", "day1").empty
+        assert not manifest.has_billing_report("PERI", "day1")
+
+
+def test_manifest_with_another_schema_is_discarded(tmp_path):
+    db_path = tmp_path / "manifest.sqlite"
+    with sqlite3.connect(db_path) as connection:
+        connection.execute("CREATE TABLE depot_configs (depot TEXT PRIMARY KEY, fingerprint TEXT NOT NULL)")
+        connection.execute("INSERT INTO depot_configs VALUES ('PERI', 'old')")
+        connection.execute(
+            "CREATE TABLE processed_files (depot TEXT, file_name TEXT, fingerprint TEXT, "
+            "error_protocols BLOB NOT NULL, billing_report BLOB NOT NULL)"
+        )
+    connection.close()
+
+    with RunManifest(db_path) as manifest:
+        assert manifest.get_config_fingerprint("PERI") is None
+        manifest.save_file("PERI", "day1", "fingerprint", pd.Series(dtype=float), pd.DataFrame(), pd.DataFrame())
+        assert manifest.get_file_fingerprints("PERI") == {"day1": "fingerprint"}
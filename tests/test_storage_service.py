@@ -0,0 +1,120 @@
+import pandas as pd
+
+from src.config import Config
+from src.core import calculator_registry
+from src.core.calculator_registry import CalculatorRegistry
+from src.core.storage_service import StorageService
+from tests.conftest import write_depot_report
+
+
+def test_streaming_matches_batch(depot_data):
+    batch = StorageService().process_all("PERI", streaming=False, incremental=False)
+    streaming = StorageService().process_all("PERI", streaming=True, incremental=False)
+
+    assert streaming.billing_reports == {}
+    assert not batch.max_values.empty
+    pd.testing.assert_frame_equal(streaming.max_values, batch.max_values)
+    pd.testing.assert_frame_equal(streaming.error_protocols, batch.error_protocols)
+
+
+def test_pipeline_stages_write_outputs_while_pricing(depot_data, monkeypatch):
+    batch = StorageService().process_all("PERI", streaming=False, incremental=False)
+
+    monkeypatch.setattr(Config, "PIPELINE_STAGES", True)
+    pipelined = StorageService().process_all("PERI", streaming=False, incremental=False)
+
+    # Los reportes ya se escribieron durante el procesamiento
+    assert pipelined.billing_reports_saved
+    assert sorted(path.stem for path in Config.PROCESSED_REPORTS_FOLDER.glob("output_*.xlsx")) == sorted(
+        f"output_{file_name}" for file_name in batch.billing_reports
+    )
+    pd.testing.assert_frame_equal(pipelined.max_values, batch.max_values)
+    for file_name, billing_report in batch.billing_reports.items():
+        pd.testing.assert_frame_equal(pipelined.billing_reports[file_name], billing_report)
+
+def test_default_run_returns_billing_reports(depot_data):
+    result = StorageService().process_all("PERI")
+
+    # Reportes en el orden del directorio
+    assert sorted(result.billing_reports) == [f"StockThermoFisher_ST_202401{day:02d}" for day in range(1, 4)]
+    assert all(not billing_report.empty for billing_report in result.billing_reports.values())
+
+
+def test_incremental_rerun_reuses_unchanged_files(depot_data, monkeypatch):
+    priced_files = []
+    iter_billing_reports = StorageService._iter_billing_reports
+
+    def recording_iter_billing_reports(self, files):
+        priced_files.extend(files)
+        return iter_billing_reports(self, files)
+
+    monkeypatch.setattr(StorageService, "_iter_billing_reports", recording_iter_billing_reports)
+
+    StorageService().process_all("PERI", incremental=True)
+    assert len(priced_files) == 3
+
+    # Solo se vuelve a valorizar el reporte modificado
+    priced_files.clear()
+    write_depot_report(depot_data / "StockThermoFisher_ST_20240102.xls", seed=42)
+    incremental = StorageService().process_all("PERI", incremental=True)
+    assert priced_files == ["StockThermoFisher_ST_20240102.xls"]
+
+    full = StorageService().process_all("PERI", streaming=False, incremental=False)
+    assert incremental.processed_files == full.processed_files
+    pd.testing.assert_frame_equal(incremental.error_protocols, full.error_protocols)
+    pd.testing.assert_frame_equal(incremental.max_values, full.max_values)
+
+
+def test_incremental_run_does_not_read_output_files(depot_data):
+    StorageService().process_all("PERI", incremental=True)
+    for output_path in Config.PROCESSED_REPORTS_FOLDER.glob("output_*.xlsx"):
+        output_path.write_bytes(b"edited by hand")
+
+    incremental = StorageService().process_all("PERI", incremental=True)
+    full = StorageService().process_all("PERI", streaming=False, incremental=False)
+    pd.testing.assert_frame_equal(incremental.max_values, full.max_values)
+
+
+def test_unreadable_report_is_retried(depot_data, monkeypatch):
+    (depot_data / "StockThermoFisher_ST_20240102.xls").write_bytes(b"not an excel file")
+    StorageService().process_all("PERI", incremental=True)
+
+    priced_files = []
+    iter_billing_reports = StorageService._iter_billing_reports
+    monkeypatch.setattr(
+        StorageService, "_iter_billing_reports",
+        lambda self, files: priced_files.extend(files) or iter_billing_reports(self, files)
+    )
+    StorageService().process_all("PERI", incremental=True)
+
+    assert priced_files == ["StockThermoFisher_ST_20240102.xls"]
+
+def test_incremental_run_reprocesses_after_pricing_version_change(depot_data, monkeypatch):
+    StorageService().process_all("PERI", incremental=True)
+
+    monkeypatch.setattr(StorageService, "PRICING_VERSION", StorageService.PRICING_VERSION + 1)
+    priced_files = []
+    iter_billing_reports = StorageService._iter_billing_reports
+    monkeypatch.setattr(
+        StorageService, "_iter_billing_reports",
+        lambda self, files: priced_files.extend(files) or iter_billing_reports(self, files)
+    )
+    StorageService().process_all("PERI", incremental=True)
+
+    assert len(priced_files) == 3
+
+
+def test_match_cache_hit_matches_cold_run(depot_data, monkeypatch):
+    monkeypatch.setattr(Config, "MATCH_CACHE_ENABLED", True)
+    cold_service = StorageService()
+    cold = cold_service.process_all("PERI", streaming=False, incremental=False)
+    assert Config.MATCH_CACHE_PATH.exists()
+
+    # Como en un proceso nuevo: el calculador base se construye con los memos guardados
+    warm_registry = CalculatorRegistry()
+    monkeypatch.setattr(calculator_registry, "_registry", warm_registry)
+    assert warm_registry.get_price_calculator().protocol_memo
+    warm = StorageService().process_all("PERI", streaming=False, incremental=False)
+
+    pd.testing.assert_frame_equal(warm.max_values, cold.max_values)
+    pd.testing.assert_frame_equal(warm.error_protocols, cold.error_protocols)